@@ -16,8 +16,31 @@ class denselayer(object):
     def __init__(self,weight,bias,actv): # weight/bias can be init with None to assign later
         self.weight, self.bias = weight, bias 
         self.actv = {'r':self.relu,'s':self.sigmoid}[actv] # if 'r' use relu, 's use sigmoid, as activation function
+        self.spdata = self.spindx = self.spptr = None # compressed sparse row (csr) weight, only set after pruning
+    def prune(self,threshold=None,keepfrac=None): # keep weight with magnitude >= threshold, or top-keepfrac fraction of weight
+        if (threshold is None) == (keepfrac is None):
+            raise ValueError('expect either threshold or keepfrac for pruning')
+        magnitude = sorted((abs(w) for warray in self.weight for w in warray),reverse=True)
+        if threshold is None:
+            if not (0.0 <= keepfrac <= 1.0):
+                raise ValueError('keepfrac should be in range 0.0 to 1.0 (got {})'.format(keepfrac))
+            keepnums = int(math.ceil(keepfrac*len(magnitude)))
+            threshold = magnitude[keepnums-1] if keepnums else math.inf
+        self.weight = tuple(tuple((w if abs(w)>=threshold else 0.0) for w in warray) for warray in self.weight)
+        spdata, spindx, spptr = [], [], [0]
+        for warray in self.weight: # store only non-zero weight and its column index, row by row
+            for i,w in enumerate(warray):
+                if w != 0.0:
+                    spdata.append(w)
+                    spindx.append(i)
+            spptr.append(len(spdata))
+        self.spdata, self.spindx, self.spptr = tuple(spdata), tuple(spindx), tuple(spptr)
+        return (1.0 - len(spdata)/len(magnitude)) if magnitude else 0.0 # return sparsity (empty weight has nothing to prune)
     def frwdprop(self,xarray): # do forward propagation y = actv(w*x+b)
-        wxarray = tuple(sum(tuple(x*w for x,w in zip(xarray,warray))) for warray in self.weight) # matric multiplication for w*x part
+        if self.spptr is None:
+            wxarray = tuple(sum(tuple(x*w for x,w in zip(xarray,warray))) for warray in self.weight) # matric multiplication for w*x part
+        else: # pruned layer, multiply only non-zero weight
+            wxarray = tuple(sum(xarray[i]*w for i,w in zip(self.spindx[bgn:end],self.spdata[bgn:end])) for bgn,end in zip(self.spptr[:-1],self.spptr[1:]))
         wxplusb = tuple(wx + b for wx,b in zip(wxarray,self.bias)) # do element-wise for addition b
         return self.actv(wxplusb) # apply activation function then return result
 
@@ -25,19 +48,23 @@ class denselayer(object):
 class frwdpropsqnc(object):
     ''' wrap nn-layer to nn-model
         model = frwdpropsqnc((None,None,'r'),(None,None,'s'),)
-        model.loadweightbias('weight_n_bias_that_was_dumped_to_json_format_file.jsv') '''
+        model.loadweightbias('weight_n_bias_that_was_dumped_to_json_format_file.jsv')
+        model.prune(keepfrac=0.25) # optional, keep top-25% weight of each layer '''
     def __init__(self,*lyrseq): # init with series of (weight, bias, actvtype)
         self.layerseq = tuple(denselayer(*args) for args in lyrseq) # init each layer with user-setting
     def predict(self,array): # tranform input-array to output-array
         for layer in self.layerseq: # by sequenctially calling each layer
             array = layer.frwdprop(array) # forward propagation function
         return array # then return result
+    def prune(self,threshold=None,keepfrac=None): # prune every layer, then return sparsity of each layer
+        return tuple(layer.prune(threshold,keepfrac) for layer in self.layerseq)
     def loadweightbias(self,target):
         if isinstance(target,(str,)): # if string input, assumed it's json-save-file location
             with open(target,'r') as file:
                 target = json.loads(file.read()) # read file and loads with json, list of weightbias are expected
         for layer,w,b in zip(self.layerseq,target[::2],target[1::2]): # iterate [w1,b1,w2,b2,...,wx,bx] from target list
             layer.weight = w # assign new weight and bias to each layer
+            layer.spdata = layer.spindx = layer.spptr = None # new weight is dense, re-prune if needed
             layer.bias = [bb if isinstance(bb,(float,int,)) else bb[0] for bb in b]
 
 
@@ -10,11 +10,17 @@ model = sequential_nn_model(input_layer(len(actionlist)),
                             optimizer=optimizer(method='adam',setting={'decay_step':2048,'decay_rate':1.0,'learn_rate':0.1}),)
 model.train(train_uinput,train_output)
 pred_output = model.predict(test_uinput)
+model.prune(keepfrac=0.25) # optional, keep top-25% weight of each layer and use sparse forward propagation
 '''
 
 
+import time
 import numpy
 numpy.seterr(all='raise') # raise error if numpy got under/overflow or numpy will silently produce 'nan'
+try: # scipy is optional, only used for faster sparse matmul of pruned layer
+    import scipy.sparse
+except ModuleNotFoundError:
+    scipy = None
 
 
 class _nodes_layer(object):
@@ -95,6 +101,55 @@ def actvfunc_sigmoid(inptarry,diff=False):
         return actvfunc_sigmoid(inptarry)*(1.0-actvfunc_sigmoid(inptarry))
 
 
+# define weight pruning and sparse weight
+def prune_mask(weight,threshold=None,keepfrac=None):
+    # keep weight with magnitude >= threshold, or keep top-keepfrac fraction of weight (by magnitude)
+    if (threshold is None) == (keepfrac is None):
+        raise ValueError('expect either threshold or keepfrac for pruning')
+    magnitude = numpy.abs(weight)
+    if threshold is None:
+        if not (0.0 <= keepfrac <= 1.0):
+            raise ValueError('keepfrac should be in range 0.0 to 1.0 (got {})'.format(keepfrac))
+        keepnums = int(numpy.ceil(keepfrac*weight.size))
+        if keepnums == 0:
+            return numpy.zeros(weight.shape,dtype=bool)
+        threshold = numpy.partition(magnitude.ravel(),weight.size-keepnums)[weight.size-keepnums]
+    return magnitude >= threshold
+
+
+class csr_weight(object):
+    ''' weight matrix in compressed sparse row layout, used as pruned neuron_layer weight
+        spwght = csr_weight(layer.weight)
+        wghtoutp = spwght.matmul(inptarry) # same result as numpy.matmul(layer.weight,inptarry) '''
+    def __init__(self,weight):
+        self.shape = weight.shape
+        rows,cols = numpy.nonzero(weight) # row-major order, as csr layout required
+        self.data = weight[rows,cols]
+        self.indices = cols
+        self.indptr = numpy.concatenate(([0],numpy.cumsum(numpy.bincount(rows,minlength=self.shape[0]))))
+        self._nonempty = self.indptr[:-1] < self.indptr[1:] # reduceat can't handle empty row, skip them
+        self._spmatrix = scipy.sparse.csr_matrix((self.data,self.indices,self.indptr),shape=self.shape) if scipy else None
+    @property
+    def nnz(self):
+        return len(self.data)
+    @property
+    def sparsity(self):
+        return (1.0 - self.nnz/(self.shape[0]*self.shape[1])) if (self.shape[0]*self.shape[1]) else 0.0
+    def todense(self):
+        weight = numpy.zeros(self.shape)
+        weight[numpy.repeat(numpy.arange(self.shape[0]),numpy.diff(self.indptr)),self.indices] = self.data
+        return weight
+    def matmul(self,inptarry):
+        inptflat = inptarry[:,:,0] # [nSample x nInput]
+        if self._spmatrix is not None:
+            return (self._spmatrix @ inptflat.T).T[:,:,numpy.newaxis]
+        outpflat = numpy.zeros((inptarry.shape[0],self.shape[0]))
+        if self.nnz:
+            prodflat = inptflat[:,self.indices]*self.data # [nSample x nnz], only non-zero weight product
+            outpflat[:,self._nonempty] = numpy.add.reduceat(prodflat,self.indptr[:-1][self._nonempty],axis=1) # sum product of each row
+        return outpflat[:,:,numpy.newaxis]
+
+
 class neuron_layer(_nodes_layer):
     def __init__(self,nodenums,actvfunc='relu'):
         super().__init__()
@@ -112,6 +167,8 @@ class neuron_layer(_nodes_layer):
         self._dcstdintbuff = None
         self._dcstdwghbuff = None
         self._dcstdbiabuff = None
+        self._sparseweight = None
+        self._prunemask = None # keep pruned weight at zero while training, only set after pruning
 
     @property   
     def input(self):
@@ -122,6 +179,9 @@ class neuron_layer(_nodes_layer):
     @property
     def bias(self):
         return self._bias
+    @property
+    def sparsity(self):
+        return float(numpy.mean(self._weight == 0.0)) if self._sparseweight is None else self._sparseweight.sparsity
 
     @property
     def output(self):
@@ -158,9 +218,20 @@ class neuron_layer(_nodes_layer):
     def forward_propagation(self,inptarry=None):
         if inptarry is None:
             inptarry = self.input # pulling method (take parent's output as self-input)
-        self._outputbuff = self._actvfunc(numpy.matmul(self._weight,inptarry) + self._bias)
+        if self._sparseweight is None:
+            wghtoutp = numpy.matmul(self._weight,inptarry)
+        else:
+            wghtoutp = self._sparseweight.matmul(inptarry) # pruned layer, use sparse forward propagation
+        self._outputbuff = self._actvfunc(wghtoutp + self._bias)
         return self.output
 
+    def prune(self,threshold=None,keepfrac=None):
+        self._prunemask = prune_mask(self._weight,threshold,keepfrac)
+        self._weight = self._weight*self._prunemask
+        self._sparseweight = csr_weight(self._weight)
+        self.nodes_chain_call('clear_buffer',{'buffnamelist':('_outputbuff',)},targetchain='dnstream')
+        return self.sparsity
+
     def backward_propagation(self):
         doutdint = self._actvfunc(self.output,diff=True)
         if isinstance(self._child,(cost_layer,)):
@@ -400,6 +471,9 @@ class optimizer(object):
         for layr in self._resplyrs:
             layr._weight -= numpy.nan_to_num( self._respoptm[layr.id]['weight'].calculate_dparam(layr.dcstdwgh) )
             layr._bias   -= numpy.nan_to_num( self._respoptm[layr.id]['bias'].calculate_dparam(layr.dcstdbia) )
+            if layr._prunemask is not None: # pruned layer, keep pruned weight at zero and rebuild its sparse weight
+                layr._weight *= layr._prunemask
+                layr._sparseweight = csr_weight(layr._weight)
         numpy.seterr(all='raise')
     @property
     def state(self):
@@ -456,6 +530,9 @@ class sequential_nn_model():
         self.optimizer.adjustparam()
         return traincost
 
+    def prune(self,threshold=None,keepfrac=None):
+        return {layer.id:layer.prune(threshold,keepfrac) for layer in self.neuronlayers}
+
     @property
     def state(self):
         self_state = {
@@ -489,6 +566,29 @@ class sequential_nn_model():
                                                  'bias':optim_factory(optimstate['bias']),}
 
 
+def prune_report(model,inptarry,trgtarry,threshold=None,keepfrac=None,repeat=16):
+    ''' prune model (in-place) and compare with its dense version
+        report = prune_report(model,test_uinput,test_output,keepfrac=0.25)
+        print(report['sparsity'],report['accuracy_delta'],report['speedup']) '''
+    def evaluate():
+        timeref = time.perf_counter()
+        for _ in range(repeat):
+            predarry = model.predict(inptarry)
+        elapsed = (time.perf_counter()-timeref)/repeat
+        accuracy = float(numpy.mean(numpy.round(predarry) == numpy.round(trgtarry)))
+        cost = float(model.costlayer.calculate_cost(trgtarry))
+        return {'accuracy':accuracy,'cost':cost,'predict_time':elapsed}
+    dense = evaluate()
+    sparsity = model.prune(threshold,keepfrac)
+    sparse = evaluate()
+    return {'sparsity':sparsity,
+            'dense':dense,
+            'sparse':sparse,
+            'accuracy_delta':sparse['accuracy']-dense['accuracy'],
+            'cost_delta':sparse['cost']-dense['cost'],
+            'speedup':dense['predict_time']/sparse['predict_time'] if sparse['predict_time'] else None}
+
+
 # credits and refs
 # https://towardsdatascience.com/part-1-a-neural-network-from-scratch-foundation-e2d119df0f40 <<< foundation
 # https://towardsdatascience.com/part-2-gradient-descent-and-backpropagation-bf90932c066a <<< back propagation knowledge
@@ -0,0 +1,159 @@
+
+
+'''
+online training from socket stream
+trainer = onlinetrainer(model,nInput,nOutput,capacity=65536,batchsize=256)
+with trainer, client_socket() as client: # trainer start training thread in background
+    trainer.recv_forever(client) # decode incoming frames into replay buffer
+sender side, each frame is rows of [input...,target...] samples:
+    send_samples(server,train_uinput,train_output,conn=conn)
+'''
+
+
+import socket
+import logging
+import threading
+import numpy
+
+
+class replaybuffer(object):
+    ''' fixed-capacity ring buffer of training samples, backed by preallocated numpy array
+        buffer = replaybuffer(nInput,nOutput,capacity=65536)
+        buffer.push_frame(frame) # or buffer.push(inptbtch,trgtbtch)
+        inptbtch,trgtbtch = buffer.sample(256) # [256 x nInput x 1], [256 x nOutput x 1] '''
+    def __init__(self,inptnods,outpnods,capacity=65536,dtype='float64'):
+        self.inptnods = inptnods
+        self.outpnods = outpnods
+        self.capacity = capacity
+        self.dtype = numpy.dtype(dtype)
+        self._inptarry = numpy.zeros((capacity,inptnods,1),dtype=self.dtype)
+        self._trgtarry = numpy.zeros((capacity,outpnods,1),dtype=self.dtype)
+        self._head = 0 # next write index
+        self._size = 0
+        self._lock = threading.Lock()
+        self.pushcount = 0 # total samples pushed, including overwritten ones
+    def __len__(self):
+        return self._size
+    @property
+    def rowsize(self): # bytes per sample in frame
+        return (self.inptnods+self.outpnods)*self.dtype.itemsize
+    def push(self,inptbtch,trgtbtch): # inptbtch [n x nInput], trgtbtch [n x nOutput]
+        nums = len(inptbtch)
+        if nums > self.capacity: # only the newest samples can be kept
+            inptbtch, trgtbtch = inptbtch[-self.capacity:], trgtbtch[-self.capacity:]
+        push = len(inptbtch)
+        with self._lock:
+            frst = min(push,self.capacity-self._head) # part before wrap-around
+            self._inptarry[self._head:self._head+frst,:,0] = inptbtch[:frst]
+            self._trgtarry[self._head:self._head+frst,:,0] = trgtbtch[:frst]
+            self._inptarry[:push-frst,:,0] = inptbtch[frst:]
+            self._trgtarry[:push-frst,:,0] = trgtbtch[frst:]
+            self._head = (self._head+push)%self.capacity
+            self._size = min(self._size+push,self.capacity)
+            self.pushcount += nums
+    def push_frame(self,frame): # frame is raw bytes of [input...,target...] rows, no per-sample object created
+        if len(frame)%self.rowsize:
+            raise ValueError('invalid frame size, expect multiple of {} bytes (got {})'.format(self.rowsize,len(frame)))
+        rows = numpy.frombuffer(frame,dtype=self.dtype).reshape(-1,self.inptnods+self.outpnods)
+        self.push(rows[:,:self.inptnods],rows[:,self.inptnods:])
+    def sample(self,batchsize):
+        with self._lock:
+            if not self._size:
+                raise ValueError('can\'t sample from empty replaybuffer')
+            indx = numpy.random.randint(0,self._size,batchsize)
+            return self._inptarry[indx], self._trgtarry[indx] # fancy indexing return copy, safe to use after lock release
+
+
+def send_samples(sock,inptarry,trgtarry,dtype='float64',timeout=1.0,conn=None):
+    ''' send [n x nInput x 1] input and [n x nOutput x 1] target as one replaybuffer frame via user_socket '''
+    nums = len(inptarry)
+    rows = numpy.concatenate((numpy.reshape(inptarry,(nums,-1)),numpy.reshape(trgtarry,(nums,-1))),axis=1)
+    sock.send_msgsszbsstrm(numpy.ascontiguousarray(rows,dtype=dtype).tobytes(),timeout=timeout,conn=conn)
+
+
+class onlinetrainer(object):
+    ''' keep training model from replaybuffer in background thread while frames are received
+        receive path only copies frame into replaybuffer, it never waits for training step
+        invalid frame is logged and skipped (counted in dropframes), error from model.train stop
+        training thread and is re-raised by stop() (also kept in trainerror) '''
+    def __init__(self,model,inptnods,outpnods,capacity=65536,batchsize=256,minsamples=None,dtype='float64'):
+        self.model = model
+        self.buffer = replaybuffer(inptnods,outpnods,capacity,dtype)
+        self.batchsize = batchsize
+        self.minsamples = batchsize if minsamples is None else minsamples # start training once buffer has enough samples
+        self.modellock = threading.Lock() # hold this lock when using model from other thread, e.g. model.predict
+        self.traincost = None
+        self.traincount = 0
+        self.dropframes = 0
+        self.trainerror = None
+        self._stop_event = threading.Event()
+        self._data_event = threading.Event()
+        self._thread = None
+    def __enter__(self):
+        self.start()
+        return self
+    def __exit__(self,*args):
+        self.stop()
+    def start(self):
+        self._stop_event.clear()
+        self.trainerror = None
+        self._thread = threading.Thread(target=self._train_loop,daemon=True)
+        self._thread.start()
+        return self._thread
+    def stop(self,timeout=None):
+        self._stop_event.set()
+        self._data_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.trainerror is not None:
+            raise RuntimeError('training thread stopped by error') from self.trainerror
+    def _train_loop(self):
+        while not self._stop_event.is_set():
+            if len(self.buffer) < self.minsamples:
+                self._data_event.wait(0.1)
+                self._data_event.clear()
+                continue
+            inptbtch,trgtbtch = self.buffer.sample(self.batchsize)
+            try:
+                with self.modellock:
+                    self.traincost = self.model.train(inptbtch,trgtbtch)
+            except Exception as err:
+                logging.exception('online training step fail, training thread stopped')
+                self.trainerror = err
+                return
+            self.traincount += 1
+    def feed(self,frame):
+        self.buffer.push_frame(frame)
+        self._data_event.set()
+    @staticmethod
+    def _peer_closed(conn): # nothing left to read and peek return b'' -> peer closed connection (EOF)
+        timeout = conn.gettimeout()
+        conn.setblocking(False)
+        try:
+            return conn.recv(1,socket.MSG_PEEK) == b''
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        finally:
+            conn.settimeout(timeout)
+    def recv_forever(self,sock,conn=None,timeout=1.0,buff=65536): # return when peer close connection or stop() is called
+        while not self._stop_event.is_set():
+            try:
+                frame = sock.recv_msgsszbsstrm(conn=conn,timeout=timeout,buff=buff)
+            except socket.timeout:
+                continue
+            if (frame is None) and self._peer_closed(sock._soc if conn is None else conn):
+                logging.info('training stream closed by peer')
+                return
+            if frame:
+                try:
+                    self.feed(frame)
+                except ValueError as err:
+                    self.dropframes += 1
+                    logging.warning('invalid training frame dropped: {}'.format(err))
+    def recv_forever_thread(self,sock,conn=None,timeout=1.0,buff=65536):
+        thread = threading.Thread(target=self.recv_forever,args=(sock,conn,timeout,buff),daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,235 @@
+
+
+__version__ = (2026, 10, 19, 'alpha')
+
+
+import asyncio
+import logging
+from nuuJoyLib.Socket.utils import msgcls, msgv2, msgparser, encode_msgs, wire_hello, parse_wire_hello
+
+
+class aio_connection(object):
+    '''
+    asyncio stream connection that speaks user_socket message protocol
+        Purpose:
+            same frames as user_socket send_msgs/recv_msgs/send_msgsszbsstrm/recv_msgsszbsstrm,
+            so asyncio side can talk with thread/blocking side
+    '''
+
+    def __init__(self, reader=None, writer=None, syntax=None, hashalgo='md5'):
+        self.reader = reader
+        self.writer = writer
+        self.syntax = dict(msgcls().syntax) if syntax is None else syntax
+        self.hashalgo = hashalgo
+        self.compressor = None
+        self.wireversion = 1
+        self._parser = msgparser(self.syntax, hashalgo)
+
+    @property
+    def peername(self):
+        return self.writer.get_extra_info('peername') if self.writer else None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def send_rawb(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def recv_rawb(self, buff=65536):
+        if len(self._parser):
+            return self._parser.take(len(self._parser))
+        return await self.reader.read(buff)
+
+    async def negotiate_wire(self, version=2):
+        '''
+        same handshake as user_socket.negotiate_wire, peer's hello is read by its msgv2 length prefix
+        '''
+        self.writer.writelines(msgv2.pack(wire_hello(version, self.compressor), b'wirever'))
+        await self.writer.drain()
+        header = await self.reader.readexactly(msgv2.header.size)
+        frame = header + await self.reader.readexactly(msgv2.framesize(header) - msgv2.header.size)
+        _, _, info, data, _, _ = msgv2.unpack(frame)
+        if info != b'wirever':
+            raise ValueError(f'wire protocol negotiation fail, got info {info}')
+        peerver, self._parser.peercomp = parse_wire_hello(data)
+        self.wireversion = min(version, peerver, msgv2.version)
+        return self.wireversion
+
+    async def send_msgs(self, inputdata, datainfo=b'', datahash=False):
+        if not isinstance(inputdata, (tuple, list,)):
+            inputdata = (inputdata,)
+        hashalgo = datahash if isinstance(datahash, (str,)) else (self.hashalgo if datahash else 'none')
+        for data in inputdata:
+            self.writer.writelines(encode_msgs(data, self.syntax, datainfo, hashalgo, self.wireversion,
+                                               None, self.compressor))
+        await self.writer.drain()
+
+    async def recv_msgs(self, buff=65536):
+        '''
+        return next msgcls, or None if peer closed the connection
+        '''
+        self._parser.version = self.wireversion
+        self._parser.compressor = self.compressor
+        while (msgs := self._parser.next_msgs()) is None:
+            readdata = await self.reader.read(max(buff, self._parser.need()))
+            if not readdata:
+                return None
+            self._parser.feed(readdata)
+        return msgs
+
+    async def send_msgsszbsstrm(self, inputdata):
+        if not isinstance(inputdata, (tuple, list,)):
+            inputdata = (inputdata,)
+        if self.wireversion == 2:
+            return await self.send_msgs(inputdata, datainfo=b'szbsstrm')
+        for data in inputdata:
+            self.writer.writelines(encode_msgs(str(len(data)).encode(), self.syntax, b'szbsstrm'))
+            self.writer.write(data)
+        await self.writer.drain()
+
+    async def recv_msgsszbsstrm(self, buff=65536):
+        while (header := await self.recv_msgs(buff)) is not None:
+            if header.info != b'szbsstrm':
+                continue
+            if self.wireversion == 2:
+                return header.data
+            resbdata = int(header.data.decode())
+            while len(self._parser) < resbdata:
+                readdata = await self.reader.read(max(buff, resbdata - len(self._parser)))
+                if not readdata:
+                    return None
+                self._parser.feed(readdata)
+            return self._parser.take(resbdata)
+        return None
+
+
+class aio_server(object):
+    '''
+    asyncio server, serve many connections from one event loop
+        Purpose:
+            each accepted connection get its own handler coroutine (handler(conn) with aio_connection)
+        Example:
+            async def echo(conn):
+                while (msgs := await conn.recv_msgs()) is not None:
+                    await conn.send_msgs(msgs.data)
+
+            async def main():
+                async with aio_server(echo, '127.0.0.1', 13666) as server:
+                    await server.serve_forever()
+
+            asyncio.run(main())
+    '''
+
+    def __init__(self, handler, ipaddr=None, port=13666, backlog=1024, syntax=None, hashalgo='md5',
+                 negotiate=False, shutdown_timeout=5.0):
+        self.handler = handler
+        self.ipaddr = ipaddr  # None for all interfaces
+        self.port = port
+        self.backlog = backlog
+        self.syntax = syntax
+        self.hashalgo = hashalgo
+        self.negotiate = negotiate  # call negotiate_wire on each connection before handler
+        self.shutdown_timeout = shutdown_timeout
+        self._server = None
+        self._tasks = {}  # handler task -> aio_connection
+        self._closing = None
+
+    @property
+    def connections(self):
+        return len(self._tasks)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.shutdown()
+
+    async def start(self):
+        self._closing = asyncio.Event()
+        self._server = await asyncio.start_server(self._accept, self.ipaddr, self.port, backlog=self.backlog)
+        logging.debug(f'aio_server listening on {[soc.getsockname() for soc in self._server.sockets]}')
+        return self
+
+    async def _accept(self, reader, writer):
+        conn = aio_connection(reader, writer, self.syntax, self.hashalgo)
+        task = asyncio.current_task()
+        self._tasks[task] = conn
+        try:
+            if self.negotiate:
+                await conn.negotiate_wire()
+            await self.handler(conn)
+        except (ConnectionError, asyncio.IncompleteReadError) as err:
+            logging.debug(f'client {conn.peername} disconnected: {err}')
+        except asyncio.CancelledError:  # cancelled by shutdown, connection is closed below, cancellation go on to caller
+            logging.debug(f'client {conn.peername} handler cancelled')
+            raise
+        finally:
+            self._tasks.pop(task, None)
+            await conn.close()
+
+    async def serve_forever(self):
+        await self._closing.wait()
+
+    async def shutdown(self, timeout=None):
+        '''
+        stop accepting, give running handlers timeout seconds to finish, then close their connections
+        '''
+        timeout = self.shutdown_timeout if timeout is None else timeout
+        if self._server is None:
+            return
+        self._server.close()
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:  # handler waiting on read will see closed connection
+                if task in self._tasks:
+                    self._tasks[task].writer.close()
+            if pending:
+                _, pending = await asyncio.wait(pending, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        self._closing.set()
+
+
+class aio_client(aio_connection):
+    '''
+    asyncio client, try each port until connected
+        Example:
+            async with aio_client('127.0.0.1', (13666, 13667)) as client:
+                await client.send_msgs(b'hello')
+                print(await client.recv_msgs())
+    '''
+
+    def __init__(self, ipaddr, port=(13666, 13667, 13668, 13669, 13670,), syntax=None, hashalgo='md5',
+                 negotiate=False):
+        super().__init__(syntax=syntax, hashalgo=hashalgo)
+        self.ipaddr = ipaddr
+        self.port = port if isinstance(port, (tuple, list,)) else (port,)
+        self.negotiate = negotiate
+        self.useport = None
+
+    async def __aenter__(self):
+        for self.useport in self.port:
+            try:
+                self.reader, self.writer = await asyncio.open_connection(self.ipaddr, self.useport)
+                break
+            except ConnectionRefusedError:
+                logging.debug(f'ipaddr: {self.ipaddr}, port: {self.useport} fail, retrying...')
+        else:
+            raise OSError('Can\'t find server')
+        if self.negotiate:
+            await self.negotiate_wire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
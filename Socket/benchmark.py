@@ -0,0 +1,564 @@
+
+
+__version__ = (2026, 10, 19, 'alpha')
+
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import threading
+from nuuJoyLib.Socket.utils import user_socket, msgcls, msgparser, hashalgos, ciphers, sessioncipher, encode_msgs
+from nuuJoyLib.Socket import tcpip_lite
+from nuuJoyLib.Socket.tcpipv4 import mySyncMngr
+
+
+def _timeit(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        ref = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - ref
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _build_frames(sock, nums, size, **kwargs):
+    frames = []
+
+    class _collector():
+        def sendall(self, data):
+            frames.append(data)
+
+        def settimeout(self, timeout):
+            pass
+
+    sock.send_msgs([bytes([i % 256]) * size for i in range(nums)], conn=_collector(), **kwargs)
+    return b''.join(frames)
+
+
+def bench_msgparser(nums=5000, size=64, chunk=4096, repeat=3):
+    '''
+    Compare legacy bytes-buffer frame splitting with msgparser on a deep backlog of queued frames
+        Example:
+            print(bench_msgparser(nums=5000))
+    '''
+    sock = user_socket(IPAddr='127.0.0.1')
+    stream = _build_frames(sock, nums, size)
+    chunks = [stream[i:i + chunk] for i in range(0, len(stream), chunk)]
+
+    def legacy():  # recv_msgsstrm before msgparser, whole backlog arrives before first parse
+        output, dataresd = [], b''
+        for part in chunks:
+            dataresd += part
+        while sock.syntax['msge'] in dataresd:
+            index = dataresd.find(sock.syntax['msge']) + len(sock.syntax['msge'])
+            output.append(msgcls(dataresd[:index], sock.syntax))
+            dataresd = dataresd[index:]
+        assert len(output) == nums
+
+    def parser():
+        parser = msgparser(sock.syntax)
+        for part in chunks:
+            parser.feed(part)
+        assert len(list(parser)) == nums
+
+    legacy_time = _timeit(legacy, repeat)
+    parser_time = _timeit(parser, repeat)
+    return {
+        'frames': nums,
+        'bytes': len(stream),
+        'legacy_msgs_per_sec': nums / legacy_time,
+        'parser_msgs_per_sec': nums / parser_time,
+        'speedup': legacy_time / parser_time,
+    }
+
+
+def bench_latest(nums=5000, size=64, hashalgo='md5', repeat=3):
+    '''
+    Time to get the newest of nums queued frames, decode every frame (msgparser iteration)
+    against msgparser.last_msgs (only the last frame decoded)
+        Example:
+            print(bench_latest(nums=20000))
+    '''
+    sock = user_socket(IPAddr='127.0.0.1', hashalgo=hashalgo)
+    stream = _build_frames(sock, nums, size, datahash=True)
+    report = {'frames': nums, 'size': size, 'hashalgo': hashalgo}
+
+    def decode_all():
+        parser = msgparser(sock.syntax, hashalgo)
+        parser.feed(stream)
+        assert list(parser)[-1] is not None
+
+    def conflate():
+        parser = msgparser(sock.syntax, hashalgo)
+        parser.feed(stream)
+        assert parser.last_msgs()[1] == nums - 1
+
+    report['decode_all_sec'] = _timeit(decode_all, repeat)
+    report['last_msgs_sec'] = _timeit(conflate, repeat)
+    report['speedup'] = report['decode_all_sec'] / report['last_msgs_sec']
+    return report
+
+
+def bench_hashalgo(nums=5000, size=4096, repeat=3):
+    '''
+    Messages per second (encode + parse and check) for each send_msgs integrity algorithm
+        Example:
+            for hashalgo, result in bench_hashalgo().items():
+                print(hashalgo, result)
+    '''
+    report = {}
+    for hashalgo in hashalgos:
+        sock = user_socket(IPAddr='127.0.0.1', hashalgo=hashalgo)
+        stream = _build_frames(sock, nums, size, datahash=True)
+
+        def encode():
+            _build_frames(sock, nums, size, datahash=True)
+
+        def decode():
+            parser = msgparser(sock.syntax, hashalgo)
+            parser.feed(stream)
+            assert len(list(parser)) == nums
+
+        encode_time = _timeit(encode, repeat)
+        decode_time = _timeit(decode, repeat)
+        report[hashalgo] = {
+            'send_msgs_per_sec': nums / encode_time,
+            'recv_msgs_per_sec': nums / decode_time,
+            'frame_bytes': len(stream) // nums,
+        }
+    return report
+
+
+def bench_encryption(nums=5000, size=256, repeat=3):
+    '''
+    Encrypt + decrypt messages per second and bytes on wire, Fernet (msgcls.key) against session AEAD ciphers
+        Example:
+            print(bench_encryption(size=256))
+    '''
+    payload = os.urandom(size)
+    report = {}
+    suite = ciphers()
+
+    def fernet():
+        for _ in range(nums):
+            suite.decrypt(suite.encrypt(payload))
+
+    fernet_time = _timeit(fernet, repeat)
+    report['fernet'] = {'msgs_per_sec': nums / fernet_time, 'wire_bytes': len(suite.encrypt(payload))}
+    for algorithm in sessioncipher.algorithms:
+        key = os.urandom(32)
+
+        def session():
+            cipher = sessioncipher(key, key, algorithm)
+            for _ in range(nums):
+                cipher.decrypt(cipher.encrypt(payload))
+
+        session_time = _timeit(session, repeat)
+        report[algorithm] = {'msgs_per_sec': nums / session_time, 'wire_bytes': size + 16}
+    return report
+
+
+def bench_pipelined(nums=2000, legacy_nums=20, size=1024, window=32, port=13766):
+    '''
+    Messages per second over loopback, tcpip_lite send_long/recv_long (SEND_DELAY sleep)
+    against send_pipelined/recv_pipelined (acked, SEND_WINDOW frames in flight)
+        Example:
+            print(bench_pipelined(window=64))
+    '''
+    payload = os.urandom(size)
+    report = {}
+    for mode, count, send, recv in (('legacy', legacy_nums, 'send_long', 'recv_long'),
+                                    ('pipelined', nums, 'send_pipelined', 'recv_pipelined')):
+        with tcpip_lite.server_socket('127.0.0.1', port) as server:
+            def receive():
+                with server.accept_connection() as conn:
+                    received = 0
+                    while received < count:
+                        try:
+                            if getattr(conn, recv)():
+                                received += 1
+                        except socket.timeout:
+                            pass
+
+            thread = threading.Thread(target=receive, daemon=True)
+            thread.start()
+            with tcpip_lite.client_socket('127.0.0.1', port) as client:
+                client.SEND_WINDOW = window
+                ref = time.perf_counter()
+                for _ in range(count):
+                    getattr(client, send)(payload)
+                if mode == 'pipelined':
+                    client.wait_acked()
+                thread.join()
+                elapsed = time.perf_counter() - ref
+        report[mode] = {'msgs': count, 'msgs_per_sec': count / elapsed}
+        port += 1
+    report['speedup'] = report['pipelined']['msgs_per_sec'] / report['legacy']['msgs_per_sec']
+    return report
+
+
+def bench_batchsend(nums=20000, size=64, repeat=3):
+    '''
+    Messages per second for send_msgs over a socketpair, joined frame per sendall (legacy),
+    send_msgs one message per call, and send_msgs(batch=True) with many messages per sendmsg
+        Example:
+            print(bench_batchsend(size=1024))
+    '''
+    sock = user_socket(IPAddr='127.0.0.1')
+    items = [bytes([i % 256]) * size for i in range(nums)]
+    total = len(_build_frames(sock, nums, size))
+    report = {'msgs': nums, 'size': size}
+
+    def legacy(conn):
+        for data in items:
+            conn.sendall(b''.join(encode_msgs(data, sock.syntax)))
+
+    modes = (('legacy', legacy),
+             ('per_message', lambda conn: sock.send_msgs(items, timeout=None, conn=conn)),
+             ('batch', lambda conn: sock.send_msgs(items, timeout=None, conn=conn, batch=True)))
+    for mode, send in modes:
+        def run():
+            sender, receiver = socket.socketpair()
+            with sender, receiver:
+                def drain():
+                    remain = total
+                    while remain:
+                        remain -= len(receiver.recv(1 << 20))
+
+                thread = threading.Thread(target=drain)
+                thread.start()
+                send(sender)
+                thread.join()
+
+        report[f'{mode}_msgs_per_sec'] = nums / _timeit(run, repeat)
+    report['speedup'] = report['batch_msgs_per_sec'] / report['legacy_msgs_per_sec']
+    return report
+
+
+def bench_syncmngr(nums=5000, batch=100, size=64):
+    '''
+    Items per second through a mySyncMngr queue on loopback, per-item put/get proxy calls
+    against put_many/get_many with batch items per manager round trip
+        Example:
+            print(bench_syncmngr(batch=256))
+    '''
+    item = os.urandom(size)
+    report = {'items': nums, 'batch': batch}
+    server = mySyncMngr(address=('127.0.0.1', 0), startserver=True, queuename=('bench',))
+    with server:
+        server.serve_forever_thread()
+        with mySyncMngr(address=server.server_h.address, queuename=('bench',)) as client:
+            proxy = client.bench()
+
+            def single():
+                for _ in range(nums):
+                    proxy.put(item)
+                for _ in range(nums):
+                    proxy.get()
+
+            def batched():
+                for index in range(0, nums, batch):
+                    proxy.put_many([item] * min(batch, nums - index))
+                received = 0
+                while received < nums:
+                    received += len(proxy.get_many(maxitems=batch))
+
+            report['single_items_per_sec'] = nums / _timeit(single, 1)
+            report['batch_items_per_sec'] = nums / _timeit(batched, 1)
+    report['speedup'] = report['batch_items_per_sec'] / report['single_items_per_sec']
+    return report
+
+
+def bench_array(nums=50, shape=(10000, 6), repeat=3):
+    '''
+    Arrays per second over a socketpair, tolist text round trip (send_msgs/recv_msgs) against
+    send_array/recv_array into a preallocated array
+        Example:
+            print(bench_array(shape=(480, 640, 3)))
+    '''
+    import numpy
+    array = numpy.random.rand(*shape)
+    out = numpy.empty_like(array)
+    sock = user_socket(IPAddr='127.0.0.1', hashalgo='none')
+    report = {'arrays': nums, 'shape': shape, 'nbytes': array.nbytes}
+
+    def text(sender, receiver):
+        thread = threading.Thread(target=lambda: [sock.send_msgs(json.dumps(array.tolist()).encode(), timeout=None,
+                                                                 conn=sender) for _ in range(nums)])
+        thread.start()
+        for _ in range(nums):
+            msgs = None
+            while msgs is None:
+                msgs = sock.recv_msgsstrm(conn=receiver, timeout=None, buff=1 << 20)
+            numpy.array(json.loads(msgs.data))
+        thread.join()
+
+    def binary(sender, receiver):
+        thread = threading.Thread(target=lambda: [sock.send_array(array, timeout=None, conn=sender) for _ in range(nums)])
+        thread.start()
+        for _ in range(nums):
+            sock.recv_array(out=out, timeout=None, conn=receiver)
+        thread.join()
+
+    for mode, func in (('tolist', text), ('array', binary)):
+        def run():
+            sender, receiver = socket.socketpair()
+            with sender, receiver:
+                func(sender, receiver)
+
+        report[f'{mode}_arrays_per_sec'] = nums / _timeit(run, repeat)
+    report['speedup'] = report['array_arrays_per_sec'] / report['tolist_arrays_per_sec']
+    return report
+
+
+def bench_http(concurrency=(1, 4, 16), nums=200, max_workers=16):
+    '''
+    Requests per second against http_server at each concurrency level (client threads, nums requests each),
+    single-threaded HTTP/1.0 TCPServer (new connection per request) against Threaded_HTTP_Server keep-alive
+        Example:
+            print(bench_http(concurrency=(1, 8, 32), max_workers=32))
+    '''
+    import http.client
+    import socketserver
+    from nuuJoyLib.Socket.http_server import Simple_Request_Handler, Keepalive_Request_Handler, Threaded_HTTP_Server
+
+    class _quiet_handler(Simple_Request_Handler):
+        def log_message(self, *args):
+            pass
+
+    class _quiet_keepalive(Keepalive_Request_Handler):
+        def log_message(self, *args):
+            pass
+
+    class _http10_server(socketserver.TCPServer):
+        request_queue_size = 128  # same backlog as Threaded_HTTP_Server, compare serving mode only
+
+    servers = {
+        'http10': lambda: _http10_server(('127.0.0.1', 0), _quiet_handler),
+        'keepalive': lambda: Threaded_HTTP_Server(('127.0.0.1', 0), _quiet_keepalive, max_workers=max_workers),
+    }
+    body = json.dumps({'input': [0.1] * 16})
+    report = {'requests_per_client': nums, 'max_workers': max_workers}
+    for mode, factory in servers.items():
+        with factory() as server:
+            thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+            thread.start()
+            port = server.server_address[1]
+
+            def client():
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                for _ in range(nums):
+                    conn.request('POST', '/bench', body, {'Content-Type': 'application/json'})
+                    response = conn.getresponse()
+                    response.read()
+                    if response.will_close:  # HTTP/1.0 server, reconnect for next request
+                        conn.close()
+                conn.close()
+
+            for clients in concurrency:
+                def run():
+                    threads = [threading.Thread(target=client) for _ in range(clients)]
+                    for item in threads:
+                        item.start()
+                    for item in threads:
+                        item.join()
+
+                report[f'{mode}_c{clients}_requests_per_sec'] = clients * nums / _timeit(run, 1)
+            server.shutdown()
+            thread.join()
+    return report
+
+
+# receive method -> (send method, recv method, socket wrapper), all echo benchmark pairs share one loop
+loopback_methods = {
+    'recv_rawb': ('send_rawb', 'recv_rawb', 'utils'),
+    'recv_msgs': ('send_msgs', 'recv_msgs', 'utils'),
+    'recv_msgsstrm': ('send_msgs', 'recv_msgsstrm', 'utils'),
+    'recv_msgsszbsstrm': ('send_msgsszbsstrm', 'recv_msgsszbsstrm', 'utils'),
+    'recv_long': ('send_long', 'recv_long', 'tcpip_lite'),
+}
+
+
+def _percentile(ordered, percent):
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+def _loopback_endpoint(method, conn, timeout):
+    send, recv, wrapper = loopback_methods[method]
+    if wrapper == 'tcpip_lite':
+        sock = tcpip_lite.user_socket()
+        sock._soc, sock.SEND_DELAY, sock.READ_TIMEOUT = conn, 0.0, timeout
+        send, recv = getattr(sock, send), getattr(sock, recv)
+        return send, recv
+    sock = user_socket(IPAddr='127.0.0.1')  # one per connection, parser and buffers are not shared
+    send, recv = getattr(sock, send), getattr(sock, recv)
+    return (lambda data: send(data, conn=conn, timeout=None)), (lambda: recv(conn=conn, timeout=timeout, buff=65536))
+
+
+def _recv_payload(recv, size):
+    received = b''
+    while len(received) < size:
+        try:
+            result = recv()
+        except socket.timeout:
+            continue
+        result = getattr(result, 'data', result)  # msgcls from recv_msgs/recv_msgsstrm
+        if result:
+            received += bytes(result)
+    return received
+
+
+def bench_loopback(method='recv_msgs', size=1024, clients=4, nums=500, timeout=0.005):
+    '''
+    Echo load test on loopback, clients connections each send nums messages of size bytes
+    and wait for the echo, server side receive with method (see loopback_methods)
+        return throughput, round-trip latency percentiles and process CPU usage (server and clients)
+        Note:
+            recv_rawb has no framing, it return after timeout seconds of silence, so its latency include timeout
+        Example:
+            print(bench_loopback('recv_msgsstrm', size=4096, clients=8))
+    '''
+    payload = os.urandom(size)
+    server = socket.create_server(('127.0.0.1', 0), backlog=clients)
+    port = server.getsockname()[1]
+    errors = []
+
+    def serve(conn):
+        with conn:
+            send, recv = _loopback_endpoint(method, conn, timeout)
+            try:
+                for _ in range(nums):
+                    send(_recv_payload(recv, size))
+            except Exception as err:
+                errors.append(err)
+
+    def client(latencies):
+        with socket.create_connection(('127.0.0.1', port)) as conn:
+            send, recv = _loopback_endpoint(method, conn, timeout)
+            try:
+                for _ in range(nums):
+                    ref = time.perf_counter()
+                    send(payload)
+                    _recv_payload(recv, size)
+                    latencies.append(time.perf_counter() - ref)
+            except Exception as err:
+                errors.append(err)
+
+    latencies = [[] for _ in range(clients)]
+    with server:
+        threads = [threading.Thread(target=client, args=(latencies[i],)) for i in range(clients)]
+        ref, cpu_ref = time.perf_counter(), time.process_time()
+        for thread in threads:
+            thread.start()
+        for _ in range(clients):
+            threads.append(threading.Thread(target=serve, args=(server.accept()[0],)))
+            threads[-1].start()
+        for thread in threads:
+            thread.join()
+        elapsed, cpu_time = time.perf_counter() - ref, time.process_time() - cpu_ref
+    if errors:
+        raise errors[0]
+    ordered = sorted(latency for client_latencies in latencies for latency in client_latencies)
+    msgs = len(ordered)
+    return {
+        'method': method,
+        'size': size,
+        'clients': clients,
+        'msgs': msgs,
+        'seconds': elapsed,
+        'msgs_per_sec': msgs / elapsed,
+        'mb_per_sec': 2 * msgs * size / elapsed / 1e6,  # both directions
+        'latency_ms': {
+            'mean': 1e3 * sum(ordered) / msgs,
+            'p50': 1e3 * _percentile(ordered, 50),
+            'p95': 1e3 * _percentile(ordered, 95),
+            'p99': 1e3 * _percentile(ordered, 99),
+            'max': 1e3 * ordered[-1],
+        },
+        'cpu_percent': 100 * cpu_time / elapsed,
+    }
+
+
+def loopback_report(methods=tuple(loopback_methods), sizes=(64, 4096, 65536), clients=(1, 4), nums=500, timeout=0.005):
+    '''
+    Run bench_loopback for every method, payload size and client count, return machine-readable report
+        Example:
+            with open('loopback.json', 'w') as file:
+                json.dump(loopback_report(), file, indent=2)
+    '''
+    results = []
+    for method in methods:
+        for size in sizes:
+            for count in clients:
+                results.append(bench_loopback(method, size, count, nums, timeout))
+    return {
+        'config': {'nums': nums, 'timeout': timeout, 'python': platform.python_version(),
+                   'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'results': results,
+    }
+
+
+def compare_reports(baseline, report, tolerance=0.1):
+    '''
+    Compare two loopback_report results, return cases where msgs_per_sec dropped or p99 latency grew by more than tolerance
+        Example:
+            regressions = compare_reports(json.load(open('baseline.json')), loopback_report())
+    '''
+    def key(result):
+        return result['method'], result['size'], result['clients']
+
+    reference = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        base = reference.get(key(result))
+        if base is None:
+            continue
+        throughput = result['msgs_per_sec'] / base['msgs_per_sec'] - 1
+        latency = result['latency_ms']['p99'] / base['latency_ms']['p99'] - 1
+        if throughput < -tolerance or latency > tolerance:
+            regressions.append({'method': result['method'], 'size': result['size'], 'clients': result['clients'],
+                                'msgs_per_sec_change': throughput, 'p99_latency_change': latency})
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='nuuJoyLib Socket benchmarks')
+    parser.add_argument('suite', nargs='?', default='micro', choices=('micro', 'loopback'),
+                        help='micro: in-process benchmarks, loopback: echo load test report (JSON)')
+    parser.add_argument('--methods', nargs='+', default=list(loopback_methods), choices=list(loopback_methods))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[64, 4096, 65536])
+    parser.add_argument('--clients', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--nums', type=int, default=500)
+    parser.add_argument('--output', help='write loopback report to this file instead of stdout')
+    parser.add_argument('--baseline', help='loopback report to compare with, exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+    if args.suite == 'loopback':
+        report = loopback_report(args.methods, args.sizes, args.clients, args.nums)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(report, file, indent=2)
+        else:
+            print(json.dumps(report, indent=2))
+        if args.baseline:
+            with open(args.baseline) as file:
+                regressions = compare_reports(json.load(file), report, args.tolerance)
+            print(json.dumps(regressions, indent=2), file=sys.stderr)
+            sys.exit(1 if regressions else 0)
+        sys.exit(0)
+    for nums in (1000, 5000, 20000):
+        print(bench_msgparser(nums=nums))
+    for hashalgo, result in bench_hashalgo().items():
+        print(hashalgo, result)
+    print(bench_latest())
+    print(bench_encryption())
+    print(bench_pipelined())
+    print(bench_batchsend())
+    print(bench_syncmngr())
+    print(bench_array())
+    print(bench_http())
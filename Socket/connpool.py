@@ -0,0 +1,185 @@
+
+
+__version__ = (2026, 10, 19, 'alpha')
+
+
+import time
+import socket
+import logging
+import threading
+import contextlib
+
+
+class connection_pool(object):
+    '''
+    thread-safe pool of connected client sockets, keyed by (host, port)
+        Purpose:
+            keep client connections open between requests, so request-heavy clients
+            don't pay TCP handshake (and port scan) on every call
+        Note:
+            - factory(host, port) return unconnected client (client_socket class), pool call its
+              __enter__ to connect and __exit__ to close, client should keep its socket in _soc
+            - connection is checked before reuse: closed by peer or unread data left -> discarded
+            - connection returned with data still buffered in the wrapper (stream parser, decoded message queue,
+              unacked pipelined frames) is discarded, next lease would take it as its own response
+            - connection leased inside "with" that raise is discarded, not returned to pool
+        Example:
+            pool = connection_pool(client_socket, maxconns=4)
+            with pool.lease('192.168.1.10', 13666) as client:
+                client.send_long(b'request')
+    '''
+
+    def __init__(self, factory, maxconns=8, idle_timeout=60.0, keepalive=30, health_check=None):
+        self.factory = factory
+        self.maxconns = maxconns  # per (host, port), leased + idle
+        self.idle_timeout = idle_timeout  # idle connection older than this is closed instead of reused
+        self.keepalive = keepalive  # TCP keep-alive probe after this many idle seconds, None to disable
+        self.health_check = health_check  # optional health_check(client) -> bool, called with pool lock held, keep it quick
+        self._idle = {}  # key -> [(client, last used time), ...], most recently used last
+        self._leased = {}  # key -> number of leased connections
+        self._stats = {'created': 0, 'reused': 0, 'discarded': 0, 'expired': 0}
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats,
+                        idle={key: len(idle) for key, idle in self._idle.items() if idle},
+                        leased={key: count for key, count in self._leased.items() if count})
+
+    def _connect(self, host, port):
+        client = self.factory(host, port)
+        try:
+            client.__enter__()
+        except BaseException:
+            if getattr(client, '_soc', None) is not None:
+                client._soc.close()
+            raise
+        if self.keepalive:
+            client._soc.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                client._soc.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, max(1, int(self.keepalive)))
+                client._soc.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, int(self.keepalive)))
+        return client
+
+    def _close(self, client):
+        try:
+            client.__exit__(None, None, None)
+        except OSError as err:
+            logging.debug(f'error while closing pooled connection: {err}')
+
+    @staticmethod
+    def _buffered(client):
+        # data already read off the socket (or acks still due) that belong to the previous lease
+        parser = getattr(client, '_parser', None)
+        return bool((parser is not None and len(parser)) or getattr(client, 'databuff', None)
+                    or getattr(client, '_szbspend', None) or getattr(client, '_ackbuff', None)
+                    or getattr(client, '_send_seq', 0) != getattr(client, '_acked_seq', 0))
+
+    def _healthy(self, client):
+        soc = client._soc
+        if soc.fileno() == -1:
+            return False
+        timeout = soc.gettimeout()
+        soc.setblocking(False)
+        try:
+            soc.recv(1, socket.MSG_PEEK)
+            return False  # b'' closed by peer, or stale data from previous request
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        finally:
+            soc.settimeout(timeout)
+        return self.health_check is None or self.health_check(client)
+
+    def acquire(self, host, port, timeout=None):
+        '''
+        lease connection to (host, port), reuse idle one or connect new one,
+        wait up to timeout (None: forever) when maxconns connections are leased
+        '''
+        key = (host, port)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('connection pool is closed')
+                idle = self._idle.setdefault(key, [])
+                now = time.monotonic()
+                while idle:
+                    client, lastused = idle.pop()
+                    if now - lastused > self.idle_timeout:
+                        self._stats['expired'] += 1
+                        self._close(client)
+                    elif self._healthy(client):
+                        self._stats['reused'] += 1
+                        self._leased[key] = self._leased.get(key, 0) + 1
+                        return client
+                    else:
+                        self._stats['discarded'] += 1
+                        self._close(client)
+                if self._leased.get(key, 0) < self.maxconns:
+                    self._leased[key] = self._leased.get(key, 0) + 1
+                    break
+                remain = None if deadline is None else deadline - time.monotonic()
+                if remain is not None and remain <= 0:
+                    raise TimeoutError(f'no connection to {key} available within {timeout} s')
+                self._cond.wait(remain)
+        try:  # connect outside the lock, other keys shouldn't wait for this handshake
+            client = self._connect(host, port)
+        except BaseException:
+            with self._cond:
+                self._leased[key] -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['created'] += 1
+        return client
+
+    def release(self, client, host, port, discard=False):
+        '''
+        return leased connection, discard=True close it (broken or in unknown state)
+        '''
+        key = (host, port)
+        with self._cond:
+            self._leased[key] -= 1
+            discard = discard or self._buffered(client)
+            if discard or self._closed:
+                self._stats['discarded'] += discard
+                self._close(client)
+            else:
+                idle = self._idle.setdefault(key, [])
+                idle.append((client, time.monotonic()))
+                now = time.monotonic()
+                while idle and now - idle[0][1] > self.idle_timeout:  # oldest first
+                    self._stats['expired'] += 1
+                    self._close(idle.pop(0)[0])
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def lease(self, host, port, timeout=None):
+        client = self.acquire(host, port, timeout)
+        try:
+            yield client
+        except BaseException:
+            self.release(client, host, port, discard=True)
+            raise
+        self.release(client, host, port)
+
+    def close(self):
+        '''
+        close all idle connections, leased ones are closed when returned
+        '''
+        with self._cond:
+            self._closed = True
+            for idle in self._idle.values():
+                for client, _ in idle:
+                    self._close(client)
+            self._idle.clear()
+            self._cond.notify_all()
@@ -1,12 +1,17 @@
 
 
-__version__ = (2024, 3, 5, 'alpha')
+__version__ = (2026, 10, 19, 'alpha')
 
 
 import http.server
 import socketserver
 import base64
 import json
+import time
+import queue
+import threading
+import collections
+from concurrent.futures import Future, ThreadPoolExecutor
 
 
 class Request():
@@ -107,9 +112,21 @@ class Simple_Request_Handler(http.server.BaseHTTPRequestHandler):
             message = json.dumps(message).encode()
             content_type = 'application/json'
         self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(message)))  # body framing, required for keep-alive
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        elif self.request_version == 'HTTP/1.0':  # HTTP/1.0 client asked for keep-alive
+            self.send_header('Connection', 'keep-alive')
         self.end_headers()
         self.wfile.write(message)
 
+    def send_error(self, code, message=None, explain=None):
+        # base send_error call send_response(code, message) then add its own headers and body,
+        # which breaks with send_response above that already write a complete response
+        self.log_error('code %d, message %s', code, message)
+        self.close_connection = True
+        self.send_response(code, {'error': message or self.responses.get(code, ('',))[0]})
+
     def do_GET(self):
         return self.common_response(self.get_request())
 
@@ -126,6 +143,249 @@ class Simple_Request_Handler(http.server.BaseHTTPRequestHandler):
         self.send_response(200, request.asdict())
 
 
+class Keepalive_Request_Handler(Simple_Request_Handler):
+    '''
+    Simple_Request_Handler over HTTP/1.1 persistent connection, many requests per connection
+        Note:
+            - wait up to server.idle_timeout for next request, and server.request_timeout for each read
+              while a request is coming in, connection is closed on either timeout
+            - request body is framed by Content-Length, chunked request is refused (501) and connection closed
+    '''
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body are two writes, don't let delayed ACK stall the body
+
+    def handle_one_request(self):
+        self.connection.settimeout(getattr(self.server, 'idle_timeout', None))
+        try:
+            if not self.rfile.peek(1):  # closed by client
+                self.close_connection = True
+                return
+        except OSError:  # idle timeout or reset
+            self.close_connection = True
+            return
+        self.connection.settimeout(getattr(self.server, 'request_timeout', None))
+        super().handle_one_request()
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        if self.headers.get('Transfer-Encoding'):  # no Content-Length, next request can't be located
+            self.send_error(501, 'chunked request body not supported')
+            return False
+        return True
+
+
+class Threaded_HTTP_Server(socketserver.TCPServer):
+    '''
+    HTTP/1.1 keep-alive server, connections are served by a bounded pool of worker threads
+        Note:
+            - each connection hold one worker while it is open, when all max_workers are busy
+              new connections wait in listen backlog until a worker is free
+            - idle_timeout close idle keep-alive connection (free its worker), request_timeout limit
+              each read of a slow request
+        Example:
+            with Threaded_HTTP_Server(('127.0.0.1', 5500), max_workers=32) as server:
+                server.serve_forever()
+    '''
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, RequestHandlerClass=Keepalive_Request_Handler, max_workers=16,
+                 request_timeout=10.0, idle_timeout=5.0, bind_and_activate=True):
+        self.max_workers = max_workers
+        self.request_timeout = request_timeout
+        self.idle_timeout = idle_timeout
+        self._workers = ThreadPoolExecutor(max_workers, thread_name_prefix='http_worker')
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._closing = threading.Event()  # set by shutdown, accept loop stop waiting for a free worker
+        super().__init__(server_address, RequestHandlerClass, bind_and_activate)
+
+    def serve_forever(self, poll_interval=0.5):
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self._closing.clear()
+
+    def shutdown(self):
+        self._closing.set()
+        super().shutdown()
+
+    def process_request(self, request, client_address):
+        while not self._slots.acquire(timeout=0.1):  # block accept loop instead of queueing accepted connections
+            if self._closing.is_set():
+                self.shutdown_request(request)
+                return
+        try:
+            self._workers.submit(self._serve_connection, request, client_address)
+        except RuntimeError:  # pool already shut down
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _serve_connection(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._workers.shutdown(wait=True)
+
+
+class Micro_Batcher():
+    '''
+    Gather concurrent single-sample requests into one batched predict call
+        Example:
+            batcher = Micro_Batcher(
+                lambda samples: model.predict(numpy.array(samples)[:, :, numpy.newaxis]).squeeze(axis=2).tolist(),
+                max_batch_size=64, max_wait=0.005)
+            with batcher:
+                output = batcher.submit([0.1, 0.2, 0.3])
+    '''
+
+    def __init__(self, predict_func, max_batch_size=32, max_wait=0.005):
+        self.predict_func = predict_func  # list of samples -> list of outputs (same order)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait  # seconds to keep gathering after first request in batch
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._submit_lock = threading.Lock()  # no request is queued after stop() drained the queue
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        with self._submit_lock:
+            self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        while True:  # fail request that will never be served
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError('batcher stopped'))
+
+    def submit(self, sample, timeout=None):
+        future = Future()
+        with self._submit_lock:
+            if self._stop_event.is_set():
+                raise RuntimeError('batcher stopped')
+            self._queue.put((sample, future))
+        return future.result(timeout)
+
+    def _serve(self):
+        while not self._stop_event.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            queue_depth = self._queue.qsize() + 1
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remain = deadline - time.monotonic()
+                if remain <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remain))
+                except queue.Empty:
+                    break
+            samples, futures = zip(*batch)
+            ref = time.perf_counter()
+            try:
+                outputs = list(self.predict_func(list(samples)))
+                if len(outputs) != len(futures):  # zip would leave some futures unresolved
+                    raise ValueError(f'predict_func returned {len(outputs)} outputs for {len(futures)} samples')
+            except Exception as err:
+                for future in futures:
+                    future.set_exception(err)
+            else:
+                for future, output in zip(futures, outputs):
+                    future.set_result(output)
+            with self._stats_lock:
+                self._queue_depth_hist[queue_depth] += 1
+                self._batch_size_hist[len(batch)] += 1
+                self._predict_time += time.perf_counter() - ref
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._queue_depth_hist = collections.Counter()
+            self._batch_size_hist = collections.Counter()
+            self._predict_time = 0.0
+
+    def stats(self):
+        with self._stats_lock:
+            batches = sum(self._batch_size_hist.values())
+            requests = sum(size * count for size, count in self._batch_size_hist.items())
+            return {
+                'requests': requests,
+                'batches': batches,
+                'mean_batch_size': requests / batches if batches else 0.0,
+                'mean_predict_time': self._predict_time / batches if batches else 0.0,
+                'queue_depth': self._queue.qsize(),
+                'queue_depth_hist': dict(sorted(self._queue_depth_hist.items())),
+                'batch_size_hist': dict(sorted(self._batch_size_hist.items())),
+            }
+
+
+class Batch_Predict_Handler(Simple_Request_Handler):
+    '''
+    POST {"input": [...]} to any path to get {"output": [...]}, GET /stats for batcher statistics
+    '''
+
+    def common_response(self, request):
+        if request.Method == 'GET' and request.Path == '/stats':
+            return self.send_response(200, self.server.batcher.stats())
+        if not isinstance(request.Content, (dict,)) or ('input' not in request.Content):
+            return self.send_response(400, {'error': 'expect json content with "input" field'})
+        try:
+            output = self.server.batcher.submit(request.Content['input'], timeout=self.server.predict_timeout)
+        except Exception as err:
+            return self.send_response(500, {'error': str(err)})
+        self.send_response(200, {'output': output})
+
+
+class Batch_Predict_Server(socketserver.ThreadingTCPServer):
+    '''
+    Threaded http server, each handler thread submits its request to one shared Micro_Batcher
+        Example:
+            with Batch_Predict_Server(('127.0.0.1', 5500), Micro_Batcher(predict_func)) as server:
+                server.serve_forever()
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, batcher, RequestHandlerClass=Batch_Predict_Handler, predict_timeout=10.0):
+        self.batcher = batcher
+        self.predict_timeout = predict_timeout
+        super().__init__(server_address, RequestHandlerClass)
+
+    def __enter__(self):
+        self.batcher.start()
+        return super().__enter__()
+
+    def __exit__(self, *args):
+        self.batcher.stop()
+        super().__exit__(*args)
+
+
 if __name__ == "__main__":
     with socketserver.TCPServer(
         server_address=('127.0.0.1', 5500),
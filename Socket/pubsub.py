@@ -0,0 +1,279 @@
+
+
+__version__ = (2026, 10, 19, 'alpha')
+
+
+import time
+import socket
+import logging
+import selectors
+import collections
+from nuuJoyLib.Socket.utils import user_socket, msgcls, msgparser, encode_msgs, sendmsg_all
+
+
+SUBSCRIBE = b'__sub__'  # control frame info, data is b'<mode>|<topic>'
+UNSUBSCRIBE = b'__unsub__'  # data is topic
+ALLTOPICS = b'*'
+
+
+def frame_topic(frame, syntax):
+    '''
+    topic (info block) of a raw v1 frame, without decoding the rest of the frame,
+    None if info block has no end marker (malformed frame)
+    '''
+    index = len(syntax['msgb'])
+    if not frame.startswith(syntax['infb'], index):
+        return b''
+    index += len(syntax['infb'])
+    end = frame.find(syntax['infe'], index)
+    return None if end < 0 else frame[index:end]
+
+
+class pubsub_broker(object):
+    '''
+    topic based publish/subscribe broker, one thread serve all producers and subscribers (selectors)
+        Purpose:
+            producers send user_socket messages (send_msgs) with topic as datainfo, broker forward
+            the received frame bytes as-is to every subscriber of that topic (frame is never re-encoded)
+        Note:
+            - subscriber mode 'all' get every message, its backlog is capped at max_pending bytes,
+              subscriber over the cap is disconnected (slow consumer must not hold the broker),
+              a single frame larger than the cap is still queued when nothing else is pending
+            - subscriber mode 'latest' get newest message per topic, unsent older one is replaced (conflated)
+            - wire protocol v1 frames (no negotiate_wire), same syntax word on all clients
+        Example:
+            with pubsub_broker('127.0.0.1', 13680) as broker:
+                broker.serve_forever()
+    '''
+
+    class peer(object):
+        def __init__(self, soc, address, syntax):
+            self.soc = soc
+            self.address = address
+            self.parser = msgparser(syntax, 'none')
+            self.topics = {}  # topic -> mode, subscriptions of this peer
+            self.queue = collections.deque()  # frames waiting to be sent ('all' mode)
+            self.latest = {}  # topic -> newest unsent frame ('latest' mode)
+            self.pending = 0  # bytes waiting in queue and latest
+            self.sending = None  # memoryview of frame partly sent
+            self.writing = False
+
+    def __init__(self, ipaddr='127.0.0.1', port=13680, syntax=None, max_pending=4 << 20, backlog=128,
+                 read_buffsize=65536):
+        self.ipaddr = ipaddr
+        self.port = port
+        self.syntax = dict(msgcls().syntax) if syntax is None else syntax
+        self.max_pending = max_pending  # per subscriber, bytes queued in 'all' mode before disconnect
+        self.backlog = backlog
+        self.read_buffsize = read_buffsize
+        self.peers = {}  # socket -> peer
+        self.subscribers = collections.defaultdict(set)  # topic -> peers
+        self._stats = collections.Counter()
+        self._soc = None
+        self._selector = None
+
+    def __enter__(self):
+        self._soc = socket.create_server((self.ipaddr, self.port), backlog=self.backlog)
+        self._soc.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._soc, selectors.EVENT_READ)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for peer in list(self.peers.values()):
+            self._drop(peer)
+        self._selector.close()
+        self._soc.close()
+
+    def stats(self):
+        return dict(self._stats, peers=len(self.peers),
+                    topics={topic: len(peers) for topic, peers in self.subscribers.items() if peers})
+
+    def _accept(self):
+        try:
+            soc, address = self._soc.accept()
+        except BlockingIOError:
+            return
+        soc.setblocking(False)
+        soc.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.peers[soc] = self.peer(soc, address, self.syntax)
+        self._selector.register(soc, selectors.EVENT_READ, self.peers[soc])
+        logging.debug(f'pubsub peer connected {address}')
+
+    def _drop(self, peer):
+        if self.peers.pop(peer.soc, None) is None:
+            return
+        for topic in peer.topics:
+            self.subscribers[topic].discard(peer)
+        self._selector.unregister(peer.soc)
+        peer.soc.close()
+        logging.debug(f'pubsub peer disconnected {peer.address}')
+
+    def _control(self, peer, info, data):
+        if info == SUBSCRIBE:
+            mode, _, topic = data.partition(b'|')
+            mode = mode.decode()
+            if not (mode in ('all', 'latest')):
+                logging.warning(f'pubsub peer {peer.address} invalid subscribe mode {mode}')
+                return
+            peer.topics[topic] = mode
+            self.subscribers[topic].add(peer)
+        elif info == UNSUBSCRIBE:
+            peer.topics.pop(data, None)
+            self.subscribers[data].discard(peer)
+            peer.latest.pop(data, None)
+
+    def publish(self, topic, frame):
+        '''
+        fan out one encoded frame to subscribers of topic (and of ALLTOPICS)
+        '''
+        self._stats['published'] += 1
+        for peer in self.subscribers.get(topic, set()) | self.subscribers.get(ALLTOPICS, set()):
+            mode = peer.topics.get(topic, peer.topics.get(ALLTOPICS))
+            if mode == 'latest':
+                previous = peer.latest.pop(topic, None)
+                if previous is not None:
+                    peer.pending -= len(previous)
+                    self._stats['conflated'] += 1
+                peer.latest[topic] = frame
+            else:
+                if peer.pending and peer.pending + len(frame) > self.max_pending:  # frame larger than cap still pass alone
+                    self._stats['dropped_subscribers'] += 1
+                    logging.warning(f'pubsub subscriber {peer.address} too slow, {peer.pending} bytes pending, disconnected')
+                    self._drop(peer)
+                    continue
+                peer.queue.append(frame)
+            peer.pending += len(frame)
+            self._flush(peer)
+
+    def _flush(self, peer):
+        # send as much as socket take now, wait for EVENT_WRITE for the rest
+        try:
+            while True:
+                if peer.sending is None:
+                    if peer.queue:
+                        frame = peer.queue.popleft()
+                    elif peer.latest:
+                        frame = peer.latest.pop(next(iter(peer.latest)))
+                    else:
+                        break
+                    peer.pending -= len(frame)
+                    peer.sending = memoryview(frame)
+                sent = peer.soc.send(peer.sending)
+                self._stats['bytes_sent'] += sent
+                if sent < len(peer.sending):
+                    peer.sending = peer.sending[sent:]
+                    break
+                peer.sending = None
+                self._stats['delivered'] += 1
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(peer)
+            return
+        writing = peer.sending is not None or bool(peer.queue) or bool(peer.latest)
+        if writing != peer.writing:
+            peer.writing = writing
+            self._selector.modify(peer.soc, selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0), peer)
+
+    def _read(self, peer):
+        try:
+            readbytes = peer.soc.recv(self.read_buffsize)
+        except BlockingIOError:
+            return
+        except OSError:
+            readbytes = b''
+        if not readbytes:
+            self._drop(peer)
+            return
+        peer.parser.feed(readbytes)
+        while (frame := peer.parser.next_frame()) is not None:
+            topic = frame_topic(frame, self.syntax)
+            if topic is None:
+                self._stats['malformed'] += 1
+                logging.warning(f'pubsub peer {peer.address} sent frame without info end marker, dropped')
+                continue
+            if topic in (SUBSCRIBE, UNSUBSCRIBE):
+                self._control(peer, topic, msgcls(frame, self.syntax, 'none').data)
+            else:
+                self.publish(topic, frame)
+
+    def poll(self, timeout=None):
+        for key, mask in self._selector.select(timeout):
+            if key.data is None:
+                self._accept()
+                continue
+            peer = key.data
+            if mask & selectors.EVENT_READ:
+                self._read(peer)
+            if (mask & selectors.EVENT_WRITE) and peer.soc in self.peers:
+                self._flush(peer)
+
+    def serve_forever(self, stop_event=None, poll_interval=0.1):
+        while not (stop_event and stop_event.is_set()):
+            self.poll(poll_interval)
+
+
+class pubsub_client(object):
+    '''
+    producer/subscriber side of pubsub_broker
+        Example:
+            with pubsub_client('127.0.0.1', 13680) as client:
+                client.subscribe(b'gamepad', latest=True)
+                msgs = client.recv(timeout=1.0)  # msgcls, msgs.info is topic
+            with pubsub_client('127.0.0.1', 13680) as producer:
+                producer.publish(b'gamepad', axis_bytes)
+    '''
+
+    def __init__(self, ipaddr='127.0.0.1', port=13680, syntax=None):
+        self.ipaddr = ipaddr
+        self.port = port
+        self._sock = user_socket(ipaddr, port, hashalgo='none')
+        if syntax is not None:
+            self._sock.syntax = self._sock._parser.syntax = syntax
+        self._soc = None
+
+    def __enter__(self):
+        self._soc = socket.create_connection((self.ipaddr, self.port))
+        self._soc.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._soc.close()
+
+    def publish(self, topic, data, timeout=None):
+        if topic in (SUBSCRIBE, UNSUBSCRIBE):
+            raise ValueError(f'topic {topic} is reserved')
+        self._sock.send_msgs(data, datainfo=topic, timeout=timeout, conn=self._soc, batch=True)
+
+    def subscribe(self, topic, latest=False):
+        '''
+        topic ALLTOPICS (b'*') subscribe to every topic, latest=True get newest message per topic only
+        '''
+        self._soc.settimeout(None)
+        sendmsg_all(self._soc, encode_msgs((b'latest|' if latest else b'all|') + topic, self._sock.syntax, SUBSCRIBE))
+
+    def unsubscribe(self, topic):
+        self._soc.settimeout(None)
+        sendmsg_all(self._soc, encode_msgs(topic, self._sock.syntax, UNSUBSCRIBE))
+
+    def recv(self, timeout=1.0, buff=65536):
+        '''
+        next message (msgcls, info is topic), None if nothing within timeout (None: wait forever),
+        raise ConnectionError if broker closed the connection
+        '''
+        parser = self._sock._parser
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (msgs := parser.next_msgs()) is None:
+            remain = None if deadline is None else deadline - time.monotonic()
+            if remain is not None and remain <= 0:
+                return None
+            self._soc.settimeout(remain)
+            try:
+                readbytes = self._soc.recv(buff)
+            except socket.timeout:
+                return None
+            if not readbytes:
+                raise ConnectionError(f'pubsub broker {self.ipaddr}:{self.port} closed the connection')
+            parser.feed(readbytes)
+        return msgs
@@ -0,0 +1,234 @@
+
+
+__version__ = (2026, 10, 19, 'alpha')
+
+
+import time
+import struct
+from multiprocessing import shared_memory, resource_tracker
+from nuuJoyLib.Socket.utils import msgcls
+
+
+class shm_ring(object):
+    '''
+    single-producer/single-consumer ring buffer over multiprocessing.shared_memory
+        Purpose:
+            same-host high-rate stream (camera frames, waveform capture) without socket copies,
+            producer write each message once into shared memory, consumer can read it in place (memoryview)
+        Note:
+            - exactly one producer process and one consumer process per ring
+            - each message is stored contiguously (record that doesn't fit before the end wrap to the start),
+              so one message can be at most half of ring size
+            - producer/consumer position are 8-byte aligned counters on their own cache line,
+              each written by one side only (no lock), loaded and stored whole through a native 'Q'
+              memoryview so the other process never see half-written value (struct '=Q' pack byte by byte)
+            - data is written before its position is published, relies on store ordering of the CPU
+              (x86, and in practice ARM64 given the interpreter work between the two stores)
+            - blocking read/write poll with short sleep, no cross-process wakeup
+        Example:
+            # producer process
+            with shm_ring('camera', size=64 << 20, create=True) as ring:
+                ring.send_msgs(frame.tobytes(), datainfo=b'frame')
+            # consumer process
+            with shm_ring('camera') as ring:
+                info, view = ring.recv_msgsview(timeout=1.0)  # view valid until next recv call
+                image = numpy.frombuffer(view, dtype=numpy.uint8).reshape(480, 640, 3)
+    '''
+    magic = b'NJSHMRNG'
+    control = struct.Struct('=8sQ')  # magic, capacity
+    record = struct.Struct('=IH')  # data length, info length
+    HEAD = 64  # producer position (total bytes written)
+    TAIL = 128  # consumer position (total bytes released)
+    DATA = 192
+    WRAP = 0xFFFFFFFF  # record length marker, rest of ring is unused, continue from start
+
+    def __init__(self, name=None, size=1 << 24, create=False, poll_interval=0.0005):
+        self.name = name
+        self.size = size  # data capacity in bytes (create only, consumer read it from shared memory)
+        self.create = create
+        self.poll_interval = poll_interval  # max sleep between checks while waiting
+        self._shm = None
+        self._buf = None
+        self._pos = None  # native 'Q' view of control area, positions are single aligned 8-byte load/store
+        self._capacity = 0
+        self._head = 0  # producer local copy of its position
+        self._tail = 0  # consumer local copy of its position
+        self._release = None  # consumer position to publish on next recv (record still lent out as view)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        if self.create:
+            capacity = (self.size + 7) & ~7
+            self._shm = shared_memory.SharedMemory(self.name, create=True, size=self.DATA + capacity)
+            self._buf = self._shm.buf
+            self.control.pack_into(self._buf, 0, self.magic, capacity)
+        else:
+            try:  # only creator should track (and unlink) the segment, Python 3.13+
+                self._shm = shared_memory.SharedMemory(self.name, track=False)
+            except TypeError:  # older Python register every attach, its tracker would unlink segment at exit
+                self._shm = shared_memory.SharedMemory(self.name)
+                resource_tracker.unregister(self._shm._name, 'shared_memory')
+            self._buf = self._shm.buf
+            magic, capacity = self.control.unpack_from(self._buf, 0)
+            if magic != self.magic:
+                self.close()
+                raise ValueError(f'shared memory {self.name} is not a shm_ring')
+        self._pos = self._buf[:self.DATA].cast('Q')
+        if self.create:
+            self._store(self.HEAD, 0)
+            self._store(self.TAIL, 0)
+        self.name = self._shm.name
+        self._capacity = self.control.unpack_from(self._buf, 0)[1]
+        self._head = self._load(self.HEAD)
+        self._tail = self._load(self.TAIL)
+        return self
+
+    def close(self):
+        '''
+        detach from shared memory (creator also unlink it), views from recv_msgsview must be released first
+        '''
+        if self._shm is None:
+            return
+        self._release = None
+        if self._pos is not None:
+            self._pos.release()
+            self._pos = None
+        self._buf = None
+        self._shm.close()
+        if self.create:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:  # already removed by another process
+                resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self._shm = None
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def _load(self, offset):
+        return self._pos[offset >> 3]
+
+    def _store(self, offset, value):
+        self._pos[offset >> 3] = value
+
+    def pending(self):
+        '''
+        bytes written by producer and not yet released by consumer
+        '''
+        return self._load(self.HEAD) - self._load(self.TAIL)
+
+    def _wait(self, ready, timeout):
+        if ready():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.0
+        while not ready():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(self.poll_interval, 2 * delay + 1e-5)
+        return True
+
+    def send_msgs(self, inputdata, datainfo=b'', timeout=None):
+        '''
+        write each item of inputdata as one message, wait up to timeout (None: forever, 0: don't wait)
+        for consumer to free space, raise TimeoutError if it doesn't
+        '''
+        if not isinstance(inputdata, (tuple, list,)):
+            inputdata = (inputdata,)
+        self._head = self._load(self.HEAD)  # another process may have produced before
+        for data in inputdata:
+            data = memoryview(data).cast('B')
+            size = (self.record.size + len(datainfo) + len(data) + 7) & ~7
+            if size > self._capacity // 2:
+                raise ValueError(f'message too large for ring, max {self._capacity // 2 - self.record.size} bytes')
+            offset = self._head % self._capacity
+            contiguous = self._capacity - offset
+            need = size if size <= contiguous else contiguous + size
+
+            def ready():
+                return self._capacity - (self._head - self._load(self.TAIL)) >= need
+
+            if not self._wait(ready, timeout):
+                raise TimeoutError(f'no space in ring within {timeout} s')
+            if size > contiguous:
+                self.record.pack_into(self._buf, self.DATA + offset, self.WRAP, 0)
+                self._head += contiguous
+                offset = 0
+            index = self.DATA + offset
+            self.record.pack_into(self._buf, index, len(data), len(datainfo))
+            index += self.record.size
+            self._buf[index:index + len(datainfo)] = datainfo
+            index += len(datainfo)
+            self._buf[index:index + len(data)] = data
+            self._head += size
+            self._store(self.HEAD, self._head)  # publish after data is in place
+
+    def _publish_release(self):
+        if self._release is not None:
+            self._tail, self._release = self._release, None
+            self._store(self.TAIL, self._tail)
+        else:
+            self._tail = self._load(self.TAIL)
+
+    def _next_record(self):
+        # (offset, data length, info length) of record at consumer position, skip wrap marker
+        offset = self._tail % self._capacity
+        datalen, infolen = self.record.unpack_from(self._buf, self.DATA + offset)
+        if datalen == self.WRAP:
+            self._tail += self._capacity - offset
+            offset = 0
+            datalen, infolen = self.record.unpack_from(self._buf, self.DATA)
+        return offset, datalen, infolen
+
+    def recv_msgsview(self, timeout=0.0, takelastonly=False):
+        '''
+        next message as (info, memoryview of data in shared memory), None if nothing within timeout
+        (0: non-blocking, None: wait forever)
+            view is only valid until next recv call, copy with bytes(view) to keep data
+            takelastonly: skip to newest message, return (info, view, dropped message count)
+        '''
+        self._publish_release()
+
+        def ready():
+            return self._load(self.HEAD) > self._tail
+
+        if not self._wait(ready, timeout):
+            return None
+        head = self._load(self.HEAD)
+        offset, datalen, infolen = self._next_record()
+        dropped = 0
+        if takelastonly:  # walk record headers only, no data is touched
+            while True:
+                size = (self.record.size + infolen + datalen + 7) & ~7
+                if self._tail + size >= head:
+                    break
+                self._tail += size
+                dropped += 1
+                offset, datalen, infolen = self._next_record()
+            if dropped:
+                self._store(self.TAIL, self._tail)
+        index = self.DATA + offset + self.record.size
+        info = bytes(self._buf[index:index + infolen])
+        view = self._buf[index + infolen:index + infolen + datalen]
+        self._release = self._tail + ((self.record.size + infolen + datalen + 7) & ~7)
+        return (info, view, dropped) if takelastonly else (info, view)
+
+    def recv_msgsstrm(self, timeout=0.0, takelastonly=False):
+        '''
+        next message as msgcls (data copied out of ring), None if nothing within timeout
+        '''
+        output = self.recv_msgsview(timeout, takelastonly)
+        if output is None:
+            return None
+        msgs = msgcls(None)
+        msgs.info, msgs.data = output[0], bytes(output[1])
+        output[1].release()
+        self._publish_release()
+        return msgs
@@ -1,26 +1,71 @@
 
 
-__version__ = (2023, 7, 20, 'alpha')
+__version__ = (2026, 10, 19, 'alpha')
 
 
+import os
+import stat
+import errno
+import hashlib
 import logging
 import time
+import queue
 import socket
+import selectors
+import threading
 from io import BytesIO
 import struct
+from nuuJoyLib.Socket.connpool import connection_pool
 
 
 def get_host_ipaddr():
     return socket.gethostbyname(socket.gethostname() + '.local')
 
 
+def remove_stale_unixpath(path):
+    '''
+    remove Unix domain socket file left by a server that is gone, so a new server can bind path
+        raise OSError (EADDRINUSE) if path is not a socket or a server still accept connections on it
+    '''
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EADDRINUSE, 'path exists and is not a Unix socket', path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:  # nobody listening, stale socket file
+            os.unlink(path)
+            return
+    raise OSError(errno.EADDRINUSE, 'another server is listening on Unix socket', path)
+
+
 class user_socket(object):
     READ_TIMEOUT = 0.1
     READ_BUFFSIZE = 1024
     SEND_DELAY = 0.1
+    # pipelined mode (send_pipelined/recv_pipelined), receiver acks each frame, sender keeps
+    # up to SEND_WINDOW frames in flight instead of sleeping SEND_DELAY after each send
+    SEND_WINDOW = 32
+    ACK_TIMEOUT = 5.0
+    # streaming receive (recv_long_into/recv_long_tofile/recv_long_iter), once a frame has
+    # started each recv may wait at most STREAM_TIMEOUT for the rest of it
+    STREAM_TIMEOUT = 5.0
+    STREAM_CHUNKSIZE = 1 << 20
+    _file_size = struct.Struct('!Q')  # send_file/recv_file, file size from sender, start offset confirmed by sender
+    _file_resume = struct.Struct('!Q16s')  # recv_file, bytes already on disk and digest of them
+    _seq_header = struct.Struct('!IQ')  # sequence number, data length
+    _seq_ack = struct.Struct('!I')  # count of frames received (cumulative ack)
+    _send_seq = 0
+    _acked_seq = 0
+    _recv_seq = 0
+    _ackbuff = b''
+    unixpath = None  # same-host Unix domain socket path instead of TCP address
 
     def __enter__(self):
-        self._soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._soc = socket.socket(socket.AF_UNIX if self.unixpath else socket.AF_INET, socket.SOCK_STREAM)
 
     def __exit__(self, exc_type, exc_value, traceback):
         self._soc.close()
@@ -51,7 +96,7 @@ class user_socket(object):
     def recv_long(self, frmt='L'):
         with BytesIO() as buff:
             self._soc.settimeout(self.READ_TIMEOUT)
-            bom = self._soc.recv(struct.calcsize(frmt))
+            bom = self._recv_exact(struct.calcsize(frmt))  # single recv may return part of header
             datalen = struct.unpack(frmt, bom)[0]
             ref = time.time()
             if self.READ_TIMEOUT is not None:
@@ -60,12 +105,12 @@ class user_socket(object):
                 time_limit = 86400
             while time.time() - ref < time_limit:
                 try:
-                    buff.write(self._soc.recv(datalen))
+                    buff.write(self._soc.recv(datalen - buff.tell()))
                 except socket.timeout:
                     pass
-                bytesdata = buff.getvalue()
-                if len(bytesdata) == datalen:
+                if buff.tell() == datalen:
                     break
+            bytesdata = buff.getvalue()
         return bytesdata
 
     def send_long(self, data, frmt='L'):
@@ -73,11 +118,225 @@ class user_socket(object):
         self._soc.sendall(bom + data)
         time.sleep(self.SEND_DELAY)
 
+    def _recv_exact_into(self, view):
+        index = 0
+        while index < len(view):
+            readbytes = self._soc.recv_into(view[index:])
+            if not readbytes:
+                raise ConnectionError('connection closed by peer')
+            index += readbytes
+        return index
+
+    def _recv_exact(self, nbytes):
+        buff = bytearray(nbytes)
+        with memoryview(buff) as view:
+            self._recv_exact_into(view)
+        return buff
+
+    def _recv_header(self, size, block, timeout):
+        '''
+        read exactly size header bytes, None if no frame started within READ_TIMEOUT (block=False)
+            after first byte arrived, rest of the frame is read with timeout
+        '''
+        self._soc.settimeout(None if block else self.READ_TIMEOUT)
+        try:
+            header = self._soc.recv(size)
+        except socket.timeout:
+            return None
+        if not header:
+            raise ConnectionError('connection closed by peer')
+        self._soc.settimeout(timeout)
+        if len(header) < size:
+            header += self._recv_exact(size - len(header))
+        return header
+
+    def _recv_long_header(self, frmt, block):
+        header = self._recv_header(struct.calcsize(frmt), block, self.STREAM_TIMEOUT)
+        return None if header is None else struct.unpack(frmt, header)[0]
+
+    def recv_long_into(self, buff=None, frmt='L', block=False):
+        '''
+        receive one send_long frame straight into buff (bytearray, numpy array, mmap, ...),
+        buff is allocated once at frame size if None
+            return memoryview of received data, None if no frame started
+            Example:
+                buff = bytearray(1 << 30)
+                view = conn.recv_long_into(buff)
+        '''
+        datalen = self._recv_long_header(frmt, block)
+        if datalen is None:
+            return None
+        if buff is None:
+            buff = bytearray(datalen)
+        view = memoryview(buff).cast('B')
+        if len(view) < datalen:
+            raise ValueError(f'buffer too small, frame has {datalen} bytes, buffer {len(view)}')
+        self._recv_exact_into(view[:datalen])
+        return view[:datalen]
+
+    def recv_long_iter(self, frmt='L', chunksize=None, block=False):
+        '''
+        iterator of one send_long frame as chunks of at most chunksize bytes, O(chunksize) memory
+            return None if no frame started (empty frame give iterator of no chunk),
+            header is read right away, chunks are read as iterator is consumed
+            Example:
+                chunks = conn.recv_long_iter()
+                for chunk in (chunks or ()):
+                    digest.update(chunk)
+        '''
+        datalen = self._recv_long_header(frmt, block)
+        if datalen is None:
+            return None
+        return self._recv_chunks(datalen, chunksize)
+
+    def _recv_chunks(self, datalen, chunksize=None):
+        chunksize = self.STREAM_CHUNKSIZE if chunksize is None else chunksize
+        buff = bytearray(min(chunksize, datalen))
+        with memoryview(buff) as view:
+            while datalen:
+                readbytes = self._soc.recv_into(view[:min(datalen, len(view))])
+                if not readbytes:
+                    raise ConnectionError('connection closed by peer')
+                datalen -= readbytes
+                yield bytes(view[:readbytes])
+
+    def recv_long_tofile(self, file, frmt='L', chunksize=None, block=False):
+        '''
+        write one send_long frame into file (path or binary file object) chunk by chunk
+            return number of bytes written, None if no frame started
+        '''
+        datalen = self._recv_long_header(frmt, block)
+        if datalen is None:
+            return None
+        fileobj = open(file, 'wb') if isinstance(file, (str, bytes,)) or hasattr(file, '__fspath__') else file
+        try:
+            self._recv_tofileobj(fileobj, datalen, chunksize)
+        finally:
+            if fileobj is not file:
+                fileobj.close()
+        return datalen
+
+    def _recv_tofileobj(self, fileobj, nbytes, chunksize=None):
+        chunksize = self.STREAM_CHUNKSIZE if chunksize is None else chunksize
+        with memoryview(bytearray(max(1, min(chunksize, nbytes)))) as view:
+            while nbytes:
+                readbytes = self._soc.recv_into(view[:min(nbytes, len(view))])
+                if not readbytes:
+                    raise ConnectionError('connection closed by peer')
+                fileobj.write(view[:readbytes])
+                nbytes -= readbytes
+
+    @staticmethod
+    def _file_digest(fileobj, nbytes, chunksize=1 << 20):
+        # blake2b of first nbytes of file, sender check it before resuming on receiver's partial file
+        digest = hashlib.blake2b(digest_size=16)
+        fileobj.seek(0)
+        while nbytes > 0:
+            readbytes = fileobj.read(min(chunksize, nbytes))
+            if not readbytes:
+                break
+            digest.update(readbytes)
+            nbytes -= len(readbytes)
+        return digest.digest()
+
+    def send_file(self, path):
+        '''
+        send file with socket.sendfile (kernel copy straight from page cache), peer should call recv_file
+            peer reply with how many bytes it already has and their digest, only the rest is sent (resume
+            interrupted transfer) if digest match first bytes of this file, else whole file is sent again
+            return number of bytes sent
+        '''
+        with open(path, 'rb') as fileobj:
+            filesize = os.fstat(fileobj.fileno()).st_size
+            self._soc.settimeout(self.STREAM_TIMEOUT)
+            self._soc.sendall(self._file_size.pack(filesize))
+            offset, digest = self._file_resume.unpack(self._recv_exact(self._file_resume.size))
+            if offset > filesize:
+                raise ValueError(f'invalid resume offset {offset} for file size {filesize}')
+            if offset and digest != self._file_digest(fileobj, offset):  # peer's file is not a copy of this one
+                offset = 0
+            self._soc.sendall(self._file_size.pack(offset))
+            if offset == filesize:
+                return 0
+            return self._soc.sendfile(fileobj, offset, filesize - offset)
+
+    def recv_file(self, path, resume=True, chunksize=None, block=False):
+        '''
+        receive file sent by send_file into path, written to disk chunk by chunk
+            resume: keep existing partial file and ask sender only for the missing part, else overwrite,
+                    sender check digest of the partial file first, file that isn't a prefix of sent one is overwritten
+            return number of bytes received, None if no transfer started
+        '''
+        header = self._recv_header(self._file_size.size, block, self.STREAM_TIMEOUT)
+        if header is None:
+            return None
+        filesize = self._file_size.unpack(header)[0]
+        offset = os.path.getsize(path) if resume and os.path.isfile(path) else 0
+        if offset > filesize:  # not a partial copy of this file
+            offset = 0
+        with open(path, 'r+b' if offset else 'wb') as fileobj:
+            digest = self._file_digest(fileobj, offset) if offset else bytes(16)
+            self._soc.sendall(self._file_resume.pack(offset, digest))
+            start = self._file_size.unpack(self._recv_exact(self._file_size.size))[0]
+            if start not in (0, offset):
+                raise ValueError(f'invalid start offset {start} from sender, expect 0 or {offset}')
+            offset = start
+            fileobj.seek(offset)
+            fileobj.truncate()  # offset 0: sender refused partial file
+            self._recv_tofileobj(fileobj, filesize - offset, chunksize)
+        return filesize - offset
+
+    def _read_acks(self, block):
+        self._soc.settimeout(self.ACK_TIMEOUT if block else 0.0)
+        try:
+            readbytes = self._soc.recv(4096)
+        except (BlockingIOError, socket.timeout) as err:
+            if block:
+                raise TimeoutError(f'no ack from peer within {self.ACK_TIMEOUT} s') from err
+            return
+        if not readbytes:
+            raise ConnectionError('connection closed by peer')
+        readbytes = self._ackbuff + readbytes
+        acksize = self._seq_ack.size
+        self._ackbuff = readbytes[len(readbytes) - len(readbytes) % acksize:]
+        if len(readbytes) >= acksize:
+            ack = self._seq_ack.unpack_from(readbytes, len(readbytes) - len(readbytes) % acksize - acksize)[0]
+            self._acked_seq += (ack - self._acked_seq) & 0xFFFFFFFF
+
+    def send_pipelined(self, data):
+        '''
+        send frame without fixed delay, block only when SEND_WINDOW frames are waiting for ack
+            peer should receive with recv_pipelined, connection is one-way (acks come back on it)
+        '''
+        while self._send_seq - self._acked_seq >= self.SEND_WINDOW:
+            self._read_acks(block=True)
+        self._soc.settimeout(None)
+        self._soc.sendall(self._seq_header.pack(self._send_seq & 0xFFFFFFFF, len(data)) + data)
+        self._send_seq += 1
+        self._read_acks(block=False)
+
+    def wait_acked(self):
+        while self._send_seq != self._acked_seq:
+            self._read_acks(block=True)
+
+    def recv_pipelined(self, block=False):
+        header = self._recv_header(self._seq_header.size, block, self.ACK_TIMEOUT)
+        if header is None:
+            return None
+        seq, datalen = self._seq_header.unpack(header)
+        if seq != (self._recv_seq & 0xFFFFFFFF):
+            raise ValueError(f'unexpected frame sequence {seq}, expect {self._recv_seq & 0xFFFFFFFF}')
+        data = bytes(self._recv_exact(datalen))
+        self._recv_seq += 1
+        self._soc.sendall(self._seq_ack.pack(self._recv_seq & 0xFFFFFFFF))
+        return data
+
 
 class server_socket(user_socket):
-    def __init__(self, ipaddr, port, backlog=16):
+    def __init__(self, ipaddr, port, backlog=16, unixpath=None):
         self._backlog = backlog
-        if ipaddr is None:
+        self.unixpath = unixpath
+        if ipaddr is None and unixpath is None:
             self.ipaddr = get_host_ipaddr()
         else:
             self.ipaddr = ipaddr
@@ -93,31 +352,255 @@ class server_socket(user_socket):
 
     def __enter__(self):
         super().__enter__()
-        logging.debug(f'server binding to ipaddr: {self.ipaddr}, port: {self.port}')
-        self._soc.bind((self.ipaddr, self.port))
+        if self.unixpath:
+            remove_stale_unixpath(self.unixpath)  # stale socket file of previous server, never a live one
+            logging.debug(f'server binding to unix socket: {self.unixpath}')
+            self._soc.bind(self.unixpath)
+        else:
+            logging.debug(f'server binding to ipaddr: {self.ipaddr}, port: {self.port}')
+            self._soc.bind((self.ipaddr, self.port))
         self._soc.listen(self._backlog)
         return self
 
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if self.unixpath and os.path.exists(self.unixpath):
+            os.unlink(self.unixpath)
+
     def accept_connection(self):
         self._curr_client = self.connection(self._soc)
         return self._curr_client
 
     def send_rawb(self, *args, **kwargs):
-        self._curr_client.send_rawb(*args, **kwargs)
+        return self._curr_client.send_rawb(*args, **kwargs)
 
     def recv_rawb(self, *args, **kwargs):
-        self._curr_client.recv_rawb(*args, **kwargs)
+        return self._curr_client.recv_rawb(*args, **kwargs)
 
     def send_long(self, *args, **kwargs):
-        self._curr_client.send_long(*args, **kwargs)
+        return self._curr_client.send_long(*args, **kwargs)
 
     def recv_long(self, *args, **kwargs):
-        self._curr_client.recv_long(*args, **kwargs)
+        return self._curr_client.recv_long(*args, **kwargs)
+
+    def recv_long_into(self, *args, **kwargs):
+        return self._curr_client.recv_long_into(*args, **kwargs)
+
+    def recv_long_iter(self, *args, **kwargs):
+        return self._curr_client.recv_long_iter(*args, **kwargs)
+
+    def recv_long_tofile(self, *args, **kwargs):
+        return self._curr_client.recv_long_tofile(*args, **kwargs)
+
+    def send_file(self, *args, **kwargs):
+        return self._curr_client.send_file(*args, **kwargs)
+
+    def recv_file(self, *args, **kwargs):
+        return self._curr_client.recv_file(*args, **kwargs)
+
+    def send_pipelined(self, *args, **kwargs):
+        return self._curr_client.send_pipelined(*args, **kwargs)
+
+    def wait_acked(self, *args, **kwargs):
+        return self._curr_client.wait_acked(*args, **kwargs)
+
+    def recv_pipelined(self, *args, **kwargs):
+        return self._curr_client.recv_pipelined(*args, **kwargs)
+
+
+class multi_server_socket(server_socket):
+    '''
+    selectors (epoll) based server, serve many clients from one thread
+        each complete send_long frame is passed to on_frame(client, data),
+        or put into frame_queue as (client, data) if no on_frame given,
+        client whose on_frame raise is logged and dropped, other clients are still served
+        client.send_long can be called from any thread, only the serving thread touch the selector
+        (other threads queue write requests and wake it through a socketpair)
+    Example:
+        with multi_server_socket('127.0.0.1', 13666) as server:
+            stop_event = threading.Event()
+            thread = threading.Thread(target=server.serve_forever, args=(stop_event,))
+            thread.start()
+            client, data = server.frame_queue.get()
+            client.send_long(data)
+            stop_event.set()
+            thread.join()  # before leaving "with", which close the selector
+    '''
+    _WAKEUP = 'wakeup'  # selector data of the wake-up socket
+    selector_class = selectors.DefaultSelector
+    class client(object):
+        def __init__(self, server, soc, ipaddr, frmt):
+            self._server = server
+            self._soc = soc
+            self.ipaddr = ipaddr
+            self._frmt = frmt
+            self._headsize = struct.calcsize(frmt)
+            self._inbuff = bytearray()
+            self._outbuff = bytearray()
+            self._lock = threading.Lock()
+            self.connected = True
+
+        def fileno(self):
+            return self._soc.fileno()
+
+        def send_long(self, data):
+            # try to send right away, only queue what the socket can't take now
+            frame = struct.pack(self._frmt, len(data)) + data
+            with self._lock:
+                if not self.connected:
+                    raise ConnectionError(f'client {self.ipaddr} disconnected')
+                if not self._outbuff:
+                    try:
+                        frame = frame[self._soc.send(frame):]
+                    except BlockingIOError:
+                        pass
+                if frame:
+                    self._outbuff += frame
+                    self._server._want_write(self)
+
+        def _flush(self):
+            with self._lock:
+                sent = self._soc.send(self._outbuff)
+                del self._outbuff[:sent]
+                return not self._outbuff
+
+        def _frames(self):
+            frames, index = [], 0
+            with memoryview(self._inbuff) as view:
+                while len(view) - index >= self._headsize:
+                    datalen = struct.unpack_from(self._frmt, view, index)[0]
+                    if len(view) - index - self._headsize < datalen:
+                        break
+                    index += self._headsize
+                    frames.append(bytes(view[index:index + datalen]))
+                    index += datalen
+            if index:
+                del self._inbuff[:index]
+            return frames
+
+    def __init__(self, ipaddr, port, backlog=128, on_frame=None, frmt='L', read_buffsize=65536, unixpath=None):
+        super().__init__(ipaddr, port, backlog, unixpath)
+        self.on_frame = on_frame
+        self.frame_queue = queue.Queue()
+        self.clients = {}  # socket -> client
+        self._frmt = frmt
+        self._read_buffsize = read_buffsize
+        self._selector = None
+        self._writers = queue.SimpleQueue()  # clients with new queued output, from any thread
+        self._wakeup_recv = self._wakeup_send = None
+
+    def __enter__(self):
+        super().__enter__()
+        self._soc.setblocking(False)
+        self._selector = self.selector_class()
+        self._selector.register(self._soc, selectors.EVENT_READ)
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._wakeup_send.setblocking(False)
+        self._selector.register(self._wakeup_recv, selectors.EVENT_READ, self._WAKEUP)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for client in list(self.clients.values()):
+            self._drop(client)
+        self._selector.close()
+        self._wakeup_recv.close()
+        self._wakeup_send.close()
+        super().__exit__(exc_type, exc_value, traceback)
+
+    def _accept(self):
+        try:
+            soc, ipaddr = self._soc.accept()
+        except BlockingIOError:
+            return
+        soc.setblocking(False)
+        client = self.client(self, soc, ipaddr, self._frmt)
+        self.clients[soc] = client
+        self._selector.register(soc, selectors.EVENT_READ, client)
+        logging.debug(f'client connected {ipaddr}')
+
+    def _want_write(self, client):
+        # called from send_long on any thread, selector is updated by serving thread in _wakeup
+        self._writers.put(client)
+        try:
+            self._wakeup_send.send(b'\0')
+        except (BlockingIOError, OSError):  # buffer full (wake-up already pending) or server closed
+            pass
+
+    def _wakeup(self):
+        try:
+            while self._wakeup_recv.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                client = self._writers.get_nowait()
+            except queue.Empty:
+                break
+            if client.connected and (client._soc in self.clients):
+                self._selector.modify(client._soc, selectors.EVENT_READ | selectors.EVENT_WRITE, client)
+
+    def _drop(self, client):
+        with client._lock:
+            client.connected = False
+        if self.clients.pop(client._soc, None) is not None:
+            self._selector.unregister(client._soc)
+        client._soc.close()
+        logging.debug(f'client disconnected {client.ipaddr}')
+
+    def _dispatch(self, client, data):
+        if self.on_frame is None:
+            self.frame_queue.put((client, data))
+        else:
+            self.on_frame(client, data)
+
+    def poll(self, timeout=None):
+        for key, mask in self._selector.select(timeout):
+            if key.data is None:
+                self._accept()
+                continue
+            if key.data is self._WAKEUP:
+                self._wakeup()
+                continue
+            client = key.data
+            if mask & selectors.EVENT_READ:
+                try:
+                    readbytes = client._soc.recv(self._read_buffsize)
+                except BlockingIOError:
+                    readbytes = None
+                except OSError:
+                    readbytes = b''
+                if readbytes == b'':
+                    self._drop(client)
+                    continue
+                if readbytes:
+                    client._inbuff += readbytes
+                    try:
+                        for data in client._frames():
+                            self._dispatch(client, data)
+                    except Exception:  # bad frame for this client's handler, don't take the server down
+                        logging.exception(f'on_frame fail, client {client.ipaddr} dropped')
+                        self._drop(client)
+                        continue
+            if (mask & selectors.EVENT_WRITE) and client.connected:
+                try:
+                    if client._flush():
+                        self._selector.modify(client._soc, selectors.EVENT_READ, client)
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    self._drop(client)
+
+    def serve_forever(self, stop_event=None, poll_interval=0.1):
+        while not (stop_event and stop_event.is_set()):
+            self.poll(poll_interval)
 
 
 class client_socket(user_socket):
-    def __init__(self, server_ipaddr, server_port):
-        if server_ipaddr is None:
+    def __init__(self, server_ipaddr, server_port, unixpath=None):
+        self.unixpath = unixpath
+        if server_ipaddr is None and unixpath is None:
             self.server_ipaddr = get_host_ipaddr()
         else:
             self.server_ipaddr = server_ipaddr
@@ -125,6 +608,23 @@ class client_socket(user_socket):
 
     def __enter__(self):
         super().__enter__()
-        logging.debug(f'client connect to ipaddr: {self.server_ipaddr}, port: {self.server_port}')
-        self._soc.connect((self.server_ipaddr, self.server_port))
+        if self.unixpath:
+            logging.debug(f'client connect to unix socket: {self.unixpath}')
+            self._soc.connect(self.unixpath)
+        else:
+            logging.debug(f'client connect to ipaddr: {self.server_ipaddr}, port: {self.server_port}')
+            self._soc.connect((self.server_ipaddr, self.server_port))
         return self
+
+
+class client_pool(connection_pool):
+    '''
+    pool of connected client_socket, keyed by (server_ipaddr, server_port)
+    Example:
+        pool = client_pool(maxconns=4)
+        with pool.lease('127.0.0.1', 13666) as client:
+            client.send_pipelined(b'request')
+            client.wait_acked()
+    '''
+    def __init__(self, maxconns=8, idle_timeout=60.0, keepalive=30, health_check=None):
+        super().__init__(client_socket, maxconns, idle_timeout, keepalive, health_check)
@@ -1,15 +1,18 @@
 #!/usr/bin/python3
 
 
+import os
 import time
+import queue
 import socket
 import threading
 import multiprocessing
 import multiprocessing.managers
-from nuuJoyLib.Socket.utils import user_socket
+from nuuJoyLib.Socket.utils import user_socket, remove_stale_unixpath
+from nuuJoyLib.Socket.connpool import connection_pool
 
 
-__version__ = (2021,12,27,'beta')
+__version__ = (2026,10,19,'beta')
 
 
 class server_socket(user_socket):
@@ -24,6 +27,10 @@ class server_socket(user_socket):
         if __name__ == '__main__':
         with server_socket() as server:
             server.start_echo_server(method='recv_msgsszbsstrm',silent=True)
+        # same-host IPC over Unix domain socket, same message API
+        with server_socket(unixpath='/tmp/acquisition.sock') as server:
+            with server.client_accept() as conn:
+                msgs = server.recv_msgs(conn=conn)
     '''
     class client_conn(object):
         def __init__(self,conn):
@@ -32,10 +39,16 @@ class server_socket(user_socket):
             return self._conn
         def __exit__(self,*args):
             self._conn.close()
-    def __init__(self,addr=None,port=(13666,13667,13668,13669,13670,)):
-        super(server_socket,self).__init__(addr,port)
+    def __init__(self,addr=None,port=(13666,13667,13668,13669,13670,),unixpath=None):
+        super(server_socket,self).__init__(addr,port,unixpath=unixpath)
     def __enter__(self):
         super(server_socket,self).__enter__()
+        if self.unixpath:
+            remove_stale_unixpath(self.unixpath) # stale socket file of previous server, never a live one
+            print('starting server with Unix socket:{} ...'.format(self.unixpath))
+            self._soc.bind(self.unixpath)
+            self._soc.listen(1)
+            return self
         portflag = False
         for self._useport in self._port:
             print('starting server with IP:{}, port:{} ...'.format(self.IPAddr,self._useport))
@@ -51,11 +64,14 @@ class server_socket(user_socket):
         self._soc.listen(1) # backlog = 1
         print('listen for connection')
         return self
+    def __exit__(self,exc_type,exc_value,traceback):
+        super(server_socket,self).__exit__(exc_type,exc_value,traceback)
+        if self.unixpath and os.path.exists(self.unixpath): os.unlink(self.unixpath)
     def client_accept(self,timeout=None):
         print('waiting for client to connect ...')
         conn, addr = self._soc.accept() # blocks and waits for an incoming connection
         if timeout: conn.settimeout(timeout)
-        print('client connected Addr {}, port:{}'.format(*addr))
+        print('client connected Addr {}, port:{}'.format(*addr) if isinstance(addr,tuple) else 'client connected Unix socket:{}'.format(self.unixpath))
         return self.client_conn(conn)
     def start_echo_server(self,method='recv_rawb',timeout=1.0,delay=0.0,reverse=False,silent=False):
         while True:
@@ -109,16 +125,21 @@ class client_socket(user_socket):
     Client socket wrapper
         Purpose:
             simply start client, make a request, recieve data, then disconnect
+            (use client_pool to keep connections open for request-heavy client)
         Example:
             if __name__ == '__main__':
             with client_socket() as client:
                 client.send_data((','.join([str(num) for num in range(1000)])).encode())
                 data = client.recv_data(buff=1024,timeout=10.0)
     '''
-    def __init__(self,IPAddr=None,port=(13666,13667,13668,13669,13670,)):
-        super(client_socket,self).__init__(IPAddr,port)
+    def __init__(self,IPAddr=None,port=(13666,13667,13668,13669,13670,),unixpath=None):
+        super(client_socket,self).__init__(IPAddr,port,unixpath=unixpath)
     def __enter__(self,addrprtc='IPv4',scktprtc='TCP'):
         super(client_socket,self).__enter__()
+        if self.unixpath:
+            self._soc.connect(self.unixpath)
+            print('server connected')
+            return self
         portflag = False
         for self._useport in self._port:
             try:
@@ -132,7 +153,78 @@ class client_socket(user_socket):
         return self
 
 
+class client_pool(connection_pool):
+    '''
+    Pool of connected client_socket, keyed by (IPAddr, port)
+        Purpose:
+            reuse connection across requests instead of connect (and port scan) per request
+        Example:
+            pool = client_pool(maxconns=4)
+            with pool.lease('192.168.1.10',13666) as client:
+                client.send_msgs(b'request')
+                data = client.recv_msgs()
+    '''
+    def __init__(self,maxconns=8,idle_timeout=60.0,keepalive=30,health_check=None):
+        super(client_pool,self).__init__(client_socket,maxconns,idle_timeout,keepalive,health_check)
+
+
+class batchqueue(object):
+    '''
+    server-side queue wrapper for mySyncMngr, add batch operations that move many items per manager round trip
+    '''
+    def __init__(self,queue):
+        self.queue = queue
+    def put(self,item,block=True,timeout=None):
+        self.queue.put(item,block,timeout)
+    def get(self,block=True,timeout=None):
+        return self.queue.get(block,timeout)
+    def put_nowait(self,item):
+        self.queue.put_nowait(item)
+    def get_nowait(self):
+        return self.queue.get_nowait()
+    def qsize(self):
+        return self.queue.qsize()
+    def empty(self):
+        return self.queue.empty()
+    def full(self):
+        return self.queue.full()
+    def put_many(self,items,timeout=None): # return number of items put, stop early if queue stay full until timeout (one deadline for whole batch)
+        deadline = None if timeout is None else time.monotonic()+timeout
+        for count,item in enumerate(items):
+            try:
+                self.queue.put(item,True,None if deadline is None else max(0.0,deadline-time.monotonic()))
+            except queue.Full:
+                return count
+        return len(items)
+    def get_many(self,maxitems=1024,timeout=None): # wait up to timeout for first item, then take what is queued (up to maxitems)
+        items = []
+        try:
+            items.append(self.queue.get(True,timeout))
+            while len(items) < maxitems:
+                items.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+batchqueueproxy = multiprocessing.managers.MakeProxyType('batchqueueproxy',('put','get','put_nowait','get_nowait','qsize',
+                                                                            'empty','full','put_many','get_many'))
+
+
 class mySyncMngr(multiprocessing.managers.SyncManager,):
+    '''
+    SyncManager that serve named queues over network
+        Purpose:
+            queuename (any number of names) are registered on both server and client side as mngr.<name>(),
+            queue created later on server with mngr.queue(name,maxsize), same call on client get its proxy
+        Note:
+            each proxy call is one manager round trip, use put_many/get_many to move many items per trip
+        Example:
+            with mySyncMngr(startserver=True,queuename=('upstrm','dnstrm',)) as server:
+                server.serve_forever_thread()
+            with mySyncMngr(address=(ipaddr,13999),queuename=('upstrm','dnstrm',)) as client:
+                upstrm = client.upstrm()
+                upstrm.put_many([sample for sample in samples])
+                batch = client.dnstrm().get_many(maxitems=256,timeout=0.1)
+    '''
     def __init__(self,address=None,authkey=b'default',startserver=False,
                  queuename=('upstrm','dnstrm',),queuesize=(0,0,),managerQueue=False):
         if not(address):
@@ -148,25 +240,27 @@ class mySyncMngr(multiprocessing.managers.SyncManager,):
             self.initaddr = address
         self.authkey      = authkey
         self.startserver  = startserver
-        self.queuename    = list(queuename) + ['null' for _ in range(8-len(list(queuename)))]
-        self.queuesize    = list(queuesize) + [0 for _ in range(8-len(list(queuename)))]
-        # portal registeration
-        self.server_queue = {}    
+        self.queuename    = list(queuename)
+        self.queuesize    = list(queuesize) + [0 for _ in range(len(self.queuename)-len(list(queuesize)))]
+        self.managerQueue = managerQueue
+        # portal registeration, any number of queue
+        self.server_queue = {}
+        self._queuelock   = threading.Lock()
         for qname,qsize in zip(self.queuename,self.queuesize):
-            if managerQueue:
-                self.server_queue.update({qname:multiprocessing.Manager().Queue(maxsize=qsize),})
-            else:
-                self.server_queue.update({qname:multiprocessing.Queue(maxsize=qsize),})
-        mySyncMngr.register(self.queuename[0], callable=lambda:self.server_queue[self.queuename[0]])
-        mySyncMngr.register(self.queuename[1], callable=lambda:self.server_queue[self.queuename[1]])
-        mySyncMngr.register(self.queuename[2], callable=lambda:self.server_queue[self.queuename[2]])
-        mySyncMngr.register(self.queuename[3], callable=lambda:self.server_queue[self.queuename[3]])
-        mySyncMngr.register(self.queuename[4], callable=lambda:self.server_queue[self.queuename[4]])
-        mySyncMngr.register(self.queuename[5], callable=lambda:self.server_queue[self.queuename[5]])
-        mySyncMngr.register(self.queuename[6], callable=lambda:self.server_queue[self.queuename[6]])
-        mySyncMngr.register(self.queuename[7], callable=lambda:self.server_queue[self.queuename[7]])
+            self.server_queue.update({qname:self._new_queue(qsize),})
+            mySyncMngr.register(qname,callable=lambda qname=qname:self.server_queue[qname],proxytype=batchqueueproxy)
+        mySyncMngr.register('queue',callable=self._get_queue,proxytype=batchqueueproxy) # dynamic queue by name
         # init super class
         super().__init__(self.initaddr,self.authkey)
+    def _new_queue(self,qsize=0):
+        if self.managerQueue:
+            return batchqueue(multiprocessing.Manager().Queue(maxsize=qsize))
+        return batchqueue(multiprocessing.Queue(maxsize=qsize))
+    def _get_queue(self,qname,qsize=0): # run on server, create queue on first request
+        with self._queuelock:
+            if not(qname in self.server_queue):
+                self.server_queue[qname] = self._new_queue(qsize)
+            return self.server_queue[qname]
     def __enter__(self):
         if self.startserver:
             print('Starting new server... {}'.format(self.initaddr))
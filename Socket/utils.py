@@ -1,16 +1,33 @@
 #!/usr/bin/python3
 
 
+import os
+import stat
 import time
+import errno
 import socket
 import select
 import subprocess
 import uuid
+import zlib
+import lzma
+import struct
 import hashlib
+import weakref
+import functools
 from cryptography.fernet import Fernet as fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+try: # numpy is optional, only used by send_array/recv_array
+    import numpy
+except ModuleNotFoundError:
+    numpy = None
 
 
-__version__ = (2021,12,29,'beta')
+__version__ = (2026,10,19,'beta')
 
 
 def getHostMACAddress():
@@ -43,6 +60,9 @@ class ciphers():
         return self._suite.encrypt(bytedata)
     def decrypt(self,ncypdata):
         return self._suite.decrypt(ncypdata)
+@functools.lru_cache(maxsize=16)
+def _cachedciphers(key): # reuse Fernet suite of recently seen keys instead of building one per message
+    return ciphers(key)
 def encrypt(bytedata,key=None):
     if not(key): key = fernet.generate_key()
     suite = fernet(key)
@@ -51,6 +71,134 @@ def decrypt(bytedata,key):
     return fernet(key).decrypt(bytedata)
 
 
+class sessioncipher():
+    '''
+    per-connection AEAD cipher (AES-GCM or ChaCha20-Poly1305) with counter nonce
+        Purpose:
+            one key pair per connection (from X25519 exchange), raw binary output, 16 bytes overhead per message
+        Note:
+            - nonce is never sent, both side count messages, so frames must be decrypted in sending order
+            - each direction has its own key, so the two counters never share a nonce
+            - msgv2 frame header and info block are authenticated as associated data (see msgv2.aad)
+    '''
+    algorithms = ('aesgcm','chacha20')
+    overhead   = 16 # AEAD tag bytes added to each message
+    _aeadclass = {'aesgcm':AESGCM,'chacha20':ChaCha20Poly1305}
+    def __init__(self,sendkey,recvkey,algorithm='aesgcm'):
+        if not(algorithm in self.algorithms):
+            raise ValueError('invalid session algorithm, expect one of {} (got {})'.format(self.algorithms,algorithm))
+        self.algorithm  = algorithm
+        self._sendaead  = self._aeadclass[algorithm](sendkey)
+        self._recvaead  = self._aeadclass[algorithm](recvkey)
+        self._sendcount = 0
+        self._recvcount = 0
+    @staticmethod
+    def _nonce(count):
+        return struct.pack('!4xQ',count) # 96 bits nonce
+    @classmethod
+    def from_exchange(cls,privkey,peerpubkey,algorithm='aesgcm',psk=None):
+        ownpubkey = privkey.public_key().public_bytes(serialization.Encoding.Raw,serialization.PublicFormat.Raw)
+        shared = privkey.exchange(X25519PublicKey.from_public_bytes(peerpubkey))
+        lowkey,highkey = sorted((ownpubkey,peerpubkey))
+        keys = HKDF(algorithm=hashes.SHA256(),length=64,salt=psk,info=b'nuuJoyLib-session'+lowkey+highkey).derive(shared)
+        if ownpubkey == lowkey:
+            return cls(keys[:32],keys[32:],algorithm)
+        return cls(keys[32:],keys[:32],algorithm)
+    def encrypt(self,bytedata,aad=None):
+        ncypdata = self._sendaead.encrypt(self._nonce(self._sendcount),bytedata,aad)
+        self._sendcount += 1
+        return ncypdata
+    def decrypt(self,ncypdata,aad=None):
+        try:
+            bytedata = self._recvaead.decrypt(self._nonce(self._recvcount),ncypdata,aad)
+        except InvalidTag:
+            raise ValueError('session decryption fail, message tampered or out of order')
+        self._recvcount += 1
+        return bytedata
+    def skip(self,nums=1): # account for received messages that are dropped without decryption
+        self._recvcount += nums
+
+
+# integrity check algorithm, index is used as algorithm id in msgv2 flags
+hashalgos = ('none','md5','crc32','blake2b')
+hashers   = {'none':None,
+             'md5':lambda bytedata: hashlib.md5(bytedata).digest(),
+             'crc32':lambda bytedata: struct.pack('!I',zlib.crc32(bytedata)),
+             'blake2b':lambda bytedata: hashlib.blake2b(bytedata,digest_size=16).digest()}
+def hashfunc(hashalgo):
+    if not(hashalgo in hashers):
+        raise ValueError('invalid hash algorithm, expect one of {} (got {})'.format(hashalgos,hashalgo))
+    return hashers[hashalgo]
+
+
+class compressor(object):
+    '''
+    adaptive per-message compression stage (wire protocol v2)
+        Purpose:
+            compress large and compressible payload only, small payload or payload that sample
+            doesn't compress well enough is sent as-is, method is signalled in frame flags
+        Example:
+            sock.compressor = compressor('zlib',level=6,minsize=1024)
+            print(sock.compressor.stats())
+    '''
+    methods = ('none','zlib','lzma') # index is used as method id in msgv2 flags
+    def __init__(self,method='zlib',level=6,minsize=512,minratio=0.9,samplesize=4096):
+        if not(method in self.methods):
+            raise ValueError('invalid compression method, expect one of {} (got {})'.format(self.methods,method))
+        self.method     = method
+        self.level      = level
+        self.minsize    = minsize    # payload smaller than this is never compressed
+        self.minratio   = minratio   # compressed/original size must be below this to be worth it
+        self.samplesize = samplesize # bytes of payload head used to estimate ratio before full compression
+        self.reset_stats()
+    def reset_stats(self):
+        self._stats = {'compressed':0,'skipped_small':0,'skipped_incompressible':0,'decompressed':0,
+                       'bytes_in':0,'bytes_out':0,'compress_time':0.0,'decompress_time':0.0}
+    def stats(self):
+        stats = dict(self._stats)
+        stats['bytes_saved'] = stats['bytes_in']-stats['bytes_out']
+        return stats
+    def _compress(self,data):
+        if self.method == 'zlib':
+            return zlib.compress(data,self.level)
+        return lzma.compress(data,preset=self.level)
+    def compress(self,data): # return (method,payload)
+        if (self.method == 'none') or (len(data) < self.minsize):
+            self._stats['skipped_small'] += 1
+            return 'none', data
+        ref = time.perf_counter()
+        try:
+            if len(data) > 2*self.samplesize: # cheap estimate on sample first
+                sample = data[:self.samplesize]
+                if len(zlib.compress(sample,1)) > self.minratio*len(sample):
+                    self._stats['skipped_incompressible'] += 1
+                    return 'none', data
+            payload = self._compress(data)
+            if len(payload) > self.minratio*len(data):
+                self._stats['skipped_incompressible'] += 1
+                return 'none', data
+            self._stats['compressed'] += 1
+            self._stats['bytes_in'] += len(data)
+            self._stats['bytes_out'] += len(payload)
+            return self.method, payload
+        finally:
+            self._stats['compress_time'] += time.perf_counter()-ref
+    def decompress(self,method,payload):
+        ref = time.perf_counter()
+        data = decompress(method,payload)
+        self._stats['decompressed'] += 1
+        self._stats['decompress_time'] += time.perf_counter()-ref
+        return data
+def decompress(method,payload):
+    if method == 'zlib':
+        return zlib.decompress(payload)
+    elif method == 'lzma':
+        return lzma.decompress(payload)
+    elif method == 'none':
+        return payload
+    raise ValueError('invalid compression method {}'.format(method))
+
+
 class msgcls(object):
     '''
     message pattern for user_socket
@@ -66,33 +214,80 @@ class msgcls(object):
                                           'dtab':b'|dtab|','dtae':b'|dtae|',
                                           'infb':b'|infb|','infe':b'|infe|',
                                           'hshb':b'|hshb|','hshe':b'|hshe|',
-                                          'keyb':b'|keyb|','keye':b'|keye|'}):
+                                          'keyb':b'|keyb|','keye':b'|keye|'},hashalgo='md5'):
         self.syntax = syntax
+        self._hasher = hashfunc(hashalgo)
+        self._hashalgo = hashalgo
+        self._encdata = self._hashdata = None # encrypted data and hash cache, computed once per message
         if isinstance(inputphrase,(bytes,)):
             bgn_mrk,end_mrk = inputphrase.rfind(self.syntax['msgb']), inputphrase.rfind(self.syntax['msge'])
             if not ((bgn_mrk < 0) or (end_mrk < 0) or (end_mrk <= bgn_mrk)):
                 rfnmsg = inputphrase[bgn_mrk:(end_mrk+len(self.syntax['msge']))]
-                self._data = self._xtrct(rfnmsg,self.syntax['dtab'],self.syntax['dtae'])
-                self._info = self._xtrct(rfnmsg,self.syntax['infb'],self.syntax['infe'])
-                hash = self._xtrct(rfnmsg,self.syntax['hshb'],self.syntax['hshe'])
+                # locate data block once, then look for other blocks only in head/tail part (not whole data again)
+                dtab_mrk, dtae_mrk = rfnmsg.rfind(self.syntax['dtab']), rfnmsg.rfind(self.syntax['dtae'])
+                if not ((dtab_mrk < 0) or (dtae_mrk < 0) or (dtae_mrk <= dtab_mrk)):
+                    self._data = rfnmsg[(dtab_mrk+len(self.syntax['dtab'])):dtae_mrk]
+                    rfnhead, rfntail = rfnmsg[:dtab_mrk], rfnmsg[(dtae_mrk+len(self.syntax['dtae'])):]
+                else:
+                    self._data = None
+                    rfnhead = rfntail = rfnmsg
+                self._info = self._xtrct(rfnhead,self.syntax['infb'],self.syntax['infe'])
+                self._key = self._xtrct(rfntail,self.syntax['keyb'],self.syntax['keye']) or self._xtrct(rfnhead,self.syntax['keyb'],self.syntax['keye'])
+                self._ciphers = _cachedciphers(self._key) if self._key else None
+                if self._key and self._data: # data block is encrypted data, keep it as cache and decrypt once
+                    self._encdata, self._data = self._data, self._ciphers.decrypt(self._data)
+                hash = self._xtrct(rfntail,self.syntax['hshb'],self.syntax['hshe'])
                 if hash:
                     self._hash = True
-                    if hash != hashlib.md5(self.encryptdata).digest():
+                    if self._hasher and (hash != self.hash):
                         raise ValueError('data and hash not match.')
                 else:
                     self._hash = False
-                self._key = self._xtrct(rfnmsg,self.syntax['keyb'],self.syntax['keye'])
-                if self._key:
-                    self._ciphers = ciphers(self._key)
             else:
                 raise ValueError('invalid bytes input phrase syntax.')
         elif inputphrase is None:
             self._data = self._info = self._hash = self._key = self._ciphers = None
         else:
             raise ValueError('invalid input phrase, expect \'bytes\' or \'None\' (got {})'.format(inputphrase.__class__.__name__))
+    @classmethod
+    def from_v2(cls,frame,syntax=None,session=None,compstage=None,peercomp=None): # build msgcls from wire protocol v2 frame (see msgv2)
+        msgtype,flags,info,data,hash,key = msgv2.unpack(frame)
+        if flags&msgv2.FLAG_SESSION:
+            if session is None:
+                raise ValueError('session-encrypted message but no session on this connection')
+            data = session.decrypt(data,msgv2.aad(msgtype,flags,info,len(data),len(hash),len(key)))
+        method = compressor.methods[(flags&msgv2.COMPMASK)>>msgv2.COMPSHIFT]
+        if (peercomp is not None) and not(method in ('none',peercomp)): # peercomp: method announced by peer in negotiate_wire
+            raise ValueError('message compressed with {}, but peer negotiated {}'.format(method,peercomp))
+        if method != 'none':
+            data = compstage.decompress(method,data) if compstage else decompress(method,data)
+        msgs = cls(None,hashalgo=hashalgos[flags&msgv2.HASHMASK]) if syntax is None else cls(None,syntax,hashalgos[flags&msgv2.HASHMASK])
+        msgs._info = info if info else None
+        msgs.key = key if key else None
+        if msgs.key and data:
+            msgs._encdata, msgs._data = data, msgs._ciphers.decrypt(data)
+        else:
+            msgs._data = data
+        if hash and msgs._hasher:
+            msgs.hash = hash
+        else:
+            msgs._hash = bool(hash)
+        return msgs
+    @property
+    def hashalgo(self):
+        return self._hashalgo
+    @hashalgo.setter
+    def hashalgo(self,newhashalgo):
+        self._hasher = hashfunc(newhashalgo)
+        self._hashalgo = newhashalgo
+        self._hashdata = None
     @property
     def encryptdata(self):
-        return self._ciphers.encrypt(self.data) if self.key else self.data
+        if not self.key:
+            return self.data
+        if (self._encdata is None) and (self.data is not None):
+            self._encdata = self._ciphers.encrypt(self.data) # Fernet output is randomized, encrypt only once
+        return self._encdata
     @property
     def data(self):
         return self._data
@@ -101,6 +296,7 @@ class msgcls(object):
         if not (isinstance(newdata,(bytes,)) or (newdata is None)):
             raise TypeError('invalid data type, expect \'bytes\' (got {})'.format(newdata.__class__.__name__))
         self._data = newdata
+        self._encdata = self._hashdata = None
     @property
     def info(self):
         return self._info
@@ -111,16 +307,20 @@ class msgcls(object):
         self._info = newinfo
     @property
     def hash(self):
-        return hashlib.md5(self.encryptdata).digest() if (self._hash and self.encryptdata) else None
+        if not (self._hash and self._hasher and self.encryptdata):
+            return None
+        if self._hashdata is None:
+            self._hashdata = self._hasher(self.encryptdata)
+        return self._hashdata
     @hash.setter # pass True/False/None to turn on/off hashing, or pass bytes to do hash checking
     def hash(self,newhash):
         if isinstance(newhash,(bool,)) or (newhash is None):
             self._hash = True if newhash else None
         elif isinstance(newhash,(bytes,)):
-            if hash != self.hash:
+            self._hash = True
+            if newhash != self.hash:
+                self._hash = None
                 raise ValueError('data and hash not match.')
-            else:
-                self._hash = True
         else:
             raise TypeError('invalid hash setting type, expect \'bool\' or \'None\' (got {})'.format(newhash.__class__.__name__))
     @property
@@ -128,13 +328,14 @@ class msgcls(object):
         return self._key
     @key.setter
     def key(self,newkey):
+        self._encdata = self._hashdata = None
         if (newkey is None) or (newkey is False):
             self._ciphers = self._key = None
         elif newkey is True:
             self._key = fernet.generate_key()
             self._ciphers = ciphers(self._key)
         elif isinstance(newkey,(bytes,)):
-            self._ciphers = ciphers(newkey)
+            self._ciphers = _cachedciphers(newkey)
             self._key = newkey
         else:
             raise ValueError('invalid input key, expect \'bytes\', \'bool\' or \'None\' (got {})'.format(newkey.__class__.__name__))
@@ -152,6 +353,313 @@ class msgcls(object):
         return 'info: {}\ndata: {}\nencryptdata: {}\nhash: {}\nkey: {}\nphrase: {}\nphrasesize: {}\n'.format(self.info,self.data,self.encryptdata,self.hash,self.key,self.phrase,self.phrasesize)
 
 
+class msgv2(object):
+    '''
+    length-prefixed binary frame, wire protocol v2
+        Purpose:
+            fixed-size header carries every block length, so frame parsing cost O(1) and
+            binary data that contain syntax words can't break the frame
+        Frame:
+            header(magic,version,type,flags,infolen,datalen,hashlen,keylen) + info + data + hash + key
+    '''
+    magic     = b'NJ'
+    version   = 2
+    header    = struct.Struct('!2sBBHHQBH')
+    TYPE_MSGS = 0
+    TYPE_ARRAY = 1 # numpy array, info block is b'<dtype.str>|<shape>|' + datainfo (see user_socket.send_array)
+    HASHMASK  = 0x000F # flags bits for hash algorithm id (index of hashalgos)
+    FLAG_SESSION = 0x0010 # data is encrypted with connection's sessioncipher
+    COMPMASK  = 0x0060 # flags bits for compression method id (index of compressor.methods)
+    COMPSHIFT = 5
+    @classmethod
+    def pack(cls,data,info=b'',hash=b'',key=b'',msgtype=0,flags=0): # return list of frame segments
+        segments = [cls.header.pack(cls.magic,cls.version,msgtype,flags,len(info),len(data),len(hash),len(key))]
+        for block in (info,data,hash,key):
+            if block: segments.append(block)
+        return segments
+    @classmethod
+    def aad(cls,msgtype,flags,info,datalen,hashlen=0,keylen=0): # session associated data, header (type, flags, lengths) and info
+        return cls.header.pack(cls.magic,cls.version,msgtype,flags,len(info),datalen,hashlen,keylen)+info
+    @classmethod
+    def unpack_header(cls,buff,offset=0):
+        magic,version,msgtype,flags,infolen,datalen,hashlen,keylen = cls.header.unpack_from(buff,offset)
+        if (magic != cls.magic) or (version != cls.version):
+            raise ValueError('invalid v2 frame header (magic: {}, version: {})'.format(magic,version))
+        return msgtype,flags,infolen,datalen,hashlen,keylen
+    @classmethod
+    def framesize(cls,buff,offset=0):
+        _,_,infolen,datalen,hashlen,keylen = cls.unpack_header(buff,offset)
+        return cls.header.size+infolen+datalen+hashlen+keylen
+    @classmethod
+    def unpack(cls,frame): # return (msgtype,flags,info,data,hash,key)
+        msgtype,flags,infolen,datalen,hashlen,keylen = cls.unpack_header(frame)
+        with memoryview(frame) as view:
+            blocks, index = [], cls.header.size
+            for size in (infolen,datalen,hashlen,keylen):
+                blocks.append(bytes(view[index:index+size]))
+                index += size
+        return (msgtype,flags,*blocks)
+
+
+def wire_hello(version,compstage=None): # negotiate_wire hello data, b'<version>[|<capabilities>]'
+    if compstage and (compstage.method != 'none'):
+        return '{}|{}'.format(version,compstage.method).encode()
+    return str(version).encode()
+def parse_wire_hello(data): # return (peer version, compression method announced by peer)
+    fields = data.split(b'|',1)
+    capabilities = fields[1].decode().split(',') if len(fields) > 1 else []
+    return int(fields[0].decode()), next((cap for cap in capabilities if cap in compressor.methods),'none')
+
+
+def encode_msgs(data,syntax,datainfo=b'',hashalgo='none',version=1,session=None,compstage=None):
+    '''
+    encode one message for user_socket protocol, return list of frame segments (data is never copied)
+        version 1: syntax-word delimited frame, version 2: msgv2 frame with optional compression and session encryption
+    '''
+    hasher = hashfunc(hashalgo) if not(session and version == 2) else None # AEAD tag already authenticate session data
+    hash = hasher(data) if hasher else b''
+    if version == 2:
+        flags = hashalgos.index(hashalgo) if hasher else 0
+        if compstage: # compress before encryption, ciphertext doesn't compress
+            method,data = compstage.compress(data)
+            flags |= compressor.methods.index(method)<<msgv2.COMPSHIFT
+        if session: # header (flags, lengths) and info are bound to ciphertext
+            flags |= msgv2.FLAG_SESSION
+            data = session.encrypt(data,msgv2.aad(msgv2.TYPE_MSGS,flags,datainfo,len(data)+session.overhead))
+        return msgv2.pack(data,datainfo,hash,flags=flags)
+    info_block = syntax['infb'] + datainfo + syntax['infe'] if datainfo else b''
+    hash_block = syntax['hshb'] + hash + syntax['hshe'] if hash else b''
+    return [syntax['msgb'] + info_block + syntax['dtab'], data, syntax['dtae'] + hash_block + syntax['msge']]
+
+
+try:
+    IOV_MAX = max(16,os.sysconf('SC_IOV_MAX')) # max buffers per sendmsg call
+except (AttributeError,ValueError,OSError):
+    IOV_MAX = 1024
+COALESCE_SIZE = 16384 # segments smaller than this are joined before sendmsg, copy is cheaper than extra iovec
+def sendmsg_all(conn,segments):
+    '''
+    send list of buffers with scatter-gather socket.sendmsg, continue from where partial send stop
+        small segments (frame header/trailer, small payload) are joined, large payloads are sent from their own buffer (no copy)
+        fall back to sendall(b''.join(segments)) where sendmsg is not available (e.g. Windows)
+    '''
+    if not hasattr(conn,'sendmsg'):
+        conn.sendall(b''.join(segments))
+        return
+    total = 0
+    for segment in segments:
+        if not(isinstance(segment,bytes)): break
+        total += len(segment)
+    else:
+        if total < COALESCE_SIZE: # small frame(s), one copy and one syscall
+            conn.sendall(b''.join(segments))
+            return
+    buffers, small = [], []
+    for segment in segments:
+        if not(isinstance(segment,(bytes,bytearray,))): segment = memoryview(segment).cast('B')
+        if len(segment) < COALESCE_SIZE:
+            small.append(segment)
+            continue
+        if small:
+            buffers.append(b''.join(small))
+            small = []
+        buffers.append(segment)
+    if small: buffers.append(b''.join(small))
+    if len(buffers) == 1:
+        conn.sendall(buffers[0])
+        return
+    index = 0
+    while index < len(buffers):
+        sent = conn.sendmsg(buffers[index:index+IOV_MAX])
+        while (index < len(buffers)) and (sent >= len(buffers[index])):
+            sent -= len(buffers[index])
+            index += 1
+        if sent:
+            buffers[index] = memoryview(buffers[index])[sent:]
+
+
+class msgparser(object):
+    '''
+    incremental frame parser for user_socket message stream
+        Purpose:
+            scan each received byte once for end-of-message marker, keep scan offset across reads
+            and hand out frames without re-copying the remainder
+        Example:
+            parser = msgparser(syntax)
+            parser.feed(conn.recv(4096))
+            for msg in parser: # msgcls of every complete frame
+                print(msg.data)
+    '''
+    def __init__(self,syntax,hashalgo='md5'):
+        self.syntax = syntax
+        self.hashalgo = hashalgo # v1 frame doesn't tell its hash algorithm, both side should use the same one
+        self.session = None # sessioncipher of the connection being parsed (v2 only)
+        self.compressor = None # compressor that count decompression stats (v2 only, optional)
+        self.peercomp = None # compression method negotiated by peer, other method is rejected (v2 only, None: not checked)
+        self._buff = bytearray()
+        self._bgn  = 0 # start of unparsed data
+        self._scan = 0 # next position to search for end-of-message marker
+        self.version = 1 # wire protocol, 1: syntax-word delimited, 2: length-prefixed (msgv2)
+    def __len__(self): # unparsed bytes
+        return len(self._buff)-self._bgn
+    def __iter__(self):
+        msgs = self.next_msgs()
+        while msgs is not None:
+            yield msgs
+            msgs = self.next_msgs()
+    @property
+    def remainder(self):
+        return bytes(self._buff[self._bgn:])
+    def clear(self):
+        self._buff = bytearray()
+        self._bgn = self._scan = 0
+    def feed(self,data):
+        if self._bgn and (self._bgn*2 >= len(self._buff)): # compact once consumed part dominates, amortized O(1) per byte
+            del self._buff[:self._bgn]
+            self._scan -= self._bgn
+            self._bgn = 0
+        self._buff += data
+    def need(self): # bytes still missing for next v2 frame (0 if unknown or v1)
+        if (self.version != 2) or (len(self) < msgv2.header.size):
+            return 0
+        return max(0,msgv2.framesize(self._buff,self._bgn)-len(self))
+    def _frame_end(self): # end of next complete frame, None if not complete yet
+        if self.version == 2:
+            if len(self) < msgv2.header.size:
+                return None
+            index = self._bgn+msgv2.framesize(self._buff,self._bgn)
+            return index if index <= len(self._buff) else None
+        msge = self.syntax['msge']
+        index = self._buff.find(msge,self._scan)
+        if index < 0:
+            self._scan = max(self._bgn,len(self._buff)-len(msge)+1) # marker may be split between reads
+            return None
+        return index+len(msge)
+    def next_frame(self):
+        index = self._frame_end()
+        if index is None:
+            return None
+        with memoryview(self._buff) as view:
+            frame = bytes(view[self._bgn:index])
+        self._bgn = self._scan = index
+        return frame
+    def last_frame(self):
+        '''
+        skip to the newest complete frame, return (frame, number of older frames skipped), frame is None if no complete frame
+            skipped frames are only walked over (marker search or v2 header), never copied or decoded,
+            session counter is advanced for skipped session-encrypted frames
+        '''
+        bgn, dropped, encrypted = None, -1, 0
+        index = self._frame_end()
+        while index is not None:
+            if (bgn is not None) and self.session and (msgv2.unpack_header(self._buff,bgn)[1]&msgv2.FLAG_SESSION):
+                encrypted += 1
+            bgn, dropped = self._bgn, dropped+1
+            self._bgn = self._scan = index
+            index = self._frame_end()
+        if bgn is None:
+            return None, 0
+        if encrypted: self.session.skip(encrypted)
+        with memoryview(self._buff) as view:
+            frame = bytes(view[bgn:self._bgn])
+        return frame, dropped
+    def _decode(self,frame):
+        return msgcls.from_v2(frame,self.syntax,self.session,self.compressor,self.peercomp) if self.version == 2 else msgcls(frame,self.syntax,self.hashalgo)
+    def next_msgs(self):
+        frame = self.next_frame()
+        if frame is None:
+            return None
+        return self._decode(frame)
+    def last_msgs(self): # (msgcls of newest complete frame or None, number of older frames dropped), see last_frame
+        frame, dropped = self.last_frame()
+        return (None if frame is None else self._decode(frame)), dropped
+    def take(self,size): # take raw bytes (up to size) that follow the last frame
+        index = min(self._bgn+size,len(self._buff))
+        with memoryview(self._buff) as view:
+            data = bytes(view[self._bgn:index])
+        self._bgn = index
+        self._scan = max(self._scan,index)
+        return data
+
+
+class recvbuffer(object):
+    '''
+    reusable receive buffer for socket.recv_into
+        Purpose:
+            receive into preallocated bytearray with adaptive chunk size, hand out memoryview (no copy)
+        Note:
+            - view is only valid until next clear/recv on the same buffer, use bytes(view) to keep data
+            - buffer is grown by reallocation (never resized in place) so exported views stay valid
+    '''
+    def __init__(self,size=65536,minchunk=1024,maxchunk=4194304):
+        self._buff = bytearray(size)
+        self._size = 0
+        self.minchunk = minchunk
+        self.maxchunk = maxchunk
+        self.chunk = minchunk
+    def __len__(self):
+        return self._size
+    @property
+    def view(self):
+        return memoryview(self._buff)[:self._size]
+    def clear(self):
+        self._size = 0
+    def reserve(self,nbytes):
+        if self._size+nbytes > len(self._buff):
+            newbuff = bytearray(max(self._size+nbytes,2*len(self._buff)))
+            newbuff[:self._size] = memoryview(self._buff)[:self._size]
+            self._buff = newbuff
+    def find(self,sub,start=0):
+        return self._buff.find(sub,start,self._size)
+    def recv_into(self,conn):
+        chunk = max(self.chunk,self.minchunk)
+        self.reserve(chunk)
+        with memoryview(self._buff) as view:
+            nbytes = conn.recv_into(view[self._size:self._size+chunk],chunk)
+        self._size += nbytes
+        if nbytes == chunk: # link keeps up, ask for more per syscall
+            self.chunk = min(2*chunk,self.maxchunk)
+        elif nbytes < chunk//4:
+            self.chunk = max(chunk//2,self.minchunk)
+        return nbytes
+    def extend(self,data):
+        self.reserve(len(data))
+        self._buff[self._size:self._size+len(data)] = data
+        self._size += len(data)
+    def recv_exact(self,conn,nbytes): # append exactly nbytes (or less if connection closed)
+        self.reserve(nbytes)
+        end = self._size+nbytes
+        with memoryview(self._buff) as view:
+            while self._size < end:
+                readbytes = conn.recv_into(view[self._size:end])
+                if not readbytes:
+                    break
+                self._size += readbytes
+        return self._size-(end-nbytes)
+
+
+def remove_stale_unixpath(path):
+    '''
+    remove Unix domain socket file left by a server that is gone, so a new server can bind path
+        raise OSError (EADDRINUSE) if path is not a socket or a server still accept connections on it
+    '''
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not(stat.S_ISSOCK(mode)):
+        raise OSError(errno.EADDRINUSE,'path exists and is not a Unix socket',path)
+    probe = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError: # nobody listening, stale socket file
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE,'another server is listening on Unix socket',path)
+
+
 class user_socket(object):
     '''
     Native Python socket wrapper
@@ -159,11 +667,15 @@ class user_socket(object):
             Abstract class that contain simple send/recieve protocol.
             mainly use as server_socket and client_socket parent
     '''
-    def __init__(self,IPAddr=None,port=13666,msgb=None,msge=None,infb=None,infe=None,dtab=None,dtae=None,hshb=None,hshe=None,keyb=None,keye=None):
+    def __init__(self,IPAddr=None,port=13666,msgb=None,msge=None,infb=None,infe=None,dtab=None,dtae=None,hshb=None,hshe=None,keyb=None,keye=None,hashalgo='md5',unixpath=None):
         self._address_protocol = {'IPv4':socket.AF_INET,'IPv6':socket.AF_INET6}
+        if hasattr(socket,'AF_UNIX'): self._address_protocol['UNIX'] = socket.AF_UNIX
         self._socket_protocol  = {'TCP':socket.SOCK_STREAM,'UDP':socket.SOCK_DGRAM}
-        # connection info
-        if not IPAddr:
+        # connection info, unixpath: same-host Unix domain socket instead of TCP (no IP lookup, no TCP stack)
+        self.unixpath = unixpath
+        if unixpath:
+            self._IPAddr = None
+        elif not IPAddr:
             try:
                 s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
                 s.connect(('8.8.8.8', 80))
@@ -195,12 +707,21 @@ class user_socket(object):
                        'keye':b'|keye|' if keye is None else keye}
         # read buffer
         self.databuff = []
-        self.dataresd = b''
+        self._parser  = msgparser(self.syntax,hashalgo)
+        self._szbspend = None # v1 szbsstrm header whose data has not fully arrived yet
+        self._recvbuff = recvbuffer()
+        # compression stage for v2 frames, e.g. compressor('zlib',level=6), None to disable
+        self.compressor = None
+        # wire protocol version and session cipher of each connection, see negotiate_wire/negotiate_session
+        self._wirever = weakref.WeakKeyDictionary()
+        self._session = weakref.WeakKeyDictionary()
+        self._peercomp = weakref.WeakKeyDictionary()
         # encoder
         self._ciphers  = ciphers()
         self.encryptor = self._ciphers.encrypt
         self.decryptor = self._ciphers.decrypt
-        #hasher
+        # hasher, used when send_msgs(datahash=True) and to check v1 message hash
+        self.hashalgo = hashalgo
     @property
     def IPAddr(self):
         return self._IPAddr
@@ -210,11 +731,82 @@ class user_socket(object):
     @property
     def secrkey(self):
         return self._ciphers.key
+    @property
+    def hashalgo(self):
+        return self._hashalgo
+    @hashalgo.setter
+    def hashalgo(self,newhashalgo):
+        hashfunc(newhashalgo) # validate
+        self._hashalgo = self._parser.hashalgo = newhashalgo
+    @property
+    def dataresd(self):
+        return self._parser.remainder
+    @dataresd.setter
+    def dataresd(self,data):
+        self._parser.clear()
+        self._parser.feed(data)
+    @property
+    def transport(self):
+        return 'UNIX' if self.unixpath else 'IPv4'
     def __enter__(self):
-        self._soc = socket.socket(self._address_protocol['IPv4'],self._socket_protocol['TCP'])
+        self._soc = socket.socket(self._address_protocol[self.transport],self._socket_protocol['TCP'])
     def __exit__(self,exc_type, exc_value, traceback):
         self._soc.close()
         print('socket port closed')
+    def wire_version(self,conn=None):
+        return self._wirever.get(conn if conn else self._soc,1)
+    def negotiate_wire(self,conn=None,version=2,timeout=5.0):
+        '''
+        agree on wire protocol with peer, both side should call this right after connected
+            handshake is one msgv2 frame (info b'wirever', data b'<version>[|capabilities]'), peer's hello is read
+            by its length prefix, so hello of any size is consumed exactly and peer's next frame is left untouched,
+            then agreed version (lower one) is used on this connection
+            compression method of self.compressor is announced as capability, set compressor before negotiation,
+            frame compressed with any other method is rejected on receive
+        '''
+        if not conn: conn = self._soc
+        if timeout: conn.settimeout(timeout)
+        self._wirever[conn] = 1
+        sendmsg_all(conn,msgv2.pack(wire_hello(version,self.compressor),b'wirever'))
+        self._recvbuff.clear()
+        if self._recvbuff.recv_exact(conn,msgv2.header.size) != msgv2.header.size:
+            raise ConnectionError('connection closed during wire protocol negotiation')
+        remain = msgv2.framesize(self._recvbuff.view)-msgv2.header.size # rest of frame, by its block lengths
+        if self._recvbuff.recv_exact(conn,remain) != remain:
+            raise ConnectionError('connection closed during wire protocol negotiation')
+        _,_,info,data,_,_ = msgv2.unpack(self._recvbuff.view)
+        if info != b'wirever':
+            raise ValueError('wire protocol negotiation fail, got info {}'.format(info))
+        peerver,self._peercomp[conn] = parse_wire_hello(data)
+        self._wirever[conn] = min(version,peerver,msgv2.version)
+        return self._wirever[conn]
+    def peer_compression(self,conn=None): # compression method peer announced in negotiate_wire, None if not negotiated
+        return self._peercomp.get(conn if conn else self._soc)
+    def session(self,conn=None):
+        return self._session.get(conn if conn else self._soc)
+    def negotiate_session(self,conn=None,algorithm='aesgcm',psk=None,timeout=5.0):
+        '''
+        set up session encryption (AEAD, one key per connection) with peer, both side should call this after negotiate_wire
+            psk (optional shared secret bytes) is mixed into key derivation, peer without the same psk can't decrypt
+            Fernet (msgcls.key) is still available on any connection
+        '''
+        if not conn: conn = self._soc
+        if self.wire_version(conn) != 2:
+            raise ValueError('session encryption require wire protocol v2, call negotiate_wire first')
+        if not(algorithm in sessioncipher.algorithms):
+            raise ValueError('invalid session algorithm, expect one of {} (got {})'.format(sessioncipher.algorithms,algorithm))
+        if timeout: conn.settimeout(timeout)
+        privkey = X25519PrivateKey.generate()
+        hello = bytes([sessioncipher.algorithms.index(algorithm)]) + privkey.public_key().public_bytes(serialization.Encoding.Raw,serialization.PublicFormat.Raw)
+        self.send_rawb(hello,timeout=timeout,conn=conn)
+        self._recvbuff.clear()
+        if self._recvbuff.recv_exact(conn,len(hello)) != len(hello):
+            raise ConnectionError('connection closed during session negotiation')
+        reply = bytes(self._recvbuff.view)
+        if reply[0] != hello[0]:
+            raise ValueError('session algorithm not match with peer')
+        self._session[conn] = sessioncipher.from_exchange(privkey,reply[1:],algorithm,psk)
+        return self._session[conn]
     def conn_status(self):
         try:
             if self._soc.fileno() == -1:
@@ -230,84 +822,393 @@ class user_socket(object):
         if timeout: conn.settimeout(timeout)
         conn.sendall(data)
     def recv_rawb(self,conn=None,timeout=1.0,buff=1024):
+        return bytes(self.recv_rawbview(conn=conn,timeout=timeout,buff=buff))
+    def recv_rawbview(self,conn=None,timeout=1.0,buff=1024): # return memoryview, valid until next recv_*view call
         if not conn: conn = self._soc
         if timeout: conn.settimeout(timeout)
-        data = b''
-        datapart = True
-        while datapart:
+        self._recvbuff.clear()
+        self._recvbuff.minchunk = buff
+        while True:
             try:
-                datapart = conn.recv(buff)
-                if datapart: 
-                    data += datapart
+                if not self._recvbuff.recv_into(conn):
+                    break
             except socket.timeout:
-                datapart = None
+                break
             except ConnectionResetError:
-                datapart = None
-        return data
-    def send_msgs(self,inputdata,datainfo=b'',datahash=False,timeout=1.0,conn=None):
+                break
+        return self._recvbuff.view
+    def send_msgs(self,inputdata,datainfo=b'',datahash=False,timeout=1.0,conn=None,batch=False):
+        '''
+        send each item of inputdata as one message, frame segments go out with scatter-gather sendmsg (payload not copied)
+            datahash: True (use self.hashalgo), False or algorithm name, not sent on session-encrypted connection (AEAD tag already authenticate data)
+            batch: send all items together, up to IOV_MAX segments per syscall (many small messages, few syscalls)
+        '''
         if not(isinstance(inputdata,(tuple,list,))): inputdata = (inputdata,)
-        info_block = self.syntax['infb'] + datainfo + self.syntax['infe'] if datainfo else b''
+        hashalgo = datahash if isinstance(datahash,(str,)) else (self.hashalgo if datahash else 'none')
+        if not conn: conn = self._soc
+        if timeout: conn.settimeout(timeout)
+        syntax, version, session, compstage = self.syntax, self.wire_version(conn), self.session(conn), self.compressor
+        if batch:
+            sendmsg_all(conn,[segment for data in inputdata for segment in encode_msgs(data,syntax,datainfo,hashalgo,version,session,compstage)])
+            return
         for data in inputdata:
-            hash_block = self.syntax['hshb'] + hashlib.md5(data).digest() + self.syntax['hshe'] if datahash else b''
-            data_block = self.syntax['dtab'] + data + self.syntax['dtae']
-            self.send_rawb(self.syntax['msgb'] + info_block + data_block + hash_block + self.syntax['msge'],timeout=timeout,conn=conn)
+            sendmsg_all(conn,encode_msgs(data,syntax,datainfo,hashalgo,version,session,compstage))
+    def set_sockopts(self,conn=None,nodelay=None,sndbuf=None,rcvbuf=None):
+        '''
+        tune TCP socket, None leave option unchanged, return effective values
+            nodelay: True disable Nagle algorithm, small frames go out right away (control/latency-sensitive stream)
+            sndbuf/rcvbuf: kernel buffer size in bytes (Linux report double of requested),
+                           set before connect/listen to take effect on TCP window scaling
+            Example:
+                with client_socket('192.168.1.10') as client:
+                    client.set_sockopts(nodelay=True)
+        '''
+        if not conn: conn = self._soc
+        tcp = conn.family in (socket.AF_INET,socket.AF_INET6) # Unix domain socket has no Nagle
+        if tcp and (nodelay is not None): conn.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,int(bool(nodelay)))
+        if sndbuf is not None: conn.setsockopt(socket.SOL_SOCKET,socket.SO_SNDBUF,sndbuf)
+        if rcvbuf is not None: conn.setsockopt(socket.SOL_SOCKET,socket.SO_RCVBUF,rcvbuf)
+        return {'nodelay':bool(conn.getsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY)) if tcp else True,
+                'sndbuf':conn.getsockopt(socket.SOL_SOCKET,socket.SO_SNDBUF),
+                'rcvbuf':conn.getsockopt(socket.SOL_SOCKET,socket.SO_RCVBUF)}
+    def send_fds(self,fds,data=b'fds',timeout=1.0,conn=None):
+        '''
+        pass open file descriptors (files, sockets, pipes, shared memory) to peer process, Unix domain socket only
+            data (at least 1 byte) is sent along with descriptors, peer get its own duplicated descriptors
+            descriptors are lost if peer consume data with other recv_* (v1 reads ahead), so send when peer is waiting in recv_fds
+            or use negotiate_wire (v2 recv_msgs read exact frame size)
+            Example:
+                with open('/dev/shm/frame','rb') as file:
+                    client.send_fds([file.fileno()])
+        '''
+        if not conn: conn = self._soc
+        if conn.family != getattr(socket,'AF_UNIX',None):
+            raise ValueError('file descriptor passing require Unix domain socket (unixpath)')
+        if timeout: conn.settimeout(timeout)
+        fds = [fd if isinstance(fd,int) else fd.fileno() for fd in fds]
+        return socket.send_fds(conn,[data],fds)
+    def recv_fds(self,maxfds=16,buff=1024,timeout=1.0,conn=None):
+        '''
+        receive descriptors sent by send_fds, return (data, [fd, ...]), caller own (and should close) the descriptors
+        '''
+        if not conn: conn = self._soc
+        if conn.family != getattr(socket,'AF_UNIX',None):
+            raise ValueError('file descriptor passing require Unix domain socket (unixpath)')
+        if timeout: conn.settimeout(timeout)
+        data,fds,_,_ = socket.recv_fds(conn,buff,maxfds)
+        return data,fds
+    def send_array(self,array,datainfo=b'',datahash=False,timeout=1.0,conn=None):
+        '''
+        send numpy array as one msgv2 frame (TYPE_ARRAY), array buffer go to socket as-is (no tolist/tobytes)
+            dtype (with byte order, e.g. '<f8') and shape are put in frame info block ahead of datainfo, peer should call recv_array
+            frame is v2 on any wire version, session encryption is applied if negotiated, compression is not
+            non C-contiguous array (slice, transpose) is copied once into contiguous one
+            Example:
+                client.send_array(imu_batch,datainfo=b'imu')
+        '''
+        if numpy is None:
+            raise ModuleNotFoundError('send_array require numpy')
+        array = numpy.asarray(array)
+        if array.dtype.hasobject or (array.dtype.fields is not None) or (array.dtype.subdtype is not None):
+            raise ValueError('send_array support plain numeric dtype only (got {})'.format(array.dtype))
+        if not(array.flags.c_contiguous): array = numpy.ascontiguousarray(array)
+        if not conn: conn = self._soc
+        if timeout: conn.settimeout(timeout)
+        info = '{}|{}|'.format(array.dtype.str,','.join(str(size) for size in array.shape)).encode()+datainfo
+        data = memoryview(array.reshape(-1)).cast('B') if array.size else b''
+        hashalgo = datahash if isinstance(datahash,(str,)) else (self.hashalgo if datahash else 'none')
+        session = self.session(conn)
+        hasher = hashfunc(hashalgo) if not(session) else None # AEAD tag already authenticate session data
+        flags = hashalgos.index(hashalgo) if hasher else 0
+        hash = hasher(data) if hasher else b''
+        if session: # header (flags, lengths) and info are bound to ciphertext
+            flags |= msgv2.FLAG_SESSION
+            data = session.encrypt(data,msgv2.aad(msgv2.TYPE_ARRAY,flags,info,len(data)+session.overhead))
+        sendmsg_all(conn,msgv2.pack(data,info,hash,msgtype=msgv2.TYPE_ARRAY,flags=flags))
+    def _recv_exactinto(self,conn,view): # fill view, bytes left in stream parser (from recv_msgsstrm) first
+        index = 0
+        if len(self._parser):
+            readdata = self._parser.take(len(view))
+            index = len(readdata)
+            view[:index] = readdata
+        while index < len(view):
+            readbytes = conn.recv_into(view[index:])
+            if not readbytes:
+                raise ConnectionError('connection closed while receiving array frame')
+            index += readbytes
+    def _recv_exactbytes(self,conn,nbytes):
+        buff = bytearray(nbytes)
+        self._recv_exactinto(conn,memoryview(buff))
+        return buff
+    def recv_array(self,out=None,conn=None,timeout=1.0):
+        '''
+        receive array sent by send_array, return (array, datainfo)
+            array data is received straight into out (preallocated C-contiguous array of same dtype and size, reuse it
+            between calls) or into new buffer wrapped with numpy.frombuffer, no per-element conversion either way
+            array keep sender byte order, use array.astype(array.dtype.newbyteorder('=')) if native order is needed
+            Example:
+                image = numpy.empty((480,640,3),dtype=numpy.uint8)
+                while True:
+                    image,info = server.recv_array(out=image,conn=conn)
+        '''
+        if numpy is None:
+            raise ModuleNotFoundError('recv_array require numpy')
+        if not conn: conn = self._soc
+        if timeout: conn.settimeout(timeout)
+        msgtype,flags,infolen,datalen,hashlen,keylen = msgv2.unpack_header(self._recv_exactbytes(conn,msgv2.header.size))
+        info = bytes(self._recv_exactbytes(conn,infolen))
+        if msgtype != msgv2.TYPE_ARRAY:
+            self._recv_exactbytes(conn,datalen+hashlen+keylen) # drop whole frame, stream stay in sync
+            raise ValueError('expect array frame, got message type {} (info {})'.format(msgtype,info))
+        if flags&msgv2.COMPMASK:
+            self._recv_exactbytes(conn,datalen+hashlen+keylen)
+            raise ValueError('array frame is never compressed, got compression flags {:#x}'.format(flags&msgv2.COMPMASK))
+        dtype,shape,datainfo = info.split(b'|',2)
+        dtype = numpy.dtype(dtype.decode())
+        shape = tuple(int(size) for size in shape.split(b',') if size)
+        if out is None:
+            out = numpy.frombuffer(bytearray(dtype.itemsize*int(numpy.prod(shape))),dtype=dtype)
+        elif (out.dtype != dtype) or (out.size != int(numpy.prod(shape))) or not(out.flags.c_contiguous and out.flags.writeable):
+            self._recv_exactbytes(conn,datalen+hashlen+keylen) # drop whole frame, stream stay in sync
+            raise ValueError('out array {} {} can\'t hold received array {} {}'.format(out.dtype,out.shape,dtype,shape))
+        target = memoryview(out.reshape(-1)).cast('B') if out.size else memoryview(bytearray())
+        session = self.session(conn) if flags&msgv2.FLAG_SESSION else None
+        if flags&msgv2.FLAG_SESSION:
+            if session is None:
+                self._recv_exactbytes(conn,datalen+hashlen+keylen)
+                raise ValueError('session-encrypted message but no session on this connection')
+            plain = session.decrypt(bytes(self._recv_exactbytes(conn,datalen)),msgv2.aad(msgtype,flags,info,datalen,hashlen,keylen))
+            if len(plain) != len(target):
+                self._recv_exactbytes(conn,hashlen+keylen)
+                raise ValueError('array frame data size {} not match dtype/shape ({} bytes)'.format(len(plain),len(target)))
+            target[:] = plain
+        elif datalen != len(target):
+            self._recv_exactbytes(conn,datalen+hashlen+keylen) # drop whole frame, stream stay in sync
+            raise ValueError('array frame data size {} not match dtype/shape ({} bytes)'.format(datalen,len(target)))
+        else:
+            self._recv_exactinto(conn,target)
+        hash = bytes(self._recv_exactbytes(conn,hashlen)) if hashlen else b''
+        if keylen: self._recv_exactbytes(conn,keylen) # rest of frame is read before any check below
+        if hashlen:
+            hasher = hashfunc(hashalgos[flags&msgv2.HASHMASK])
+            if hasher and (hasher(target) != hash):
+                raise ValueError('array data hash mismatch')
+        return out.reshape(shape), datainfo
+    def _recvbuff_exact(self,conn,nbytes): # append nbytes to _recvbuff, bytes left in stream parser first
+        taken = self._parser.take(nbytes) if len(self._parser) else b''
+        self._recvbuff.extend(taken)
+        remain = nbytes-len(taken)
+        if remain and (self._recvbuff.recv_exact(conn,remain) != remain):
+            raise ConnectionError('connection closed in the middle of a message')
     def recv_msgs(self,conn=None,timeout=1.0,buff=1024):
+        view = self.recv_msgsview(conn=conn,timeout=timeout,buff=buff)
+        return msgcls.from_v2(view,self.syntax,self.session(conn),self.compressor,self.peer_compression(conn)) if self.wire_version(conn) == 2 else msgcls(bytes(view),self.syntax,self.hashalgo)
+    def recv_msgsview(self,conn=None,timeout=1.0,buff=1024): # return memoryview of raw message, valid until next recv_*view call
         if not conn: conn = self._soc
         if timeout: conn.settimeout(timeout)
-        data = b''
-        datapart = True
-        while datapart:
+        self._recvbuff.clear()
+        if self.wire_version(conn) == 2: # header tell exact frame size, no marker search
             try:
-                datapart = conn.recv(buff)
-                if datapart: 
-                    data += datapart
-                    if self.syntax['msge'] in data:
-                        break
+                self._recvbuff_exact(conn,msgv2.header.size)
+                self._recvbuff_exact(conn,msgv2.framesize(self._recvbuff.view)-msgv2.header.size)
+            except socket.timeout: # keep partial frame in stream parser, next call resume it
+                self._parser.feed(self._recvbuff.view)
+                raise
+            return self._recvbuff.view
+        self._recvbuff.minchunk = buff
+        scan = 0
+        while True:
+            try:
+                if not self._recvbuff.recv_into(conn):
+                    break
             except socket.timeout:
-                datapart = None
-        return msgcls(data,self.syntax)
+                break
+            if self._recvbuff.find(self.syntax['msge'],scan) >= 0:
+                break
+            scan = max(0,len(self._recvbuff)-len(self.syntax['msge'])+1) # only scan newly received part next time
+        return self._recvbuff.view
+    _fileoffs = struct.Struct('!Q') # send_file start offset, confirmed by sender after checking receiver's prefix
+    @staticmethod
+    def _file_digest(fileobj,nbytes,buff=1048576): # blake2b of first nbytes of file, identify partial copy to resume
+        digest = hashlib.blake2b(digest_size=16)
+        fileobj.seek(0)
+        while nbytes > 0:
+            readdata = fileobj.read(min(buff,nbytes))
+            if not readdata:
+                break
+            digest.update(readdata)
+            nbytes -= len(readdata)
+        return digest.hexdigest()
+    def send_file(self,path,timeout=5.0,conn=None):
+        '''
+        send file with socket.sendfile (kernel copy straight from page cache), peer should call recv_file
+            peer reply with how many bytes it already has and digest of them, only the rest is sent (resume interrupted
+            transfer) if digest match first bytes of this file, else the whole file is sent again
+            file data go raw on the wire (no msgs frame, hash or encryption), so not allowed on session-encrypted connection
+            return number of bytes sent
+        '''
+        if not conn: conn = self._soc
+        if self.session(conn):
+            raise ValueError('send_file send raw file data, not available on session-encrypted connection')
+        with open(path,'rb') as fileobj:
+            filesize = os.fstat(fileobj.fileno()).st_size
+            self.send_msgs('{}|{}'.format(filesize,os.path.basename(path)).encode(),datainfo=b'sendfile',timeout=timeout,conn=conn)
+            reply = self.recv_msgs(conn=conn,timeout=timeout)
+            if reply.info != b'fileoffs':
+                raise ValueError('file transfer fail, expect offset reply from peer (got info {})'.format(reply.info))
+            offset,digest = reply.data.decode().split('|',1)
+            offset = int(offset)
+            if not(0 <= offset <= filesize):
+                raise ValueError('invalid resume offset {} for file size {}'.format(offset,filesize))
+            if offset and (digest != self._file_digest(fileobj,offset)): # peer's partial file is not a copy of this one
+                offset = 0
+            if timeout: conn.settimeout(timeout)
+            conn.sendall(self._fileoffs.pack(offset))
+            if offset == filesize:
+                return 0
+            return conn.sendfile(fileobj,offset,filesize-offset)
+    def recv_file(self,path=None,resume=True,timeout=5.0,conn=None,buff=1048576):
+        '''
+        receive file sent by send_file, written to disk buff bytes at a time
+            path: target file, or directory to save with sender's file name (None: current directory)
+            resume: keep existing partial file and ask sender only for the missing part, else overwrite,
+                    sender check digest of the partial file first, a file that is not a prefix of sent one is overwritten
+            return (path, number of bytes received)
+            Example:
+                with server.client_accept() as conn:
+                    server.recv_file('/data/capture',conn=conn) # if interrupted, same call on a new connection continue from last byte on disk
+        '''
+        if not conn: conn = self._soc
+        header = self.recv_msgs(conn=conn,timeout=timeout)
+        if header.info != b'sendfile':
+            raise ValueError('file transfer fail, expect file header from peer (got info {})'.format(header.info))
+        filesize,filename = header.data.decode().split('|',1)
+        filesize,filename = int(filesize),os.path.basename(filename)
+        if path is None: path = filename
+        elif os.path.isdir(path): path = os.path.join(path,filename)
+        offset = os.path.getsize(path) if (resume and os.path.isfile(path)) else 0
+        if offset > filesize: offset = 0 # not a partial copy of this file
+        with open(path,'r+b' if offset else 'wb') as fileobj:
+            digest = self._file_digest(fileobj,offset) if offset else ''
+            self.send_msgs('{}|{}'.format(offset,digest).encode(),datainfo=b'fileoffs',timeout=timeout,conn=conn)
+            if timeout: conn.settimeout(timeout)
+            start = self._fileoffs.unpack(self._recv_exactbytes(conn,self._fileoffs.size))[0] # raw, no read-ahead into file data
+            if not(start in (0,offset)):
+                raise ValueError('invalid start offset {} from sender, expect 0 or {}'.format(start,offset))
+            offset = start
+            fileobj.seek(offset)
+            fileobj.truncate() # offset 0: sender refused partial file
+            remain = filesize-offset
+            with memoryview(bytearray(max(1,min(buff,remain)))) as view:
+                while remain:
+                    readbytes = conn.recv_into(view[:min(remain,len(view))])
+                    if not readbytes:
+                        raise ConnectionError('connection closed during file transfer, call recv_file again to resume')
+                    fileobj.write(view[:readbytes])
+                    remain -= readbytes
+        return path, filesize-offset
     def recv_msgsstrm(self,conn=None,timeout=1.0,buff=1024,takelastonly=False):
+        '''
+        next message from stream (frames that arrived together are decoded and queued), None if no complete frame yet
+            takelastonly: newest message only, older ones are dropped undecoded (see recv_msgslatest)
+        '''
+        if takelastonly:
+            return self.recv_msgslatest(conn=conn,timeout=timeout,buff=buff)[0]
         if conn is None: conn = self._soc
         if timeout: conn.settimeout(timeout)
+        self._parser.version = self.wire_version(conn)
+        self._parser.session = self.session(conn)
+        self._parser.compressor = self.compressor
+        self._parser.peercomp = self.peer_compression(conn)
         if not(self.databuff):
-            if not(self.syntax['msge'] in self.dataresd):
-                self.dataresd += conn.recv(buff)
-            while self.syntax['msge'] in self.dataresd:
-                index = (self.dataresd.find(self.syntax['msge'])+len(self.syntax['msge']))
-                self.databuff.append(msgcls(self.dataresd[:index],self.syntax))
-                self.dataresd = self.dataresd[index:]
-        if takelastonly:
-            output = self.databuff[-1]
+            self.databuff.extend(self._parser)
+            if not(self.databuff):
+                self._parser.feed(conn.recv(max(buff,self._parser.need())))
+                self.databuff.extend(self._parser)
+        return self.databuff.pop(0) if self.databuff else None
+    def recv_msgslatest(self,conn=None,timeout=1.0,buff=65536):
+        '''
+        conflating receive, return (newest message or None, number of older messages dropped)
+            read everything already arrived (wait up to timeout only if there is nothing), then skip to the last complete frame,
+            only that frame is decoded (hash check, decryption), older ones are dropped without building msgcls
+            Example:
+                msgs,dropped = client.recv_msgslatest(timeout=0.02) # gamepad state, stale ones are useless
+        '''
+        if conn is None: conn = self._soc
+        if timeout: conn.settimeout(timeout)
+        self._parser.version = self.wire_version(conn)
+        self._parser.session = self.session(conn)
+        self._parser.compressor = self.compressor
+        self._parser.peercomp = self.peer_compression(conn)
+        if not(self.databuff) and (self._parser._frame_end() is None):
+            try:
+                self._parser.feed(conn.recv(max(buff,self._parser.need())))
+            except socket.timeout:
+                return None, 0
+        while select.select([conn],[],[],0)[0]: # drain socket, newest frame may be right behind
+            readdata = conn.recv(max(buff,self._parser.need()))
+            if not readdata:
+                break
+            self._parser.feed(readdata)
+        msgs,dropped = self._parser.last_msgs()
+        if self.databuff: # decoded by earlier recv_msgsstrm, older than anything in parser
+            if msgs is None: msgs = self.databuff.pop()
+            dropped += len(self.databuff)
             self.databuff = []
-            return output
-        else:
-            return self.databuff.pop(0) if self.databuff else None
+        return msgs, dropped
     def send_msgsszbsstrm(self,inputdata,timeout=1.0,conn=None):
         if not conn: conn = self._soc
         if not(isinstance(inputdata,(tuple,list,))): inputdata = (inputdata,)
-        for data in inputdata:
-            self.send_msgs(str(len(data)).encode(),datainfo=b'szbsstrm',timeout=timeout,conn=conn)
-            self.send_rawb(data,timeout=timeout,conn=conn)
+        if self.wire_version(conn) == 2: # v2 frame is already length-prefixed, send data in one frame
+            self.send_msgs(inputdata,datainfo=b'szbsstrm',timeout=timeout,conn=conn)
+            return
+        if timeout: conn.settimeout(timeout)
+        for data in inputdata: # header and data in one write, no Nagle/delayed-ack stall between them
+            sendmsg_all(conn,encode_msgs(str(len(data)).encode(),self.syntax,b'szbsstrm')+[data])
     def recv_msgsszbsstrm(self,conn=None,timeout=1.0,buff=1024,takelastonly=False):
         if conn is None: conn = self._soc
         if timeout: conn.settimeout(timeout)
-        if not(self.databuff):
-            if not(self.syntax['msge'] in self.dataresd):
-                self.dataresd += conn.recv(buff)
-            while self.syntax['msge'] in self.dataresd:
-                index = (self.dataresd.find(self.syntax['msge'])+len(self.syntax['msge']))
-                header = msgcls(self.dataresd[:index],self.syntax)
-                self.dataresd = self.dataresd[index:]
+        self._parser.version = self.wire_version(conn)
+        self._parser.session = self.session(conn)
+        self._parser.compressor = self.compressor
+        self._parser.peercomp = self.peer_compression(conn)
+        if not(self.databuff) and (self._parser.version == 2):
+            header = self._parser.next_msgs()
+            timeout_ref = time.time()
+            while (header is None) and (time.time()-timeout_ref < timeout):
+                readdata = conn.recv(max(buff,self._parser.need()))
+                if not readdata:
+                    break
+                timeout_ref = time.time()
+                self._parser.feed(readdata)
+                header = self._parser.next_msgs()
+            while header is not None:
+                if (header.info == b'szbsstrm'):
+                    self.databuff.append(header.data)
+                header = self._parser.next_msgs()
+        elif not(self.databuff):
+            header = self._szbspend if self._szbspend else self._parser.next_msgs()
+            if header is None:
+                self._parser.feed(conn.recv(buff))
+                header = self._parser.next_msgs()
+            while header is not None:
                 if (header.info == b'szbsstrm'):
                     resbdata = int(header.data.decode())
                     timeout_ref = time.time()
-                    while (len(self.dataresd) < resbdata) and (time.time()-timeout_ref < timeout):
-                        readdata = conn.recv(min(buff,resbdata-len(self.dataresd)))
+                    while (len(self._parser) < resbdata) and (time.time()-timeout_ref < timeout):
+                        try:
+                            readdata = conn.recv(max(buff,resbdata-len(self._parser)))
+                        except socket.timeout:
+                            break
                         if readdata:
                             timeout_ref = time.time()
-                            self.dataresd += readdata
-                self.databuff.append(self.dataresd[:resbdata])
-                self.dataresd = self.dataresd[resbdata:]
+                            self._parser.feed(readdata)
+                    if len(self._parser) < resbdata: # keep header, rest of data is read on next call
+                        self._szbspend = header
+                        break
+                    self._szbspend = None
+                    self.databuff.append(self._parser.take(resbdata))
+                header = self._parser.next_msgs()
         if takelastonly:
             output = self.databuff[-1]
             self.databuff = []
@@ -315,3 +1216,170 @@ class user_socket(object):
         else:
             return self.databuff.pop(0) if self.databuff else None
 
+
+
+class telemetry_sample(object):
+    __slots__ = ('seq','info','data','sendtime','recvtime','late','address')
+    def __init__(self,seq,info,data,sendtime,recvtime,late,address):
+        self.seq,self.info,self.data = seq,info,data
+        self.sendtime,self.recvtime,self.late,self.address = sendtime,recvtime,late,address
+    def __repr__(self):
+        return 'telemetry_sample(seq={}, info={}, {} bytes{})'.format(self.seq,self.info,len(self.data),', late' if self.late else '')
+
+
+class telemetry_socket(object):
+    '''
+    UDP datagram telemetry, for high-rate sensor stream where newest sample matter more than every sample
+        Purpose:
+            compact datagram frame (16 bytes header: magic, version, info length, sequence number, send time),
+            no retransmission, receiver detect loss/reordering from sequence number and estimate jitter (RFC 3550)
+        Note:
+            - one datagram per sample, data+info must fit in maxsize (65507 for IPv4, keep below MTU ~1400 to avoid IP fragmentation)
+            - sequence number and stats are kept per sender address, with several senders use recv_latest_each
+        Example:
+            with telemetry_socket('192.168.1.20',13777) as sender:
+                sender.send(struct.pack('!6h',*mpu.read()),datainfo=b'mpu6050')
+            with telemetry_socket(port=13777,bind=True) as receiver:
+                sample = receiver.recv_latest(timeout=0.02) # newest pending sample, older ones dropped
+                print(sample.data, receiver.stats())
+    '''
+    header = struct.Struct('!2sBBId') # magic, version, info length, sequence number, sender time.time()
+    magic = b'NT'
+    version = 1
+    TRACKSEQS = 1024 # late datagram within this many sequence numbers is told apart as reordered or duplicate
+    def __init__(self,IPAddr=None,port=13777,bind=False,maxsize=65507,rcvbuf=None):
+        self.IPAddr  = IPAddr # bind: local address ('' for all interfaces), else destination address
+        self.port    = port
+        self.bind    = bind
+        self.maxsize = maxsize
+        self.rcvbuf  = rcvbuf # kernel receive buffer bytes, larger absorb longer burst before kernel drop
+        self._soc    = None
+        self._sendseq = 0
+        self._buffs  = [bytearray(self.header.size+maxsize),bytearray(self.header.size+maxsize)] # receive buffer pool, grow to senders+1
+        self._senders = {} # address -> stats of that sender
+    def __enter__(self):
+        self._soc = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+        if self.rcvbuf: self._soc.setsockopt(socket.SOL_SOCKET,socket.SO_RCVBUF,self.rcvbuf)
+        if self.bind:
+            self._soc.bind((self.IPAddr if self.IPAddr else '',self.port))
+        return self
+    def __exit__(self,exc_type,exc_value,traceback):
+        self._soc.close()
+    def fileno(self):
+        return self._soc.fileno()
+    def send(self,data,datainfo=b'',address=None):
+        if len(datainfo) > 255:
+            raise ValueError('datainfo too long, max 255 bytes (got {})'.format(len(datainfo)))
+        if len(datainfo)+len(data) > self.maxsize:
+            raise ValueError('sample too large for one datagram, max {} bytes (got {})'.format(self.maxsize,len(datainfo)+len(data)))
+        header = self.header.pack(self.magic,self.version,len(datainfo),self._sendseq&0xFFFFFFFF,time.time())
+        self._sendseq += 1
+        address = address if address else (self.IPAddr,self.port)
+        if hasattr(self._soc,'sendmsg'):
+            self._soc.sendmsg([header,datainfo,data],[],0,address)
+        else:
+            self._soc.sendto(header+datainfo+data,address)
+    def _account(self,address,seq,sendtime,recvtime):
+        # update sender stats, return True if datagram is older than newest seen (late/reordered)
+        stats = self._senders.get(address)
+        if stats is None:
+            self._senders[address] = {'received':1,'lost':0,'reordered':0,'duplicate':0,'dropped_stale':0,'jitter':0.0,
+                                      'lastseq':seq,'transit':recvtime-sendtime,'missing':set()}
+            return False
+        stats['received'] += 1
+        transit = recvtime-sendtime # clock offset cancel out in difference
+        stats['jitter'] += (abs(transit-stats['transit'])-stats['jitter'])/16
+        stats['transit'] = transit
+        delta = (seq-stats['lastseq'])&0xFFFFFFFF
+        if delta and (delta < 0x80000000):
+            stats['lost'] += delta-1 # sequence gap, never taken back (late arrival is counted in reordered)
+            stats['missing'].update((seq-gap)&0xFFFFFFFF for gap in range(1,min(delta,self.TRACKSEQS)))
+            if len(stats['missing']) > self.TRACKSEQS: # forget gaps too old to tell
+                stats['missing'] = {item for item in stats['missing'] if ((seq-item)&0xFFFFFFFF) < self.TRACKSEQS}
+            stats['lastseq'] = seq
+            return False
+        if (seq in stats['missing']) or (((stats['lastseq']-seq)&0xFFFFFFFF) >= self.TRACKSEQS):
+            stats['missing'].discard(seq)
+            stats['reordered'] += 1 # late, fill a gap
+        else:
+            stats['duplicate'] += 1 # same sequence number received before
+        return True
+    def _recv_into(self,buff):
+        with memoryview(buff) as view:
+            nbytes,address = self._soc.recvfrom_into(view)
+        recvtime = time.time()
+        if nbytes < self.header.size:
+            return None
+        magic,version,infolen,seq,sendtime = self.header.unpack_from(buff)
+        if (magic != self.magic) or (version != self.version):
+            return None
+        late = self._account(address,seq,sendtime,recvtime)
+        return nbytes,address,infolen,seq,sendtime,recvtime,late
+    def _sample(self,buff,meta):
+        nbytes,address,infolen,seq,sendtime,recvtime,late = meta
+        start = self.header.size+infolen
+        return telemetry_sample(seq,bytes(buff[self.header.size:start]),bytes(buff[start:nbytes]),sendtime,recvtime,late,address)
+    def recv(self,timeout=None):
+        '''
+        next datagram in arrival order (late one has sample.late True), None if nothing within timeout
+        '''
+        self._soc.settimeout(timeout)
+        while True:
+            try:
+                meta = self._recv_into(self._buffs[0])
+            except (socket.timeout,BlockingIOError):
+                return None
+            if meta is not None:
+                return self._sample(self._buffs[0],meta)
+    def recv_latest_each(self,timeout=None):
+        '''
+        drain pending datagrams and return {address: newest sample of that sender} (by sequence number),
+        older ones are counted as dropped_stale of their sender
+            wait up to timeout for first datagram if none pending, empty dict if nothing arrived
+            only the newest datagram of each sender is copied out, others are overwritten in place
+        '''
+        best = {} # address -> (buffer, meta) of newest datagram so far
+        spare = list(self._buffs)
+        self._soc.settimeout(timeout)
+        while True:
+            if not spare: # one more sender than buffers in pool
+                self._buffs.append(bytearray(self.header.size+self.maxsize))
+                spare.append(self._buffs[-1])
+            buff = spare.pop()
+            try:
+                meta = self._recv_into(buff)
+            except (socket.timeout,BlockingIOError):
+                spare.append(buff)
+                break
+            self._soc.setblocking(False) # first datagram arrived, only take what is already queued
+            if (meta is None) or meta[-1]: # not telemetry, or late (older than something already seen)
+                if meta is not None: self._senders[meta[1]]['dropped_stale'] += 1
+                spare.append(buff)
+                continue
+            previous = best.get(meta[1])
+            if previous is not None:
+                self._senders[meta[1]]['dropped_stale'] += 1
+                spare.append(previous[0])
+            best[meta[1]] = (buff,meta)
+        return {address:self._sample(buff,meta) for address,(buff,meta) in best.items()}
+    def recv_latest(self,timeout=None):
+        '''
+        newest pending sample, for single sender, None if nothing arrived within timeout (see recv_latest_each)
+            with several senders only the most recently received sender's sample is returned,
+            newest samples of the other senders are counted as their dropped_stale
+        '''
+        latest = self.recv_latest_each(timeout)
+        if not latest:
+            return None
+        newest = max(latest.values(),key=lambda sample: sample.recvtime)
+        for address in latest:
+            if address != newest.address: self._senders[address]['dropped_stale'] += 1
+        return newest
+    def stats(self,address=None):
+        '''
+        per sender: received, lost (sequence gaps), reordered (late, filled a gap), duplicate,
+        dropped_stale (drained by recv_latest) and jitter (seconds)
+        '''
+        if address is not None:
+            return {key:value for key,value in self._senders[address].items() if not(key in ('lastseq','transit','missing'))}
+        return {addr:self.stats(addr) for addr in self._senders}
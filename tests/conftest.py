@@ -0,0 +1,15 @@
+
+
+import os
+import sys
+import tempfile
+
+
+# modules import each other as nuuJoyLib.<package>, make this checkout importable under that name
+try:
+    import nuuJoyLib  # noqa: F401
+except ModuleNotFoundError:
+    _root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    _linkdir = tempfile.mkdtemp(prefix='nuujoylib_')
+    os.symlink(_root, os.path.join(_linkdir, 'nuuJoyLib'))
+    sys.path.insert(0, _linkdir)  # spawn'ed child processes get parent sys.path
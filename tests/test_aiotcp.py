@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from nuuJoyLib.Socket.aiotcp import aio_server, aio_client
+
+
+async def _echo(conn):
+    while (msgs := await conn.recv_msgs()) is not None:
+        await conn.send_msgs(msgs.data, datainfo=msgs.info or b'')
+
+
+@pytest.mark.parametrize('negotiate', [False, True])
+def test_concurrent_clients(negotiate):
+    async def client(port, index):
+        async with aio_client('127.0.0.1', port, negotiate=negotiate) as conn:
+            for count in range(20):
+                await conn.send_msgs(b'%d-%d' % (index, count), datainfo=b'echo')
+                msgs = await conn.recv_msgs()
+                assert (msgs.info, msgs.data) == (b'echo', b'%d-%d' % (index, count))
+            return index
+
+    async def main():
+        async with aio_server(_echo, '127.0.0.1', 0, negotiate=negotiate) as server:
+            port = server._server.sockets[0].getsockname()[1]
+            assert sorted(await asyncio.gather(*(client(port, index) for index in range(16)))) == list(range(16))
+            await asyncio.sleep(0.05)
+            assert server.connections == 0
+
+    asyncio.run(main())
+
+
+def test_shutdown_close_idle_and_cancel_stuck_handlers():
+    cancelled = []
+
+    async def stuck(conn):
+        try:
+            await asyncio.sleep(3600)  # ignore its connection, only cancellation can end it
+        except asyncio.CancelledError:
+            cancelled.append(conn.peername)
+            raise
+
+    async def main():
+        server = aio_server(stuck, '127.0.0.1', 0, shutdown_timeout=0.1)
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        clients = [await aio_client('127.0.0.1', port).__aenter__() for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert server.connections == 3
+        serving = asyncio.create_task(server.serve_forever())
+        await asyncio.wait_for(server.shutdown(), 2.0)
+        await asyncio.wait_for(serving, 1.0)
+        assert server.connections == 0 and len(cancelled) == 3
+        for conn in clients:
+            assert await conn.recv_msgs() is None  # server side closed
+            await conn.close()
+
+    asyncio.run(main())
+
+
+def test_accept_propagate_cancellation():
+    async def main():
+        started = asyncio.Event()
+
+        async def handler(conn):
+            started.set()
+            await asyncio.sleep(3600)
+
+        server = aio_server(handler, '127.0.0.1', 0)
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        client = await aio_client('127.0.0.1', port).__aenter__()
+        await started.wait()
+        task, = server._tasks
+        task.cancel()
+        done, _ = await asyncio.wait({task}, timeout=1.0)
+        assert task in done and task.cancelled()
+        await client.close()
+        await server.shutdown()
+
+    asyncio.run(main())
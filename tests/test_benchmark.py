@@ -0,0 +1,44 @@
+import json
+import socket
+import threading
+import pytest
+from nuuJoyLib.Socket.benchmark import bench_loopback, loopback_methods, loopback_report, compare_reports
+from nuuJoyLib.Socket.utils import user_socket, encode_msgs
+
+
+@pytest.mark.parametrize('method', list(loopback_methods))
+def test_bench_loopback_every_method(method):
+    result = bench_loopback(method, size=2048, clients=3, nums=20)
+    assert (result['method'], result['msgs']) == (method, 60)
+    latency = result['latency_ms']
+    assert 0 < latency['p50'] <= latency['p95'] <= latency['p99'] <= latency['max']
+    assert result['msgs_per_sec'] > 0 and result['cpu_percent'] >= 0
+
+
+def test_loopback_report_and_compare():
+    report = loopback_report(methods=('recv_msgs', 'recv_long'), sizes=(64,), clients=(1, 2), nums=10)
+    report = json.loads(json.dumps(report))  # machine-readable
+    assert [(result['method'], result['clients']) for result in report['results']] == \
+        [('recv_msgs', 1), ('recv_msgs', 2), ('recv_long', 1), ('recv_long', 2)]
+    assert compare_reports(report, report) == []
+    slower = json.loads(json.dumps(report))
+    slower['results'][0]['msgs_per_sec'] /= 2
+    slower['results'][0]['latency_ms']['p99'] *= 2
+    regressions = compare_reports(report, slower, tolerance=0.1)
+    assert [(item['method'], item['clients']) for item in regressions] == [('recv_msgs', 1)]
+
+
+def test_recv_msgsszbsstrm_body_after_timeout():
+    # header arrive first, body only after receiver's read timeout, frame must not be lost
+    left, right = socket.socketpair()
+    with left, right:
+        receiver = user_socket(IPAddr='127.0.0.1')
+        left.sendall(b''.join(encode_msgs(b'6', receiver.syntax, b'szbsstrm')))
+        assert receiver.recv_msgsszbsstrm(conn=right, timeout=0.05) is None
+        timer = threading.Timer(0.05, left.sendall, args=(b'body!!',))
+        timer.start()
+        received = None
+        while received is None:
+            received = receiver.recv_msgsszbsstrm(conn=right, timeout=0.5)
+        timer.join()
+        assert received == b'body!!'
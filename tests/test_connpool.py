@@ -0,0 +1,127 @@
+import socket
+import threading
+import pytest
+from nuuJoyLib.Socket.connpool import connection_pool
+from nuuJoyLib.Socket import tcpip_lite, tcpipv4
+
+
+class _server(object):
+    # accept connections in background, run handler(conn) for each one
+    def __init__(self, handler):
+        self._soc = socket.create_server(('127.0.0.1', 0))
+        self.port = self._soc.getsockname()[1]
+        self.conns = []
+        self._handler = handler
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._soc.accept()
+            except OSError:
+                return
+            self.conns.append(conn)
+            threading.Thread(target=self._handler, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self._soc.close()
+        for conn in self.conns:
+            conn.close()
+
+
+def _echo_long(conn):
+    client = tcpip_lite.user_socket()
+    client._soc = conn
+    client.SEND_DELAY = 0.0
+    try:
+        while True:
+            client.send_long(client.recv_long_into(block=True).tobytes())
+    except (ConnectionError, OSError):
+        pass
+
+
+@pytest.fixture
+def echo_server():
+    server = _server(_echo_long)
+    yield server
+    server.close()
+
+
+def _pool(**kwargs):
+    pool = tcpip_lite.client_pool(**kwargs)
+    pool.factory = lambda host, port: _client(host, port)
+    return pool
+
+
+def _client(host, port):
+    client = tcpip_lite.client_socket(host, port)
+    client.SEND_DELAY = 0.0
+    return client
+
+
+def _request(client, data):
+    client.send_long(data)
+    return client.recv_long_into(block=True).tobytes()
+
+
+def test_reuse_connection(echo_server):
+    with _pool(maxconns=2) as pool:
+        with pool.lease('127.0.0.1', echo_server.port) as first:
+            assert _request(first, b'one') == b'one'
+        with pool.lease('127.0.0.1', echo_server.port) as second:
+            assert _request(second, b'two') == b'two'
+        assert second is first
+        stats = pool.stats()
+        assert (stats['created'], stats['reused'], stats['discarded']) == (1, 1, 0)
+
+
+def test_discard_dead_peer(echo_server):
+    with _pool() as pool:
+        with pool.lease('127.0.0.1', echo_server.port) as first:
+            assert _request(first, b'one') == b'one'
+        for conn in echo_server.conns:  # peer go away while connection is idle in pool
+            conn.shutdown(socket.SHUT_RDWR)
+            conn.close()
+        with pool.lease('127.0.0.1', echo_server.port) as second:
+            assert second is not first
+            assert _request(second, b'two') == b'two'
+        assert pool.stats()['discarded'] == 1
+
+
+def test_discard_connection_with_buffered_messages():
+    def reply_twice(conn):
+        sock = tcpipv4.user_socket(IPAddr='127.0.0.1')
+        sock.recv_msgs(conn=conn)
+        sock.send_msgs([b'reply', b'extra'], conn=conn, batch=True)
+        conn.recv(1)
+
+    server = _server(reply_twice)
+    try:
+        with connection_pool(lambda host, port: tcpipv4.client_socket(host, port)) as pool:
+            with pool.lease('127.0.0.1', server.port) as client:
+                client.send_msgs(b'request')
+                msgs = None
+                while msgs is None:
+                    msgs = client.recv_msgsstrm(timeout=1.0, buff=65536)
+                assert msgs.data == b'reply' and client.databuff  # b'extra' decoded but not taken
+            assert pool.stats()['discarded'] == 1 and pool.stats()['idle'] == {}
+    finally:
+        server.close()
+
+
+def test_maxconns_block_until_release(echo_server):
+    with _pool(maxconns=1) as pool:
+        client = pool.acquire('127.0.0.1', echo_server.port)
+        with pytest.raises(TimeoutError):
+            pool.acquire('127.0.0.1', echo_server.port, timeout=0.1)
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(client=pool.acquire('127.0.0.1', echo_server.port, timeout=5.0)))
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()  # still waiting for the only connection
+        pool.release(client, '127.0.0.1', echo_server.port)
+        thread.join(5.0)
+        assert result['client'] is client
+        pool.release(client, '127.0.0.1', echo_server.port)
+        assert pool.stats()['created'] == 1
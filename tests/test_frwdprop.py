@@ -0,0 +1,33 @@
+import pytest
+from nuuJoyLib.ML.frwdprop import denselayer, frwdpropsqnc
+
+
+WEIGHT = [[0.5, -0.01, 2.0], [0.02, -1.5, 0.0], [0.0, 0.0, 0.03]]
+BIAS = [0.1, -0.2, 0.3]
+
+
+def test_prune_sparse_matches_dense():
+    dense = frwdpropsqnc((WEIGHT, BIAS, 'r'), (WEIGHT, BIAS, 's'))
+    sparse = frwdpropsqnc((WEIGHT, BIAS, 'r'), (WEIGHT, BIAS, 's'))
+    sparse.prune(threshold=0.05)
+    for layer in dense.layerseq:  # same weight, zeroed in place, but still dense forward propagation
+        layer.weight = [[(w if abs(w) >= 0.05 else 0.0) for w in warray] for warray in layer.weight]
+    xarray = (1.0, 2.0, -3.0)
+    assert sparse.predict(xarray) == pytest.approx(dense.predict(xarray))
+
+
+def test_prune_keepfrac_and_sparsity():
+    layer = denselayer(WEIGHT, BIAS, 'r')
+    sparsity = layer.prune(keepfrac=1/3)
+    assert sparsity == pytest.approx(2/3)
+    assert layer.spdata == (0.5, 2.0, -1.5)
+    assert layer.spptr == (0, 2, 3, 3)
+
+
+def test_prune_argument_check():
+    layer = denselayer(WEIGHT, BIAS, 'r')
+    with pytest.raises(ValueError):
+        layer.prune()
+    with pytest.raises(ValueError):
+        layer.prune(keepfrac=-0.1)
+    assert denselayer([], [], 'r').prune(keepfrac=0.5) == 0.0
@@ -0,0 +1,140 @@
+
+
+import json
+import time
+import socket
+import threading
+import http.client
+import pytest
+from nuuJoyLib.Socket.http_server import (Micro_Batcher, Batch_Predict_Server, Batch_Predict_Handler,
+                                          Keepalive_Request_Handler, Threaded_HTTP_Server)
+
+
+class _quiet_keepalive(Keepalive_Request_Handler):
+    def log_message(self, *args):
+        pass
+
+
+class _quiet_predict(Batch_Predict_Handler):
+    def log_message(self, *args):
+        pass
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01})
+    thread.start()
+    return thread
+
+
+def test_micro_batcher_batches_and_keeps_order():
+    with Micro_Batcher(lambda samples: [sample * 2 for sample in samples], max_batch_size=8, max_wait=0.05) as batcher:
+        results = [None] * 32
+
+        def submit(index):
+            results[index] = batcher.submit(index, timeout=5.0)
+
+        threads = [threading.Thread(target=submit, args=(index,)) for index in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [index * 2 for index in range(32)]
+        assert batcher.stats()['mean_batch_size'] > 1
+
+
+def test_micro_batcher_short_output_fail_every_request():
+    with Micro_Batcher(lambda samples: samples[:-1], max_batch_size=4, max_wait=0.05) as batcher:
+        with pytest.raises(ValueError):
+            batcher.submit(1, timeout=5.0)
+
+
+def test_micro_batcher_submit_after_stop():
+    batcher = Micro_Batcher(lambda samples: samples)
+    with batcher:
+        assert batcher.submit(1, timeout=5.0) == 1
+    with pytest.raises(RuntimeError):
+        batcher.submit(2, timeout=5.0)
+    assert batcher.stats()['queue_depth'] == 0
+
+
+def test_batch_predict_server():
+    with Batch_Predict_Server(('127.0.0.1', 0), Micro_Batcher(lambda samples: [sum(sample) for sample in samples]),
+                              _quiet_predict) as server:
+        thread = _serve(server)
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+        conn.request('POST', '/', json.dumps({'input': [1, 2, 3]}), {'Content-Type': 'application/json'})
+        assert json.loads(conn.getresponse().read()) == {'output': 6}
+        conn.close()
+        server.shutdown()
+        thread.join()
+
+
+
+def test_keepalive_server_reuse_connection():
+    with Threaded_HTTP_Server(('127.0.0.1', 0), _quiet_keepalive, max_workers=2, idle_timeout=1.0) as server:
+        thread = _serve(server)
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+        for index in range(20):
+            conn.request('POST', '/echo', json.dumps({'index': index}), {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            assert not response.will_close
+            assert json.loads(response.read())['Content'] == {'index': index}
+            if index == 0:
+                sock = conn.sock
+            assert conn.sock is sock  # same connection for every request
+        conn.request('PATCH', '/')
+        response = conn.getresponse()
+        assert response.status == 501 and response.will_close
+        response.read()
+        conn.close()
+        server.shutdown()
+        thread.join()
+
+
+def test_keepalive_server_timeouts_and_bounded_pool():
+    with Threaded_HTTP_Server(('127.0.0.1', 0), _quiet_keepalive, max_workers=1, idle_timeout=0.3,
+                              request_timeout=0.3) as server:
+        thread = _serve(server)
+        port = server.server_address[1]
+        first = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        first.request('GET', '/')
+        first.getresponse().read()
+        ref = time.monotonic()  # only worker is held by idle first connection until idle_timeout
+        second = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        second.request('GET', '/')
+        assert second.getresponse().status == 200
+        assert 0.2 < time.monotonic() - ref < 3.0
+        second.close()
+        first.close()
+        slow = socket.create_connection(('127.0.0.1', port))
+        slow.sendall(b'GET / HTTP/1.1\r\n')  # request never completed
+        slow.settimeout(5)
+        assert slow.recv(1024) == b''  # closed by request_timeout
+        slow.close()
+        chunked = socket.create_connection(('127.0.0.1', port))
+        chunked.sendall(b'POST / HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n0\r\n\r\n')
+        chunked.settimeout(5)
+        assert chunked.recv(1024).startswith(b'HTTP/1.1 501')
+        chunked.close()
+        server.shutdown()
+        thread.join()
+
+
+def test_keepalive_server_shutdown_while_pool_busy():
+    with Threaded_HTTP_Server(('127.0.0.1', 0), _quiet_keepalive, max_workers=1, idle_timeout=30.0) as server:
+        thread = _serve(server)
+        port = server.server_address[1]
+        busy = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        busy.request('GET', '/')
+        busy.getresponse().read()  # only worker now held by idle keep-alive connection
+        waiting = socket.create_connection(('127.0.0.1', port))
+        time.sleep(0.2)  # accept loop is waiting for a free worker
+        stopper = threading.Thread(target=server.shutdown)
+        stopper.start()
+        stopper.join(3.0)
+        assert not stopper.is_alive(), 'shutdown hang while accept loop wait for a worker'
+        waiting.settimeout(5)
+        assert waiting.recv(1024) == b''  # connection without worker is closed
+        waiting.close()
+        busy.close()
+        thread.join()
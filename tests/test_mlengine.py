@@ -0,0 +1,64 @@
+import numpy
+import pytest
+from nuuJoyLib.ML import mlengine
+from nuuJoyLib.ML.mlengine import (sequential_nn_model, input_layer, neuron_layer, cost_layer, optimizer,
+                                   csr_weight, prune_mask)
+
+
+def _model():
+    numpy.random.seed(7)
+    return sequential_nn_model(input_layer(6),
+                               neuron_layer(8, actvfunc='relu'),
+                               neuron_layer(3, actvfunc='sigmoid'),
+                               cost_layer(lossfunc='sqe'),
+                               optimizer=optimizer(method='gradientdescent', setting={'learn_rate': 0.1}))
+
+
+def _samples(nums=32):
+    rng = numpy.random.default_rng(3)
+    return rng.random((nums, 6, 1)), rng.random((nums, 3, 1))
+
+
+@pytest.mark.parametrize('usescipy', [True, False])
+def test_csr_weight_matches_dense(monkeypatch, usescipy):
+    if not usescipy:
+        monkeypatch.setattr(mlengine, 'scipy', None)
+    weight = numpy.random.default_rng(1).standard_normal((5, 7))
+    weight *= prune_mask(weight, keepfrac=0.3)
+    weight[2] = 0.0  # empty row
+    inptarry = numpy.random.default_rng(2).random((4, 7, 1))
+    spwght = csr_weight(weight)
+    assert numpy.allclose(spwght.matmul(inptarry), numpy.matmul(weight, inptarry))
+    assert numpy.array_equal(spwght.todense(), weight)
+
+
+def test_prune_sparse_predict_matches_dense():
+    model = _model()
+    inptarry, _ = _samples()
+    model.prune(keepfrac=0.5)
+    sparse = model.predict(inptarry).copy()
+    for layer in model.neuronlayers:
+        layer._sparseweight = None
+    model.inputlayer.output = inptarry
+    assert numpy.allclose(sparse, model.predict(inptarry))
+
+
+def test_prune_mask_survives_training():
+    model = _model()
+    inptarry, trgtarry = _samples()
+    sparsity = model.prune(keepfrac=0.25)
+    masks = {layer.id: layer.weight == 0.0 for layer in model.neuronlayers}
+    for _ in range(3):
+        model.train(inptarry, trgtarry)
+    for layer in model.neuronlayers:
+        assert numpy.all(layer.weight[masks[layer.id]] == 0.0)
+        assert layer._sparseweight is not None
+        assert numpy.array_equal(layer._sparseweight.todense(), layer.weight)
+        assert layer.sparsity >= sparsity[layer.id]
+
+
+def test_prune_argument_check():
+    with pytest.raises(ValueError):
+        prune_mask(numpy.ones((2, 2)))
+    with pytest.raises(ValueError):
+        prune_mask(numpy.ones((2, 2)), keepfrac=1.5)
@@ -0,0 +1,84 @@
+
+
+import time
+import socket
+import threading
+import numpy
+import pytest
+from nuuJoyLib.Socket.utils import user_socket
+from nuuJoyLib.ML.onlinetrain import replaybuffer, onlinetrainer, send_samples
+
+
+class _model(object):
+    def __init__(self, error=None):
+        self.error = error
+
+    def train(self, inptbtch, trgtbtch):
+        if self.error:
+            raise self.error
+        return float(numpy.mean(trgtbtch))
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_replaybuffer_wraps_and_keeps_newest():
+    buffer = replaybuffer(2, 1, capacity=4)
+    rows = numpy.arange(18, dtype='float64').reshape(6, 3)
+    buffer.push_frame(rows.tobytes())
+    assert len(buffer) == 4 and buffer.pushcount == 6
+    inptbtch, trgtbtch = buffer.sample(64)
+    assert set(trgtbtch[:, 0, 0]) <= {8.0, 11.0, 14.0, 17.0}
+    with pytest.raises(ValueError):
+        buffer.push_frame(b'\0' * (buffer.rowsize + 1))
+
+
+def test_recv_forever_skip_invalid_frame():
+    sender, receiver = socket.socketpair()
+    with sender, receiver:
+        sock = user_socket(IPAddr='127.0.0.1')
+        trainer = onlinetrainer(_model(), 2, 1, capacity=64, batchsize=4)
+        with trainer:
+            thread = trainer.recv_forever_thread(sock, conn=receiver, timeout=0.1)
+            sock.send_msgsszbsstrm(b'\0' * 5, conn=sender)  # not a multiple of row size
+            send_samples(sock, numpy.ones((8, 2, 1)), numpy.ones((8, 1, 1)), conn=sender)
+            _wait(lambda: len(trainer.buffer) == 8)
+            _wait(lambda: trainer.traincount > 0)
+            assert trainer.dropframes == 1
+            assert thread.is_alive()
+        thread.join(1.0)
+
+
+def test_train_error_reraised_from_stop():
+    trainer = onlinetrainer(_model(error=FloatingPointError('overflow')), 2, 1, capacity=64, batchsize=4)
+    trainer.start()
+    trainer.buffer.push(numpy.ones((8, 2)), numpy.ones((8, 1)))
+    trainer.feed(b'')
+    _wait(lambda: trainer.trainerror is not None)
+    with pytest.raises(RuntimeError) as excinfo:
+        trainer.stop()
+    assert isinstance(excinfo.value.__cause__, FloatingPointError)
+
+
+@pytest.mark.parametrize('version', [1, 2])
+def test_recv_forever_return_when_sender_close(version):
+    sender, receiver = socket.socketpair()
+    with receiver:
+        sendsock, sock = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        if version == 2:
+            thread = threading.Thread(target=sendsock.negotiate_wire, kwargs={'conn': sender})
+            thread.start()
+            assert sock.negotiate_wire(conn=receiver) == 2
+            thread.join()
+        trainer = onlinetrainer(_model(), 2, 1, capacity=64, batchsize=4)
+        with trainer:
+            thread = trainer.recv_forever_thread(sock, conn=receiver, timeout=0.1)
+            send_samples(sendsock, numpy.ones((8, 2, 1)), numpy.ones((8, 1, 1)), conn=sender)
+            sender.close()
+            thread.join(2.0)
+            assert not thread.is_alive()
+            assert len(trainer.buffer) == 8
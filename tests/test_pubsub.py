@@ -0,0 +1,92 @@
+
+
+import time
+import threading
+import pytest
+from nuuJoyLib.Socket.utils import msgcls, encode_msgs
+from nuuJoyLib.Socket.pubsub import pubsub_broker, pubsub_client, frame_topic
+
+
+@pytest.fixture
+def broker():
+    stop_event = threading.Event()
+    with pubsub_broker('127.0.0.1', 0) as broker:
+        thread = threading.Thread(target=broker.serve_forever, args=(stop_event, 0.01))
+        thread.start()
+        broker.port = broker._soc.getsockname()[1]
+        yield broker
+        stop_event.set()
+        thread.join(5.0)
+
+
+def _wait_subscribed(broker, topic, count):
+    deadline = time.monotonic() + 5.0
+    while len(broker.subscribers.get(topic, ())) < count:
+        assert time.monotonic() < deadline, 'subscription not registered'
+        time.sleep(0.01)
+
+
+def test_frame_topic():
+    syntax = msgcls().syntax
+    assert frame_topic(b''.join(encode_msgs(b'data', syntax, b'topic')), syntax) == b'topic'
+    assert frame_topic(b''.join(encode_msgs(b'data', syntax)), syntax) == b''
+    assert frame_topic(syntax['msgb'] + syntax['infb'] + b'topic' + syntax['msge'], syntax) is None
+
+
+def test_fan_out(broker):
+    with pubsub_client(port=broker.port) as first, pubsub_client(port=broker.port) as second, \
+            pubsub_client(port=broker.port) as producer:
+        first.subscribe(b'imu')
+        second.subscribe(b'imu')
+        _wait_subscribed(broker, b'imu', 2)
+        for index in range(100):
+            producer.publish(b'imu', b'%d' % index)
+        producer.publish(b'other', b'not subscribed')
+        for client in (first, second):
+            for index in range(100):
+                msgs = client.recv(timeout=5.0)
+                assert (msgs.info, msgs.data) == (b'imu', b'%d' % index)
+            assert client.recv(timeout=0.1) is None
+
+
+def test_latest_mode_conflates(broker):
+    with pubsub_client(port=broker.port) as subscriber, pubsub_client(port=broker.port) as producer:
+        subscriber.subscribe(b'pad', latest=True)
+        _wait_subscribed(broker, b'pad', 1)
+        for index in range(2000):
+            producer.publish(b'pad', b'%d' % index)
+        received = []
+        while (msgs := subscriber.recv(timeout=0.5)) is not None:
+            received.append(int(msgs.data))
+        assert received[-1] == 1999
+        assert received == sorted(received)
+
+
+def test_recv_raise_when_broker_closed():
+    stop_event = threading.Event()
+    with pubsub_broker('127.0.0.1', 0) as broker:
+        port = broker._soc.getsockname()[1]
+        thread = threading.Thread(target=broker.serve_forever, args=(stop_event, 0.01))
+        thread.start()
+        with pubsub_client(port=port) as client:
+            client.subscribe(b'x')
+            _wait_subscribed(broker, b'x', 1)
+            stop_event.set()
+            thread.join(5.0)
+            for peer in list(broker.peers.values()):
+                broker._drop(peer)
+            with pytest.raises(ConnectionError):
+                client.recv(timeout=None)
+
+
+def test_message_larger_than_max_pending(broker):
+    broker.max_pending = 1024
+    with pubsub_client(port=broker.port) as subscriber, pubsub_client(port=broker.port) as producer:
+        subscriber.subscribe(b'image')
+        _wait_subscribed(broker, b'image', 1)
+        for index in range(3):
+            payload = bytes([index]) * (256 << 10)
+            producer.publish(b'image', payload)
+            msgs = subscriber.recv(timeout=5.0)
+            assert msgs is not None and (msgs.info, msgs.data) == (b'image', payload)
+        assert broker.stats().get('dropped_subscribers', 0) == 0
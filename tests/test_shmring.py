@@ -0,0 +1,111 @@
+
+
+import os
+import sys
+import uuid
+import struct
+import hashlib
+import subprocess
+import multiprocessing
+import pytest
+from nuuJoyLib.Socket.shmring import shm_ring
+
+
+_tag = struct.Struct('=I16s')  # seq, md5 of payload
+
+
+def _payload(seq, maxsize):
+    data = os.urandom(seq * 7919 % (maxsize + 1))
+    return _tag.pack(seq, hashlib.md5(data).digest()) + data
+
+
+def _produce(name, nums, maxsize):
+    with shm_ring(name) as ring:
+        for seq in range(nums):
+            ring.send_msgs(_payload(seq, maxsize), datainfo=b'seq%d' % seq, timeout=30.0)
+
+
+def _check(info, data, seq):
+    assert info == b'seq%d' % seq
+    tag, payload = data[:_tag.size], data[_tag.size:]
+    assert _tag.unpack(tag) == (seq, hashlib.md5(payload).digest())
+
+
+def test_single_process_roundtrip():
+    with shm_ring(f'njtest_{uuid.uuid4().hex[:8]}', size=4096, create=True) as ring:
+        for seq in range(500):
+            ring.send_msgs(_payload(seq, 1000), datainfo=b'seq%d' % seq, timeout=0)
+            info, view = ring.recv_msgsview()
+            data = bytes(view)
+            view.release()
+            _check(info, data, seq)
+        assert ring.recv_msgsview() is None
+
+
+def test_takelastonly_drop_count():
+    with shm_ring(f'njtest_{uuid.uuid4().hex[:8]}', size=8192, create=True) as ring:
+        for seq in range(5):
+            ring.send_msgs(_payload(seq, 100), datainfo=b'seq%d' % seq)
+        info, view, dropped = ring.recv_msgsview(takelastonly=True)
+        data = bytes(view)
+        view.release()
+        _check(info, data, 4)
+        assert dropped == 4
+
+
+def test_oversize_message():
+    with shm_ring(f'njtest_{uuid.uuid4().hex[:8]}', size=1024, create=True) as ring:
+        with pytest.raises(ValueError):
+            ring.send_msgs(b'x' * 1024)
+
+
+@pytest.mark.parametrize('method', ['spawn', 'fork'])
+def test_cross_process_stress(method):
+    if method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f'{method} start method not available')
+    nums, maxsize = 5000, 3000
+    with shm_ring(f'njtest_{uuid.uuid4().hex[:8]}', size=8192, create=True) as ring:
+        producer = multiprocessing.get_context(method).Process(target=_produce, args=(ring.name, nums, maxsize))
+        producer.start()
+        try:
+            for seq in range(nums):
+                output = ring.recv_msgsview(timeout=30.0)
+                assert output is not None, f'timeout waiting for message {seq}'
+                data = bytes(output[1])
+                output[1].release()
+                _check(output[0], data, seq)
+        finally:
+            producer.join(30.0)
+        assert producer.exitcode == 0
+
+
+_consumer = '''
+import sys
+from nuuJoyLib.Socket.shmring import shm_ring
+with shm_ring(sys.argv[1]) as ring:
+    msgs = ring.recv_msgsstrm(timeout=10.0)
+    sys.stdout.write(msgs.info.decode() + ':' + msgs.data.decode())
+'''
+
+
+def test_attach_from_independent_interpreter():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    with shm_ring(f'njtest_{uuid.uuid4().hex[:8]}', size=4096, create=True) as ring:
+        ring.send_msgs(b'first', datainfo=b'one')
+        child = subprocess.run([sys.executable, '-c', _consumer, ring.name], env=env, capture_output=True,
+                               text=True, timeout=60)
+        assert child.returncode == 0, child.stderr
+        assert child.stdout == 'one:first'
+        assert 'leaked' not in child.stderr  # consumer's resource tracker must not own the segment
+        ring.send_msgs(b'second', datainfo=b'two')  # segment survived consumer exit
+        child = subprocess.run([sys.executable, '-c', _consumer, ring.name], env=env, capture_output=True,
+                               text=True, timeout=60)
+        assert child.stdout == 'two:second', child.stderr
+
+
+def test_creator_close_after_segment_removed():
+    ring = shm_ring(f'njtest_{uuid.uuid4().hex[:8]}', size=4096, create=True).open()
+    remover = 'import sys\nfrom multiprocessing import shared_memory\n' \
+              'shm = shared_memory.SharedMemory(sys.argv[1])\nshm.unlink()\nshm.close()\n'
+    subprocess.run([sys.executable, '-c', remover, ring.name], check=True, timeout=60)
+    ring.close()
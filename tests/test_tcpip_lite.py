@@ -0,0 +1,179 @@
+
+
+import os
+import time
+import socket
+import struct
+import threading
+import selectors
+import pytest
+from nuuJoyLib.Socket.tcpip_lite import user_socket, server_socket, multi_server_socket, client_socket
+
+
+def _serve(server, poll_interval):
+    stop_event = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, args=(stop_event, poll_interval))
+    thread.start()
+    return stop_event, thread
+
+
+def _client(port):
+    client = client_socket('127.0.0.1', port)
+    client.SEND_DELAY = 0.0
+    return client
+
+
+def test_multi_server_echo_many_clients():
+    def echo(client, data):
+        client.send_long(data)
+
+    with multi_server_socket('127.0.0.1', 0, on_frame=echo) as server:
+        stop_event, thread = _serve(server, 0.05)
+        port = server._soc.getsockname()[1]
+        try:
+            clients = [_client(port).__enter__() for _ in range(8)]
+            for index, client in enumerate(clients):
+                client.send_long(b'client%d' % index)
+            for index, client in enumerate(clients):
+                assert bytes(client.recv_long_into(block=True)) == b'client%d' % index
+            for client in clients:
+                client.__exit__(None, None, None)
+        finally:
+            stop_event.set()
+            thread.join(5.0)
+        assert not thread.is_alive()
+
+
+@pytest.mark.parametrize('selector_class', [selectors.DefaultSelector, selectors.SelectSelector])
+def test_multi_server_send_from_other_thread(selector_class):
+    # reply larger than socket buffer is queued by application thread, serving thread must
+    # be woken to flush it right away instead of after its (long) select timeout
+    payload = os.urandom(8 << 20)
+    server = multi_server_socket('127.0.0.1', 0)
+    server.selector_class = selector_class
+    with server:
+        stop_event, thread = _serve(server, 30.0)
+        port = server._soc.getsockname()[1]
+        try:
+            with _client(port) as client:
+                client.send_long(b'request')
+                peer, data = server.frame_queue.get(timeout=5.0)
+                assert data == b'request'
+                ref = time.monotonic()
+                peer.send_long(payload)
+                client.STREAM_TIMEOUT = 5.0
+                assert bytes(client.recv_long_into(block=True)) == payload
+                assert time.monotonic() - ref < 5.0
+                stop_event.set()  # loop exit on next event, client close below
+        finally:
+            stop_event.set()
+            thread.join(10.0)
+        assert not thread.is_alive()
+
+
+def test_multi_server_on_frame_error_drop_only_that_client():
+    def handler(client, data):
+        if data == b'bad':
+            raise ValueError('handler fail')
+        client.send_long(data)
+
+    with multi_server_socket('127.0.0.1', 0, on_frame=handler) as server:
+        stop_event, thread = _serve(server, 0.05)
+        port = server._soc.getsockname()[1]
+        try:
+            with _client(port) as good, _client(port) as bad:
+                bad.send_long(b'bad')
+                with pytest.raises(ConnectionError):  # dropped, closed by server
+                    bad.recv_long_into(block=True)
+                good.send_long(b'good')
+                assert bytes(good.recv_long_into(block=True)) == b'good'
+                assert thread.is_alive() and len(server.clients) == 1
+        finally:
+            stop_event.set()
+            thread.join(5.0)
+
+
+@pytest.mark.parametrize('direction', ['to_server', 'to_client'])
+def test_pipelined_roundtrip(direction):
+    frames = [os.urandom(index * 37) for index in range(200)]
+    with server_socket('127.0.0.1', 0) as server:
+        port = server._soc.getsockname()[1]
+        with _client(port) as client, server.accept_connection():
+            sender, receiver = (client, server) if direction == 'to_server' else (server, client)
+            sender.SEND_WINDOW = 4
+            thread = threading.Thread(target=lambda: [sender.send_pipelined(frame) for frame in frames] and sender.wait_acked())
+            thread.start()
+            received = [receiver.recv_pipelined(block=True) for _ in frames]
+            thread.join(5.0)
+            assert received == frames and not thread.is_alive()
+            assert receiver.recv_pipelined() is None
+
+
+def _pair():
+    left, right = socket.socketpair()
+    sender, receiver = user_socket(), user_socket()
+    sender._soc, receiver._soc = left, right
+    sender.SEND_DELAY = 0.0
+    return sender, receiver
+
+
+def test_recv_long_header_split_between_reads():
+    sender, receiver = _pair()
+    with sender._soc, receiver._soc:
+        frame = struct.pack('L', 11) + b'hello world'
+        sender._soc.sendall(frame[:3])
+        thread = threading.Timer(0.05, sender._soc.sendall, args=(frame[3:],))
+        thread.start()
+        receiver.READ_TIMEOUT = 1.0
+        assert receiver.recv_long() == b'hello world'
+        thread.join()
+
+
+def test_recv_long_iter_no_frame_and_empty_frame():
+    sender, receiver = _pair()
+    with sender._soc, receiver._soc:
+        assert receiver.recv_long_iter() is None
+        sender.send_long(b'')
+        assert list(receiver.recv_long_iter()) == []
+        sender.send_long(b'x' * 10000)
+        assert b''.join(receiver.recv_long_iter(chunksize=4096)) == b'x' * 10000
+
+
+@pytest.mark.parametrize('existing', ['none', 'prefix', 'unrelated', 'complete'])
+def test_send_file_resume_checks_prefix(tmp_path, existing):
+    content = os.urandom(300000)
+    source, target = tmp_path / 'source.bin', tmp_path / 'target.bin'
+    source.write_bytes(content)
+    prefix = {'prefix': content[:100000], 'unrelated': os.urandom(100000), 'complete': content}.get(existing)
+    if prefix is not None:
+        target.write_bytes(prefix)
+    sender, receiver = _pair()
+    with sender._soc, receiver._soc:
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(sent=sender.send_file(str(source))))
+        thread.start()
+        received = receiver.recv_file(str(target), chunksize=65536, block=True)
+        thread.join()
+        expect = {'prefix': 200000, 'complete': 0}.get(existing, 300000)
+        assert received == result['sent'] == expect
+        assert target.read_bytes() == content
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='Unix domain socket not available')
+def test_unix_server_replace_only_stale_socket(tmp_path):
+    import errno
+    path = str(tmp_path / 'server.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    with server_socket(None, None, unixpath=path):
+        with pytest.raises(OSError) as excinfo:
+            server_socket(None, None, unixpath=path).__enter__()
+        assert excinfo.value.errno == errno.EADDRINUSE
+        with client_socket(None, None, unixpath=path) as client:
+            client.SEND_DELAY = 0.0
+    regular = tmp_path / 'regular'
+    regular.write_bytes(b'not a socket')
+    with pytest.raises(OSError):
+        server_socket(None, None, unixpath=str(regular)).__enter__()
+    assert regular.read_bytes() == b'not a socket'
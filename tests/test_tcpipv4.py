@@ -0,0 +1,97 @@
+
+
+import os
+import time
+import errno
+import queue
+import socket
+import threading
+import pytest
+from nuuJoyLib.Socket.tcpipv4 import server_socket, client_socket, batchqueue, mySyncMngr
+
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='Unix domain socket not available')
+
+
+def test_unix_socket_messages_and_fd_passing(tmp_path):
+    path = str(tmp_path / 'test.sock')
+    received = {}
+    with server_socket(unixpath=path) as server:
+        def serve():
+            with server.client_accept() as conn:
+                received['msgs'] = server.recv_msgs(conn=conn, timeout=5.0).data
+                server.send_msgs(b'ready', conn=conn)
+                data, fds = server.recv_fds(conn=conn, timeout=5.0)
+                with os.fdopen(fds[0], 'rb') as file:
+                    received['fds'] = (data, file.read())
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        with client_socket(unixpath=path) as client:
+            assert client.transport == 'UNIX'
+            client.send_msgs(b'over unix socket')
+            assert client.recv_msgs(timeout=5.0).data == b'ready'  # peer wait in recv_fds now
+            with open(tmp_path / 'payload', 'wb') as file:
+                file.write(b'shared file')
+            with open(tmp_path / 'payload', 'rb') as file:
+                client.send_fds([file])
+            thread.join(5.0)
+        assert received == {'msgs': b'over unix socket', 'fds': (b'fds', b'shared file')}
+    assert not os.path.exists(path)  # server remove its socket file
+
+
+def test_fd_passing_require_unix_socket():
+    with server_socket(addr='127.0.0.1', port=(0,)) as server:
+        with pytest.raises(ValueError):
+            server.send_fds([0], conn=server._soc)
+
+
+def test_unix_server_replace_only_stale_socket(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()  # socket file left behind, nobody listening
+    with server_socket(unixpath=path) as server:
+        with pytest.raises(OSError) as excinfo:  # live server keep its socket
+            server_socket(unixpath=path).__enter__()
+        assert excinfo.value.errno == errno.EADDRINUSE
+        with client_socket(unixpath=path):
+            server.client_accept().__exit__()
+    regular = tmp_path / 'regular'
+    regular.write_bytes(b'not a socket')
+    with pytest.raises(OSError):
+        server_socket(unixpath=str(regular)).__enter__()
+    assert regular.read_bytes() == b'not a socket'
+
+
+def test_batchqueue_put_many_single_deadline():
+    batch = batchqueue(queue.Queue(maxsize=1))
+    stop = threading.Event()
+
+    def slow_consumer():  # free one slot every 0.1 s, each single put would succeed within its own timeout
+        while not stop.wait(0.1):
+            batch.get_many(maxitems=1, timeout=0)
+
+    thread = threading.Thread(target=slow_consumer, daemon=True)
+    thread.start()
+    start = time.monotonic()
+    try:
+        count = batch.put_many(list(range(20)), timeout=0.35)
+    finally:
+        stop.set()
+        thread.join()
+    assert time.monotonic() - start < 0.8
+    assert 1 <= count < 20
+    assert batch.get_many(timeout=0.05) in ([], [count - 1])
+
+
+def test_sync_manager_dynamic_queue_batches():
+    with mySyncMngr(address=('127.0.0.1', 0), startserver=True, queuename=('upstrm',)) as server:
+        server.serve_forever_thread()
+        with mySyncMngr(address=server.server_h.address, queuename=('upstrm',)) as client:
+            jobs = client.queue('jobs', 4)
+            assert jobs.put_many([b'a', b'b', b'c', b'd', b'e'], timeout=0.1) == 4
+            assert client.queue('jobs').get_many(maxitems=3, timeout=1.0) == [b'a', b'b', b'c']
+            client.upstrm().put_many([1, 2])
+            assert client.upstrm().get_many(timeout=1.0) == [1, 2]
+            assert jobs.get_many(timeout=1.0) == [b'd']
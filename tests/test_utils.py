@@ -0,0 +1,534 @@
+
+
+import socket
+import asyncio
+import threading
+import pytest
+from nuuJoyLib.Socket.utils import user_socket, msgv2, msgparser, encode_msgs, sessioncipher, hashalgos
+from nuuJoyLib.Socket.aiotcp import aio_connection
+
+
+def _negotiate(left, right, **kwargs):
+    # both side must send hello before reading peer's one, run right side in a thread
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(right=right[0].negotiate_wire(conn=right[1], **kwargs)))
+    thread.start()
+    result['left'] = left[0].negotiate_wire(conn=left[1], **kwargs)
+    thread.join()
+    return result
+
+
+def test_msgv2_pack_unpack():
+    frame = b''.join(msgv2.pack(b'data|with|syntax', b'info', b'hash', b'key', flags=3))
+    assert msgv2.framesize(frame) == len(frame)
+    assert msgv2.unpack(frame) == (msgv2.TYPE_MSGS, 3, b'info', b'data|with|syntax', b'hash', b'key')
+    with pytest.raises(ValueError):
+        msgv2.unpack_header(b'XX' + frame[2:])
+
+
+def test_msgparser_v2_split_reads():
+    sock = user_socket(IPAddr='127.0.0.1', hashalgo='crc32')
+    stream = b''.join(segment for index in range(50)
+                      for segment in encode_msgs(b'%d' % index, sock.syntax, b'info', 'crc32', version=2))
+    parser = msgparser(sock.syntax, 'crc32')
+    parser.version = 2
+    received = []
+    for index in range(0, len(stream), 7):
+        parser.feed(stream[index:index + 7])
+        received.extend(msgs.data for msgs in parser)
+    assert received == [b'%d' % index for index in range(50)]
+
+
+def test_negotiate_wire_then_v2_messages():
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        assert _negotiate((sender, left), (receiver, right)) == {'left': 2, 'right': 2}
+        sender.send_msgs([b'first', b'second'], datainfo=b'x', datahash=True, conn=left)
+        assert receiver.recv_msgs(conn=right).data == b'first'
+        assert receiver.recv_msgs(conn=right).data == b'second'
+
+
+def test_negotiate_wire_peer_hello_of_other_size():
+    # peer announce larger version with capability list, and send a frame right behind its hello
+    left, right = socket.socketpair()
+    with left, right:
+        sock = user_socket(IPAddr='127.0.0.1')
+        right.sendall(b''.join(msgv2.pack(b'17|compress,session,array', b'wirever')) +
+                      b''.join(msgv2.pack(b'payload', b'next')))
+        assert sock.negotiate_wire(conn=left) == 2
+        msgs = sock.recv_msgs(conn=left)
+        assert (msgs.info, msgs.data) == (b'next', b'payload')
+        assert msgv2.unpack(right.recv(1024))[2:4] == (b'wirever', b'2')
+
+
+def test_negotiate_wire_with_asyncio_peer():
+    left, right = socket.socketpair()
+    with left, right:
+        async def peer():
+            reader, writer = await asyncio.open_connection(sock=right)
+            conn = aio_connection(reader, writer)
+            version = await conn.negotiate_wire()
+            await conn.send_msgs(b'from asyncio', datainfo=b'aio')
+            await conn.close()
+            return version
+
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(peer=asyncio.run(peer())))
+        thread.start()
+        sock = user_socket(IPAddr='127.0.0.1')
+        assert sock.negotiate_wire(conn=left) == 2
+        msgs = sock.recv_msgs(conn=left)
+        thread.join()
+        assert result['peer'] == 2 and (msgs.info, msgs.data) == (b'aio', b'from asyncio')
+
+
+def test_telemetry_latest_per_sender():
+    from nuuJoyLib.Socket.utils import telemetry_socket
+    with telemetry_socket('127.0.0.1', 0, bind=True) as receiver:
+        address = receiver._soc.getsockname()
+        with telemetry_socket(*address) as first, telemetry_socket(*address) as second:
+            for index in range(10):
+                first.send(b'first%d' % index, datainfo=b'a')
+                second.send(b'second%d' % index, datainfo=b'b')
+            first.send(b'first10', datainfo=b'a')
+            latest = receiver.recv_latest_each(timeout=1.0)
+            assert sorted(sample.data for sample in latest.values()) == [b'first10', b'second9']
+            stats = receiver.stats()
+            assert sorted(item['dropped_stale'] for item in stats.values()) == [9, 10]
+            assert all(item['lost'] == 0 for item in stats.values())
+            second.send(b'second10')
+            sample = receiver.recv_latest(timeout=1.0)
+            assert sample.data == b'second10' and sample.seq == 10
+            assert receiver.recv_latest(timeout=0.05) is None
+
+
+def _negotiate_session(left, right, **kwargs):
+    _negotiate(left, right)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(right=right[0].negotiate_session(conn=right[1], **kwargs)))
+    thread.start()
+    result['left'] = left[0].negotiate_session(conn=left[1], **kwargs)
+    thread.join()
+    return result
+
+
+@pytest.mark.parametrize('algorithm', sessioncipher.algorithms)
+def test_sessioncipher_roundtrip_and_order(algorithm):
+    sendkey, recvkey = b'\x01' * 32, b'\x02' * 32
+    sender, receiver = sessioncipher(sendkey, recvkey, algorithm), sessioncipher(recvkey, sendkey, algorithm)
+    frames = [sender.encrypt(b'message%d' % index, b'info') for index in range(3)]
+    assert len(frames[0]) == len(b'message0') + 16
+    assert receiver.decrypt(frames[0], b'info') == b'message0'
+    with pytest.raises(ValueError):  # out of order, nonce doesn't match
+        receiver.decrypt(frames[2], b'info')
+    receiver.skip()
+    assert receiver.decrypt(frames[2], b'info') == b'message2'
+
+
+def test_sessioncipher_tampered_frame():
+    sender, receiver = sessioncipher(b'\x01' * 32, b'\x02' * 32), sessioncipher(b'\x02' * 32, b'\x01' * 32)
+    frame = bytearray(sender.encrypt(b'message', b'info'))
+    frame[0] ^= 1
+    with pytest.raises(ValueError):
+        receiver.decrypt(bytes(frame), b'info')
+    with pytest.raises(ValueError):  # info is authenticated too
+        receiver.decrypt(sender.encrypt(b'message', b'info'), b'other')
+
+
+def test_negotiate_session_messages():
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        _negotiate_session((sender, left), (receiver, right), algorithm='chacha20', psk=b'secret')
+        sender.send_msgs([b'one', b'two'], datainfo=b'x', conn=left)
+        assert [receiver.recv_msgs(conn=right).data for _ in range(2)] == [b'one', b'two']
+        receiver.send_msgs(b'back', conn=right)
+        assert sender.recv_msgs(conn=left).data == b'back'
+
+
+def test_negotiate_session_psk_mismatch():
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        _negotiate((sender, left), (receiver, right))
+        thread = threading.Thread(target=receiver.negotiate_session, kwargs={'conn': right, 'psk': b'other'})
+        thread.start()
+        sender.negotiate_session(conn=left, psk=b'secret')
+        thread.join()
+        sender.send_msgs(b'message', conn=left)
+        with pytest.raises(ValueError):
+            receiver.recv_msgs(conn=right)
+
+
+def test_array_roundtrip_into_preallocated():
+    numpy = pytest.importorskip('numpy')
+    left, right = socket.socketpair()
+    with left, right:
+        sock = user_socket(IPAddr='127.0.0.1')
+        arrays = [numpy.arange(12, dtype='>f8').reshape(3, 4), numpy.zeros((0, 3)), numpy.array(5, dtype=numpy.int16),
+                  numpy.arange(30).reshape(5, 6)[:, ::2]]
+        for array in arrays:
+            sock.send_array(array, datainfo=b'info', datahash=True, conn=left)
+            received, info = sock.recv_array(conn=right)
+            assert info == b'info' and received.dtype == array.dtype and received.shape == array.shape
+            assert (received == array).all()
+        out = numpy.empty((100, 6), dtype=numpy.float32)
+        array = numpy.random.rand(100, 6).astype(numpy.float32)
+        sock.send_array(array, conn=left)
+        received, _ = sock.recv_array(out=out, conn=right)
+        assert numpy.shares_memory(received, out) and (out == array).all()
+        sock.send_array(array.astype(numpy.float64), conn=left)
+        with pytest.raises(ValueError):  # dtype doesn't match preallocated array
+            sock.recv_array(out=out, conn=right)
+        sock.send_array(array, conn=left)  # stream still in sync after the refused frame
+        assert (sock.recv_array(out=out, conn=right)[0] == array).all()
+
+
+def test_array_over_session():
+    numpy = pytest.importorskip('numpy')
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        _negotiate_session((sender, left), (receiver, right))
+        array = numpy.random.rand(50, 3)
+        sender.send_array(array, conn=left)
+        sender.send_msgs(b'after', conn=left)
+        assert (receiver.recv_array(conn=right)[0] == array).all()
+        assert receiver.recv_msgs(conn=right).data == b'after'
+
+
+def test_array_size_mismatch_drains_frame():
+    numpy = pytest.importorskip('numpy')
+    left, right = socket.socketpair()
+    with left, right:
+        sock = user_socket(IPAddr='127.0.0.1')
+        info = b'<f8|4|'  # 32 bytes by dtype/shape, frame carry 16
+        left.sendall(b''.join(msgv2.pack(b'\x00' * 16, info, msgtype=msgv2.TYPE_ARRAY)))
+        array = numpy.arange(4, dtype='<f8')
+        sock.send_array(array, conn=left)
+        with pytest.raises(ValueError):
+            sock.recv_array(conn=right)
+        assert (sock.recv_array(conn=right)[0] == array).all()
+
+
+def test_array_over_session_size_mismatch():
+    numpy = pytest.importorskip('numpy')
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        _negotiate_session((sender, left), (receiver, right))
+        session, info, flags = sender.session(left), b'<f8|4|', msgv2.FLAG_SESSION
+        data = session.encrypt(b'\x00' * 24, msgv2.aad(msgv2.TYPE_ARRAY, flags, info, 24 + session.overhead))
+        left.sendall(b''.join(msgv2.pack(data, info, msgtype=msgv2.TYPE_ARRAY, flags=flags)))
+        out = numpy.full(4, 7.0)
+        with pytest.raises(ValueError):
+            receiver.recv_array(out=out, conn=right)
+        assert (out == 7.0).all()  # refused frame never touch out
+        array = numpy.arange(4, dtype=numpy.float64)
+        sender.send_array(array, conn=left)
+        assert (receiver.recv_array(out=out, conn=right)[0] == array).all()
+
+
+@pytest.mark.parametrize('wire', [1, 2])
+def test_recv_msgslatest_decode_only_last(wire):
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1', hashalgo='md5'), user_socket(IPAddr='127.0.0.1', hashalgo='md5')
+        if wire == 2:
+            _negotiate_session((sender, left), (receiver, right))
+        assert receiver.recv_msgslatest(conn=right, timeout=0.05) == (None, 0)
+        sender.send_msgs([b'%d' % index for index in range(100)], datahash=True, conn=left, batch=True)
+        msgs, dropped = receiver.recv_msgslatest(conn=right)
+        assert (msgs.data, dropped) == (b'99', 99)
+        sender.send_msgs([b'a', b'b', b'c'], conn=left)
+        assert receiver.recv_msgsstrm(conn=right, takelastonly=True).data == b'c'
+        sender.send_msgs(b'next', conn=left)  # session counter still in step after skipped frames
+        assert receiver.recv_msgs(conn=right).data == b'next'
+
+
+def test_msgparser_v1_marker_split_between_reads():
+    sock = user_socket(IPAddr='127.0.0.1')
+    stream = b''.join(segment for index in range(200)
+                      for segment in encode_msgs(b'data%d|msg' % index, sock.syntax, b'info', 'md5'))
+    parser = msgparser(sock.syntax, 'md5')
+    received = []
+    for index in range(0, len(stream), 5):  # every marker is cut at some point
+        parser.feed(stream[index:index + 5])
+        received.extend((msgs.info, msgs.data) for msgs in parser)
+        assert parser._scan >= parser._bgn
+    assert received == [(b'info', b'data%d|msg' % index) for index in range(200)]
+    assert len(parser) == 0 and len(parser._buff) < len(stream)  # consumed part is compacted
+
+
+def test_recv_msgsstrm_deep_backlog():
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        thread = threading.Thread(target=sender.send_msgs, args=([b'%d' % index for index in range(3000)],),
+                                  kwargs={'datainfo': b'bulk', 'conn': left, 'batch': True})
+        thread.start()
+        received = []
+        while len(received) < 3000:
+            msgs = receiver.recv_msgsstrm(conn=right, buff=65536)
+            if msgs is not None:
+                received.append(msgs.data)
+        thread.join()
+        assert received == [b'%d' % index for index in range(3000)]
+        assert receiver.dataresd == b''
+
+
+def test_recvbuffer_adaptive_chunk_and_stable_view():
+    from nuuJoyLib.Socket.utils import recvbuffer
+    left, right = socket.socketpair()
+    with left, right:
+        buffer = recvbuffer(size=16, minchunk=1024, maxchunk=8192)
+        left.sendall(b'x' * 1024)
+        assert buffer.recv_into(right) == 1024 and buffer.chunk == 2048
+        view = buffer.view
+        left.sendall(b'y' * 4096)
+        buffer.recv_exact(right, 4096)  # grow by reallocation, exported view keep old content
+        assert bytes(view) == b'x' * 1024 and bytes(buffer.view[-4096:]) == b'y' * 4096
+        left.sendall(b'z')
+        buffer.recv_into(right)
+        assert buffer.chunk == 1024  # short read, shrink back
+
+
+def test_recv_rawbview_large_payload():
+    left, right = socket.socketpair()
+    with left, right:
+        sock = user_socket(IPAddr='127.0.0.1')
+        payload = bytes(range(256)) * 16384  # 4 MiB
+        thread = threading.Thread(target=lambda: (left.sendall(payload), left.shutdown(socket.SHUT_WR)))
+        thread.start()
+        view = sock.recv_rawbview(conn=right, timeout=1.0, buff=4096)
+        thread.join()
+        assert isinstance(view, memoryview) and view == payload
+        assert sock._recvbuff.chunk > 4096
+        sock.send_msgs(b'frame', datainfo=b'v', conn=right)
+        msgs = user_socket(IPAddr='127.0.0.1').recv_msgsview(conn=left)
+        assert isinstance(msgs, memoryview) and bytes(msgs).endswith(sock.syntax['msge'])
+
+
+def test_recv_msgs_v2_resume_after_timeout():
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        _negotiate((sender, left), (receiver, right))
+        frame = b''.join(msgv2.pack(b'payload' * 100, b'info'))
+        for cut in (5, msgv2.header.size + 10):  # split inside header, then inside data
+            left.sendall(frame[:cut])
+            frame = frame[cut:]
+            with pytest.raises(socket.timeout):
+                receiver.recv_msgs(conn=right, timeout=0.05)
+        left.sendall(frame)
+        msgs = receiver.recv_msgs(conn=right, timeout=0.05)
+        assert (msgs.info, msgs.data) == (b'info', b'payload' * 100)
+        sender.send_msgs(b'next', conn=left)
+        assert receiver.recv_msgs(conn=right).data == b'next'
+
+
+def test_recv_msgs_v2_eof_mid_frame():
+    left, right = socket.socketpair()
+    with right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        _negotiate((sender, left), (receiver, right))
+        left.sendall(b''.join(msgv2.pack(b'payload', b'info'))[:-3])
+        left.close()
+        with pytest.raises(ConnectionError):
+            receiver.recv_msgs(conn=right)
+        with pytest.raises(ConnectionError):
+            receiver.recv_msgs(conn=right)
+
+
+@pytest.mark.parametrize('hashalgo', ['md5', 'crc32', 'blake2b'])
+def test_msgcls_hashalgo_roundtrip(hashalgo):
+    from nuuJoyLib.Socket.utils import msgcls
+    msgs = msgcls(None, hashalgo=hashalgo)
+    msgs.info, msgs.data, msgs.hash = b'info', b'payload', True
+    received = msgcls(msgs.phrase, hashalgo=hashalgo)
+    assert (received.info, received.data, received.hash) == (b'info', b'payload', msgs.hash)
+    with pytest.raises(ValueError):
+        msgcls(msgs.phrase.replace(b'payload', b'paylaod'), hashalgo=hashalgo)
+
+
+def test_msgcls_encrypt_and_hash_once(monkeypatch):
+    from nuuJoyLib.Socket import utils
+    calls = {'encrypt': 0, 'hash': 0}
+    encrypt, hasher = utils.ciphers.encrypt, utils.hashers['blake2b']
+
+    def count_encrypt(self, bytedata):
+        calls['encrypt'] += 1
+        return encrypt(self, bytedata)
+
+    def count_hash(bytedata):
+        calls['hash'] += 1
+        return hasher(bytedata)
+
+    monkeypatch.setattr(utils.ciphers, 'encrypt', count_encrypt)
+    monkeypatch.setitem(utils.hashers, 'blake2b', count_hash)
+    msgs = utils.msgcls(None, hashalgo='blake2b')
+    msgs.data, msgs.key, msgs.hash = b'payload', True, True
+    phrase = msgs.phrase
+    assert msgs.phrase == phrase and msgs.phrasesize == len(phrase)
+    assert calls == {'encrypt': 1, 'hash': 1}
+    assert utils.msgcls(phrase, hashalgo='blake2b').data == msgs.encryptdata  # key is not part of phrase
+
+
+@pytest.mark.parametrize('hashalgo', ['none', 'crc32', 'blake2b'])
+def test_v2_frame_carries_hashalgo(hashalgo):
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1', hashalgo=hashalgo), user_socket(IPAddr='127.0.0.1')
+        _negotiate((sender, left), (receiver, right))
+        sender.send_msgs(b'payload', datahash=True, conn=left)
+        msgs = receiver.recv_msgs(conn=right)  # receiver default md5, algorithm come from frame flags
+        assert msgs.data == b'payload' and msgs.hashalgo == hashalgo
+        assert (msgs.hash is None) == (hashalgo == 'none')
+
+
+def test_session_frame_no_plaintext_hash():
+    from nuuJoyLib.Socket.utils import msgcls
+    sendkey, recvkey = b'\x01' * 32, b'\x02' * 32
+    sender, receiver = sessioncipher(sendkey, recvkey), sessioncipher(recvkey, sendkey)
+    frame = b''.join(encode_msgs(b'secret', None, b'info', 'md5', version=2, session=sender))
+    msgtype, flags, info, data, hash, key = msgv2.unpack(frame)
+    assert hash == b'' and not (flags & msgv2.HASHMASK) and (flags & msgv2.FLAG_SESSION)
+    assert msgcls.from_v2(frame, session=receiver).data == b'secret'
+
+
+@pytest.mark.parametrize('field', ['msgtype', 'flags', 'info'])
+def test_session_frame_header_authenticated(field):
+    from nuuJoyLib.Socket.utils import msgcls
+    sendkey, recvkey = b'\x01' * 32, b'\x02' * 32
+    sender, receiver = sessioncipher(sendkey, recvkey), sessioncipher(recvkey, sendkey)
+    msgtype, flags, info, data, hash, key = msgv2.unpack(b''.join(encode_msgs(b'secret', None, b'info', version=2, session=sender)))
+    if field == 'msgtype':
+        msgtype = msgv2.TYPE_ARRAY
+    elif field == 'flags':
+        flags |= hashalgos.index('crc32')
+        hash = b'\0' * 4
+    else:
+        info = b'other'
+    with pytest.raises(ValueError):
+        msgcls.from_v2(b''.join(msgv2.pack(data, info, hash, key, msgtype, flags)), session=receiver)
+
+
+def test_compressor_negotiated_roundtrip():
+    from nuuJoyLib.Socket.utils import compressor
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        sender.compressor = compressor('zlib', minsize=64)
+        _negotiate((sender, left), (receiver, right))
+        assert receiver.peer_compression(right) == 'zlib' and sender.peer_compression(left) == 'none'
+        payload = b'compressible ' * 200
+        sender.send_msgs([payload, b'short'], datahash=True, conn=left)
+        assert [receiver.recv_msgs(conn=right).data for _ in range(2)] == [payload, b'short']
+        assert sender.compressor.stats()['compressed'] == 1
+        # method peer didn't announce is refused
+        left.sendall(b''.join(encode_msgs(payload, None, version=2, compstage=compressor('lzma', minsize=64))))
+        with pytest.raises(ValueError):
+            receiver.recv_msgs(conn=right)
+
+
+def test_compression_flag_authenticated_on_session():
+    from nuuJoyLib.Socket.utils import compressor, msgcls
+    sendkey, recvkey = b'\x01' * 32, b'\x02' * 32
+    sender, receiver = sessioncipher(sendkey, recvkey), sessioncipher(recvkey, sendkey)
+    payload = b'compressible ' * 200
+    frame = b''.join(encode_msgs(payload, None, version=2, session=sender, compstage=compressor('zlib', minsize=64)))
+    msgtype, flags, info, data, hash, key = msgv2.unpack(frame)
+    assert flags & msgv2.COMPMASK
+    stripped = b''.join(msgv2.pack(data, info, hash, key, msgtype, flags & ~msgv2.COMPMASK))
+    with pytest.raises(ValueError):
+        msgcls.from_v2(stripped, session=receiver, peercomp='zlib')
+    assert msgcls.from_v2(frame, session=receiver, peercomp='zlib').data == payload
+
+
+@pytest.mark.parametrize('existing', ['none', 'prefix', 'unrelated'])
+def test_send_file_resume_checks_prefix(tmp_path, existing):
+    import os
+    content = os.urandom(300000)
+    source, target = tmp_path / 'source.bin', tmp_path / 'target.bin'
+    source.write_bytes(content)
+    if existing == 'prefix':
+        target.write_bytes(content[:100000])
+    elif existing == 'unrelated':
+        target.write_bytes(os.urandom(100000))
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(sent=sender.send_file(str(source), conn=left)))
+        thread.start()
+        path, received = receiver.recv_file(str(target), conn=right, buff=65536)
+        thread.join()
+        expect = 200000 if existing == 'prefix' else 300000
+        assert path == str(target) and received == result['sent'] == expect
+        assert target.read_bytes() == content
+
+
+class _partialconn(object):
+    # sendmsg take at most 5000 bytes per call, like a full socket buffer
+    def __init__(self):
+        self.received, self.calls = bytearray(), 0
+
+    def sendmsg(self, buffers):
+        self.calls += 1
+        taken = b''.join(bytes(buffer) for buffer in buffers)[:5000]
+        self.received += taken
+        return len(taken)
+
+    def sendall(self, data):
+        self.calls += 1
+        self.received += data
+
+
+def test_sendmsg_all_resume_partial_send():
+    from nuuJoyLib.Socket.utils import sendmsg_all
+    segments = [b'head', bytearray(b'a' * 40000), b'mid', memoryview(b'b' * 30000), b'tail']
+    conn = _partialconn()
+    sendmsg_all(conn, segments)
+    assert conn.received == b''.join(bytes(segment) for segment in segments)
+    conn = _partialconn()
+    sendmsg_all(conn, [b'small', b'frame'])  # small frame, joined and sent at once
+    assert (conn.received, conn.calls) == (bytearray(b'smallframe'), 1)
+
+
+def test_send_msgs_batch_and_sockopts():
+    left, right = socket.socketpair()
+    with left, right:
+        sender, receiver = user_socket(IPAddr='127.0.0.1'), user_socket(IPAddr='127.0.0.1')
+        options = sender.set_sockopts(conn=left, nodelay=True, sndbuf=1 << 16)
+        assert options['nodelay'] and options['sndbuf'] >= 1 << 16
+        sender.send_msgs([b'%d' % index for index in range(500)], datainfo=b'b', datahash=True, conn=left, batch=True)
+        received = []
+        while len(received) < 500:
+            msgs = receiver.recv_msgsstrm(conn=right, buff=65536)
+            if msgs is not None:
+                received.append(msgs.data)
+        assert received == [b'%d' % index for index in range(500)]
+
+
+def test_set_sockopts_nodelay_on_tcp():
+    with socket.create_server(('127.0.0.1', 0)) as server:
+        with socket.create_connection(server.getsockname()) as client:
+            sock = user_socket(IPAddr='127.0.0.1')
+            assert sock.set_sockopts(conn=client, nodelay=True)['nodelay'] is True
+            assert sock.set_sockopts(conn=client, nodelay=False)['nodelay'] is False
+
+
+def test_telemetry_header_size_and_loss_accounting():
+    from nuuJoyLib.Socket.utils import telemetry_socket
+    assert telemetry_socket.header.size == 16
+    with telemetry_socket('127.0.0.1', 0, bind=True) as receiver:
+        address = ('127.0.0.1', 9)
+        for seq in (0, 1, 4, 5, 3, 5, 5, 1, 6):  # 2 and 3 missing, 3 arrive late, 5 and 1 duplicated
+            receiver._account(address, seq, 0.0, 0.0)
+        stats = receiver.stats(address)
+        assert (stats['received'], stats['lost'], stats['reordered'], stats['duplicate']) == (9, 2, 1, 3)
+        assert receiver._account(address, 2, 0.0, 0.0)  # late, fill last gap
+        stats = receiver.stats(address)
+        assert (stats['lost'], stats['reordered'], stats['duplicate']) == (2, 2, 3)
+        assert not ('missing' in stats)